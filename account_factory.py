@@ -1,6 +1,7 @@
 from datetime import timedelta
 import random
 from singleton_db import DatabaseConnection
+from time_codec import hours_to_minutes
 
 
 class AccountFactory:
@@ -18,12 +19,6 @@ class AccountFactory:
         if self.account_type not in self.VALID_ACCOUNT_TYPES:
             raise ValueError("Invalid account type.")
 
-    def convert_balance_to_time(self):
-        balance_float = float(self.balance)
-        hours = int(balance_float)
-        minutes = int((balance_float - hours) * 60)
-        return f"{hours:02d}:{minutes:02d}:00"
-
     def determine_interest_rate(self, balance_float):
         if self.account_type == 'Savings':
             if balance_float < 100:
@@ -53,8 +48,7 @@ class AccountFactory:
         self.validate_input()
 
         balance_float = float(self.balance)
-        balance_time = self.convert_balance_to_time()
-        new_balance_minutes = int(balance_float * 60)
+        new_balance_minutes = hours_to_minutes(balance_float)
 
         interest_rate = self.determine_interest_rate(balance_float)
         transaction_limit = round(balance_float * 10, 2)
@@ -66,7 +60,7 @@ class AccountFactory:
 
         cursor.execute("""
             INSERT INTO accounts (
-                user_id, fullname, account_number, account_type, balance,
+                user_id, fullname, account_number, account_type, balance_minutes,
                 interest_rate, transaction_limit, account_status
             )
             VALUES (%s, %s, %s, %s, %s, %s, %s, 'active')
@@ -75,7 +69,7 @@ class AccountFactory:
             self.full_name,
             account_number,
             self.account_type,
-            balance_time,
+            new_balance_minutes,
             interest_rate,
             transaction_limit
         ))
@@ -1,132 +1,405 @@
-from flask import Blueprint, render_template, Response, session
+from flask import Blueprint, render_template, Response, request, session
 from observer import Observer, Subject
+from event_bus import bus, EVENT_BRIDGE, TRANSFERS, LOAN_CHANGED, REPAYMENT_CHANGED, BALANCE_CHANGED
+from notification_inbox import NotificationInbox
+from reminder_scheduler import ReminderScheduler
+from collections import deque
+import threading
 import time
 from singleton_db import DatabaseConnection
+from time_codec import format_hhmm
 
 transaction_monitor_bp = Blueprint('transaction_monitor', __name__)
 
+LOW_BALANCE_MINUTES = 1200  # 20 hours
+SUSPICIOUS_AMOUNT_MINUTES = 5400  # 90 hours
+HEARTBEAT_SECONDS = 15
+SUSPICIOUS_MARK = 'suspicious_transfers'
+# How long a missing transaction id may hold the suspicious-transfer scan
+# back before it is taken for a rolled-back insert.
+ID_GAP_TIMEOUT = 30
+STREAM_BUFFER_SIZE = 64
+MAX_STREAMS_PER_USER = 5
+QUERY_CHUNK = 500  # user ids per IN (...) list
 
-class User(Observer):
-    def __init__(self, user_id, balance):
+
+def format_event(notification):
+    return f"id: {notification['id']}\ndata: {notification['message']}\n\n"
+
+
+def chunked(ids, size=QUERY_CHUNK):
+    ids = sorted(ids)
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+
+def parse_last_event_id(value):
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+class AlertStream(Observer):
+    """One open /events connection and the alerts ({'id', 'message'}) it has not sent yet.
+
+    The buffer is a ring of STREAM_BUFFER_SIZE alerts: when the client falls
+    behind, the oldest alert is dropped and counted instead of letting the
+    buffer grow.
+    """
+
+    def __init__(self, user_id, buffer_size=STREAM_BUFFER_SIZE):
         self.user_id = user_id
-        self.balance = balance
-        self.messages = []
+        self._messages = deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        self._unreported_drops = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.closed = False
 
     def update(self, message):
-        print(f"User {self.user_id} with balance {self.balance} received message: {message}")
-        self.messages.append(message)
+        with self._cond:
+            if len(self._messages) == self._messages.maxlen:
+                self.dropped += 1
+                self._unreported_drops += 1
+            self._messages.append(message)
+            self._cond.notify()
+
+    def buffered(self):
+        return len(self._messages)
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+    def take(self, timeout):
+        """Waits up to `timeout` seconds for alerts; returns (alerts, alerts dropped since the last take)."""
+        with self._cond:
+            if not self._messages and not self.closed:
+                self._cond.wait(timeout)
+            messages = list(self._messages)
+            self._messages.clear()
+            dropped, self._unreported_drops = self._unreported_drops, 0
+            self.delivered += len(messages)
+            return messages, dropped
 
 
-class TransactionMonitor(Subject):
-    def __init__(self):
-        super().__init__()
-        self.latest_message = None
-        self.users_loaded = set() 
+class TransactionMonitor:
+    """Evaluates alert rules when the event bus reports a relevant write.
 
-    def notify_observers(self, message):
-        self.latest_message = message
-        super().notify_observers(message)
+    Bus handlers only queue the affected users. One evaluator thread takes
+    everything queued since its last tick and runs each rule once for all of
+    them, with chunked IN (...) queries, so a burst of events costs a few
+    queries rather than a few per user.
 
-    def get_notifications(self):
-        message = self.latest_message
-        self.latest_message = None
-        return message
+    Alerts are stored in the notification inbox for every affected user and
+    pushed to the user's open streams, if any. Every user with an open stream
+    has a Subject whose observers are those streams. A user keeps at most
+    MAX_STREAMS_PER_USER streams (the oldest is closed to make room), so
+    memory is bounded by the number of connected users, not by how often
+    they reconnect.
+    """
 
-    def load_users_as_observers(self, user_id):
-        if user_id in self.users_loaded:
+    def __init__(self, inbox=None):
+        self.inbox = inbox if inbox is not None else NotificationInbox()
+        self.reminders = ReminderScheduler(self.inbox, self.push)
+        self._subjects = {}
+        self._lock = threading.Lock()
+        # Totals of streams that have closed; open streams keep their own.
+        self._closed_delivered = 0
+        self._closed_dropped = 0
+        self._id_gaps = {}
+        self._gap_timer = None
+        self._pending = threading.Condition()
+        self._pending_balance = set()
+        self._pending_users = set()
+        self._pending_scan = False
+        self._evaluator = None
+
+    def subscribe(self, stream):
+        with self._lock:
+            subject = self._subjects.setdefault(stream.user_id, Subject())
+            subject.add_observer(stream)
+            streams = subject.observers()
+        for oldest in streams[:-MAX_STREAMS_PER_USER]:
+            oldest.close()
+            self.unsubscribe(oldest)
+
+    def unsubscribe(self, stream):
+        with self._lock:
+            subject = self._subjects.get(stream.user_id)
+            if subject is None or stream not in subject.observers():
+                return
+            subject.remove_observer(stream)
+            if not subject.observers():
+                del self._subjects[stream.user_id]
+            self._closed_delivered += stream.delivered
+            self._closed_dropped += stream.dropped
+
+    def stats(self):
+        with self._lock:
+            streams = [stream for subject in self._subjects.values() for stream in subject.observers()]
+            return {
+                'users': len(self._subjects),
+                'streams': len(streams),
+                'buffered': sum(stream.buffered() for stream in streams),
+                'delivered': self._closed_delivered + sum(stream.delivered for stream in streams),
+                'dropped': self._closed_dropped + sum(stream.dropped for stream in streams),
+            }
+
+    def notify_users(self, alerts):
+        """Stores (user_id, message) alerts in one transaction, then pushes them."""
+        if not alerts:
             return
+        with DatabaseConnection.get_instance().pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                notifications = [(user_id, {'id': self.inbox.add(cursor, user_id, message), 'message': message})
+                                 for user_id, message in alerts]
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        for user_id, notification in notifications:
+            self.push(user_id, notification)
+
+    def push(self, user_id, notification):
+        """Sends a stored notification to the user's open streams."""
+        with self._lock:
+            subject = self._subjects.get(user_id)
+        if subject is not None:
+            subject.notify_observers(notification)
+
+    def replay(self, user_id, last_event_id):
+        """Yields every notification after `last_event_id`, a page at a time, oldest first.
+
+        Subscribe the stream first: alerts raised during the read then reach
+        it as well, and the stream skips those at or below the last id replayed.
+        """
+        return self.inbox.pages(user_id, last_event_id)
+
+    # -- event handlers (run on the event bus thread) ------------------------
+
+    def on_transfers(self, transfers):
+        participants = {t['sender_id'] for t in transfers} | {t['receiver_id'] for t in transfers}
+        self.enqueue(balance=participants, scan=True)
+
+    def on_loan_changed(self, event):
+        self.enqueue(users=[event['user_id']])
+
+    def on_balance_changed(self, event):
+        self.enqueue(balance=[event['user_id']])
 
-        conn = DatabaseConnection.get_instance().get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT total_balance FROM users WHERE id = %s", (user_id,))
-        user = cursor.fetchone()
-        cursor.close()
-
-        if user:
-            balance = user['total_balance']
-            observer = User(user_id=user_id, balance=balance)
-            self.add_observer(observer)
-            self.users_loaded.add(user_id)
-
-    def check_users_for_alerts(self, user_id):
-        self.check_balance(user_id)
-        self.check_suspicious_transactions(user_id)
-        self.check_loan_due_dates(user_id)
-
-    def check_balance(self, user_id):
-        conn = DatabaseConnection.get_instance().get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT total_balance FROM users WHERE id = %s", (user_id,))
-        result = cursor.fetchone()
-        cursor.close()
-
-        if result:
-            balance = result["total_balance"]
+    def request_evaluation(self, user_id):
+        """Queues every rule that depends on the user's current state, e.g. when they connect."""
+        self.enqueue(users=[user_id])
+
+    # -- evaluator -----------------------------------------------------------
+
+    def enqueue(self, balance=(), users=(), scan=False):
+        """Queues a balance check for `balance`, every state rule for `users`, and a suspicious-transfer scan."""
+        with self._pending:
+            self._pending_balance.update(balance)
+            self._pending_users.update(users)
+            self._pending_scan = self._pending_scan or scan
+            if self._evaluator is None:
+                self._evaluator = threading.Thread(target=self._run_evaluator, name="alert-evaluator", daemon=True)
+                self._evaluator.start()
+                self.reminders.start()
+            self._pending.notify()
+
+    def _run_evaluator(self):
+        while True:
+            with self._pending:
+                while not (self._pending_balance or self._pending_users or self._pending_scan):
+                    self._pending.wait()
+                balance, self._pending_balance = self._pending_balance, set()
+                users, self._pending_users = self._pending_users, set()
+                scan, self._pending_scan = self._pending_scan, False
             try:
-                if balance and isinstance(balance, str) and ":" in balance:
-                    hours, minutes = map(int, balance.split(":"))
-                    total_minutes = hours * 60 + minutes
-                    if total_minutes < 1200:  # 20 hours
-                        self.notify_observers(f" Warning: User {user_id} has a low balance!")
-                else:
-                    raise ValueError("Invalid format")
-            except (ValueError, IndexError) as e:
-                print(f"[Error] Failed to parse balance for user {user_id}: {balance} ({e})")
-
-    def check_suspicious_transactions(self, user_id):
-        conn = DatabaseConnection.get_instance().get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT time_amount FROM transactions WHERE sender_id = %s OR receiver_id = %s", (user_id, user_id))
-        transactions = cursor.fetchall()
-        cursor.close()
-
-        for transaction in transactions:
+                self.evaluate(balance, users, scan)
+            except Exception as e:
+                print(f"[Transaction Monitor] evaluation failed: {e}")
+
+    def evaluate(self, balance_user_ids=(), user_ids=(), scan=False):
+        """One evaluator tick: each rule runs once for all the users it covers."""
+        if scan:
+            self.scan_suspicious_transactions()
+        self.notify_users(self.check_balance(set(balance_user_ids) | set(user_ids)))
+        self.refresh_reminders(user_ids)
+        self.inbox.maybe_compact()
+
+    # -- rules (return the (user_id, message) alerts they raise) -------------
+
+    def check_balance(self, user_ids):
+        alerts = []
+        with DatabaseConnection.get_instance().pool.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            for chunk in chunked(user_ids):
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cursor.execute(f"""
+                    SELECT id FROM users WHERE id IN ({placeholders}) AND total_balance_minutes < %s
+                """, (*chunk, LOW_BALANCE_MINUTES))
+                alerts += [(user['id'], f" Warning: User {user['id']} has a low balance!")
+                           for user in cursor.fetchall()]
+            cursor.close()
+        return alerts
+
+    def scan_suspicious_transactions(self):
+        """Alerts sender and receiver of every large transfer committed since the last scan.
+
+        alert_marks holds the high-water mark: the last transaction id
+        scanned. A scan reads only ids after it, up to the MAX(id) it saw, with
+        the threshold applied in SQL; the mark, the alerts and the move of the
+        mark commit together, so each transfer is examined once across all
+        processes and old transfers never alert again.
+
+        Ids can commit out of order, so the mark stops at the first missing
+        id until that id shows up or ID_GAP_TIMEOUT passes; a scan stopped at
+        a gap schedules another one for when its timeout runs out.
+        """
+        notifications = []
+        with DatabaseConnection.get_instance().pool.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
             try:
-                hours, minutes = map(int, transaction["time_amount"].split(":"))
-                total_minutes = hours * 60 + minutes
-                if total_minutes > 5400:  # 90 hours
-                    self.notify_observers(f"⚠️ Suspicious transaction detected for User {user_id}. Amount: {transaction['time_amount']}")
-            except (ValueError, IndexError):
-                print(f"[Error] Invalid time_amount format for transaction {transaction['time_amount']}")
-
-    def check_loan_due_dates(self, user_id):
-        conn = DatabaseConnection.get_instance().get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT loan_amount, repayment_due FROM loans WHERE user_id = %s AND status = 'Approved'", (user_id,))
-        loans = cursor.fetchall()
-        cursor.close()
-
-        for loan in loans:
-            if loan['repayment_due']:
-                try:
-                    repayment_due = time.mktime(time.strptime(loan['repayment_due'], '%Y-%m-%d'))
-                    if repayment_due <= time.time() + 86400:  # 24 hours
-                        self.notify_observers(
-                            f"⏰ Reminder: Loan repayment due soon for User {user_id}. Loan amount: {loan['loan_amount']}"
-                        )
-                except Exception as e:
-                    print(f"[Error] Failed to parse repayment date: {loan['repayment_due']} ({e})")
+                cursor.execute("SELECT last_id FROM alert_marks WHERE name = %s FOR UPDATE", (SUSPICIOUS_MARK,))
+                mark = cursor.fetchone()['last_id']
+                cursor.execute("SELECT MAX(id) AS high FROM transactions")
+                high = cursor.fetchone()['high'] or 0
+                if high <= mark:
+                    conn.rollback()
+                    return
+                cursor.execute("SELECT id FROM transactions WHERE id > %s AND id <= %s ORDER BY id", (mark, high))
+                scan_to = self._contiguous_end(mark, [row['id'] for row in cursor.fetchall()])
+                if scan_to > mark:
+                    cursor.execute("""
+                        SELECT sender_id, receiver_id, amount_minutes FROM transactions
+                        WHERE id > %s AND id <= %s AND amount_minutes > %s
+                        ORDER BY id
+                    """, (mark, scan_to, SUSPICIOUS_AMOUNT_MINUTES))
+                    for row in cursor.fetchall():
+                        for user_id in {row['sender_id'], row['receiver_id']}:
+                            message = (f"⚠️ Suspicious transaction detected for User {user_id}. "
+                                       f"Amount: {format_hhmm(row['amount_minutes'])}")
+                            notifications.append((user_id, {'id': self.inbox.add(cursor, user_id, message),
+                                                            'message': message}))
+                    cursor.execute("UPDATE alert_marks SET last_id = %s WHERE name = %s", (scan_to, SUSPICIOUS_MARK))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        for user_id, notification in notifications:
+            self.push(user_id, notification)
+
+    def _contiguous_end(self, mark, ids):
+        # Every missing id is timed from when it was first seen missing, so a
+        # run of them times out together.
+        now = time.monotonic()
+        expected = mark + 1
+        end = None
+        for transaction_id in ids:
+            for missing in range(expected, transaction_id):
+                first_seen = self._id_gaps.setdefault(missing, now)
+                if end is None and now - first_seen < ID_GAP_TIMEOUT:
+                    self._rescan_after(first_seen + ID_GAP_TIMEOUT - now)
+                    end = missing - 1
+            expected = transaction_id + 1
+        if end is None:
+            end = expected - 1
+        for gap in [gap for gap in self._id_gaps if gap <= end]:
+            del self._id_gaps[gap]
+        return end
+
+    def _rescan_after(self, delay):
+        # The missing id may belong to a rolled-back transfer, which publishes
+        # nothing; without this the mark would wait for the next transfer.
+        with self._lock:
+            if self._gap_timer is None:
+                self._gap_timer = threading.Timer(delay, self._gap_timed_out)
+                self._gap_timer.daemon = True
+                self._gap_timer.start()
+
+    def _gap_timed_out(self):
+        with self._lock:
+            self._gap_timer = None
+        self.enqueue(scan=True)
+
+    def refresh_reminders(self, user_ids):
+        # The scheduler sends each reminder once, when it falls due; this only
+        # moves the users' timers after a loan or repayment change. A client
+        # that missed one gets it from the inbox via Last-Event-ID.
+        if user_ids:
+            self.reminders.reload(user_ids)
 
 
 transaction_monitor = TransactionMonitor()
+_rules_subscribed = False
+
+
+def subscribe_rules():
+    """Runs the alert rules on this process's event bus.
+
+    Exactly one process evaluates each event, since every alert is stored:
+    each worker for its own events, or the SSE gateway for all of them when
+    the workers forward events to it over the event bridge.
+    """
+    global _rules_subscribed
+    if _rules_subscribed:
+        return
+    bus.subscribe(TRANSFERS, transaction_monitor.on_transfers)
+    bus.subscribe(LOAN_CHANGED, transaction_monitor.on_loan_changed)
+    bus.subscribe(REPAYMENT_CHANGED, transaction_monitor.on_loan_changed)
+    bus.subscribe(BALANCE_CHANGED, transaction_monitor.on_balance_changed)
+    _rules_subscribed = True
+
+
+def start_reminders():
+    """Starts the reminder scheduler at startup, in the process that runs the alert rules."""
+    if _rules_subscribed:
+        transaction_monitor.reminders.start()
+
+
+if not EVENT_BRIDGE:
+    subscribe_rules()
 
 
 @transaction_monitor_bp.route('/events')
 def sse():
     user_id = session.get("user_id")
+    last_event_id = parse_last_event_id(request.headers.get("Last-Event-ID"))
 
     def generate():
         if user_id:
-            transaction_monitor.load_users_as_observers(user_id)
+            stream = AlertStream(user_id)
+            transaction_monitor.subscribe(stream)
             try:
-                while True:
-                    transaction_monitor.check_users_for_alerts(user_id)
-                    message = transaction_monitor.get_notifications()
-                    if message:
-                        yield f"data: {message}\n\n"
-                    time.sleep(60)
+                caught_up = 0
+                if last_event_id is None:
+                    transaction_monitor.request_evaluation(user_id)
+                else:
+                    # Reconnect: send only what was missed instead of re-evaluating.
+                    caught_up = last_event_id
+                    for missed in transaction_monitor.replay(user_id, last_event_id):
+                        yield "".join(format_event(notification) for notification in missed)
+                        caught_up = missed[-1]['id']
+                while not stream.closed:
+                    messages, dropped = stream.take(HEARTBEAT_SECONDS)
+                    if dropped:
+                        yield f"event: dropped\ndata: {dropped}\n\n"
+                    for notification in messages:
+                        if notification['id'] > caught_up:
+                            yield format_event(notification)
+                    if not messages and not dropped and not stream.closed:
+                        # Comment line: keeps proxies from closing an idle stream.
+                        yield ": heartbeat\n\n"
             except GeneratorExit:
                 print(f"Client closed SSE connection for user {user_id}")
+            finally:
+                transaction_monitor.unsubscribe(stream)
         else:
             yield "data: Unauthorized\n\n"
 
@@ -137,13 +410,10 @@ def sse():
 def index():
     conn = DatabaseConnection.get_instance().get_connection()
     cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT id, total_balance FROM users")
+    cursor.execute("SELECT id, total_balance_minutes FROM users")
     users = cursor.fetchall()
     cursor.close()
+    for user in users:
+        user['total_balance'] = format_hhmm(user['total_balance_minutes'])
     return render_template("index.html", users=users)
 
-
-def setup_users():
-    user_id = session.get("user_id")
-    if user_id:
-        transaction_monitor.load_users_as_observers(user_id)
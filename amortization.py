@@ -0,0 +1,81 @@
+import calendar
+from collections import namedtuple
+from datetime import date, timedelta
+
+from repayment_strategy import calculate_fixed_interest_minutes, calculate_installment_interest
+from time_codec import hours_to_minutes
+
+FREQUENCIES = ('weekly', 'monthly')
+DEFAULT_INSTALLMENTS = 4
+MAX_INSTALLMENTS = 104
+FIXED_TERM = timedelta(weeks=4)
+
+Installment = namedtuple('Installment', 'number due_date amount_minutes interest_minutes')
+
+
+def add_months(day, months):
+    """`day` moved by whole months, clamped to the end of shorter months."""
+    month = day.month - 1 + months
+    year, month = day.year + month // 12, month % 12 + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def due_dates(start, count, frequency='weekly', interval_days=None):
+    """Due dates of `count` installments after `start`; interval_days overrides frequency."""
+    if interval_days:
+        return [start + timedelta(days=interval_days * n) for n in range(1, count + 1)]
+    if frequency == 'weekly':
+        return [start + timedelta(weeks=n) for n in range(1, count + 1)]
+    if frequency == 'monthly':
+        return [add_months(start, n) for n in range(1, count + 1)]
+    raise ValueError(f"Unknown repayment frequency: {frequency}")
+
+
+def split_evenly(total, count):
+    """`count` whole-minute parts that add up to `total`; the first total % count are one minute larger."""
+    base, extra = divmod(total, count)
+    return [base + 1 if n < extra else base for n in range(count)]
+
+
+def loan_interest_minutes(strategy, loan_hours):
+    """Interest on the whole loan, as repayment_strategy charges it."""
+    if strategy == 'fixed':
+        return calculate_fixed_interest_minutes(hours_to_minutes(loan_hours))
+    return hours_to_minutes(calculate_installment_interest(loan_hours))
+
+
+def build_schedule(loan_hours, strategy, installments=None, frequency='weekly', interval_days=None, start=None):
+    """Returns the loan's installments.
+
+    A fixed loan is one payment FIXED_TERM after `start`. An installment
+    loan is `installments` payments (DEFAULT_INSTALLMENTS if not given)
+    spaced weekly, monthly or every `interval_days` days. Principal and
+    interest are split evenly in whole minutes, so the parts add up exactly.
+    """
+    strategy = strategy.lower()
+    start = start or date.today()
+    if strategy == 'fixed':
+        dates = [start + FIXED_TERM]
+    elif strategy == 'installment':
+        count = DEFAULT_INSTALLMENTS if installments is None else installments
+        if not 1 <= count <= MAX_INSTALLMENTS:
+            raise ValueError(f"Installments must be between 1 and {MAX_INSTALLMENTS}.")
+        if interval_days is not None and interval_days <= 0:
+            raise ValueError("Installment interval must be a positive number of days.")
+        dates = due_dates(start, count, frequency, interval_days)
+    else:
+        raise ValueError(f"Unknown repayment strategy: {strategy}")
+
+    principal = split_evenly(hours_to_minutes(loan_hours), len(dates))
+    interest = split_evenly(loan_interest_minutes(strategy, loan_hours), len(dates))
+    return [Installment(n + 1, dates[n], principal[n], interest[n]) for n in range(len(dates))]
+
+
+def insert_schedule(cursor, loan_id, user_id, strategy, schedule):
+    """Writes the schedule as pending repayments in one executemany."""
+    cursor.executemany("""
+        INSERT INTO repayments (loan_id, user_id, installment_number, amount_minutes, interest_minutes,
+                                due_date, strategy, status)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, 'Pending')
+    """, [(loan_id, user_id, installment.number, installment.amount_minutes, installment.interest_minutes,
+           installment.due_date, strategy) for installment in schedule])
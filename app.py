@@ -1,27 +1,42 @@
 from flask import Flask, render_template, request, redirect, url_for, jsonify, session, flash
 from flask_cors import CORS
 from datetime import timedelta
+import os
 from create_account import create_account_bp
-from transactions import transactions_bp
+from transactions import transactions_bp, fetch_recent_transactions
+from time_codec import format_hhmm, minutes_to_hours
 from customize_account import customize_account_bp 
 from banking_routes import banking_bp
 from admin.models import db
 from admin.admin import admin_blueprint, init_admin
 from singleton_db import DatabaseConnection
+from ledger import ledger_outbox
 from account_state import Account 
 from goal_routes import goal_bp
 from apply_loan import loan_bp
 from money_time_transactions import money_time_transactions_bp  # adjust path if needed
-from alert_routes import transaction_monitor_bp
+from alert_routes import transaction_monitor_bp, start_reminders
 from strategy_routes import repayment_bp
+from statement_export import statement_export_bp
 
 app = Flask(__name__)
 CORS(app)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'mysql+pymysql://root@localhost/chronobank'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.secret_key = 'your_secret_key'
+app.config['DB_BACKEND'] = os.environ.get('CHRONOBANK_DB_BACKEND', 'mysql')
+app.config['SQLITE_PATH'] = os.environ.get('CHRONOBANK_SQLITE_PATH', 'chronobank.sqlite3')
+app.config['DB_POOL_MIN_SIZE'] = 2
+app.config['DB_POOL_MAX_SIZE'] = 10
+app.config['DB_POOL_WAIT_TIMEOUT'] = 10
+# Shared with sse_gateway.py, which reads the same session cookie.
+app.secret_key = os.environ.get('CHRONOBANK_SECRET_KEY', 'your_secret_key')
 
 db.init_app(app)
+DatabaseConnection.init_app(app)
+# Delivers ledger entries left in the outbox by an earlier run.
+ledger_outbox.start()
+# Reminders fire when due even if no event or connection wakes the monitor.
+start_reminders()
 
 # Register Blueprints
 app.register_blueprint(create_account_bp)
@@ -34,6 +49,7 @@ app.register_blueprint(money_time_transactions_bp)
 app.register_blueprint(loan_bp, url_prefix='/loan')
 app.register_blueprint(transaction_monitor_bp, url_prefix='/monitor')
 app.register_blueprint(repayment_bp)
+app.register_blueprint(statement_export_bp)
 init_admin(app)
 
 @app.route('/', endpoint='index')
@@ -63,18 +79,7 @@ def dashboard():
         account = account_cursor.fetchone()
 
     if account:
-        balance_str = str(account['balance'])
-        try:
-            if ':' in balance_str:
-                hours, minutes = map(int, balance_str.split(':'))
-            else:
-                hours = int(float(balance_str))
-                minutes = int(round((float(balance_str) - hours) * 60))
-        except Exception as e:
-            print(f"Invalid balance format in dashboard: {balance_str}, error: {e}")
-            hours, minutes = 0, 0
-
-        balance_hours = hours + minutes / 60
+        balance_hours = minutes_to_hours(account['balance_minutes'])
         is_premium = balance_hours > 50
         interest_rate = account.get('interest_rate', 0)
         account_status = account.get('account_status', 'Unknown')
@@ -86,12 +91,7 @@ def dashboard():
         account_status = 'Unknown'
 
     with db_conn.cursor(dictionary=True, buffered=True) as txn_cursor:
-        txn_cursor.execute("""
-            SELECT * FROM transactions
-            WHERE sender_id = %s OR receiver_id = %s
-            ORDER BY timestamp DESC LIMIT 5
-        """, (user_id, user_id))
-        transactions = txn_cursor.fetchall()
+        transactions = fetch_recent_transactions(txn_cursor, user_id, 5)
 
     return render_template(
         'dashboard.html',
@@ -123,18 +123,7 @@ def login():
             account = cursor.fetchone()
 
             if account:
-                balance_str = str(account['balance'])
-                try:
-                    if ':' in balance_str:
-                        hours, minutes = map(int, balance_str.split(':'))
-                    else:
-                        hours = int(float(balance_str))
-                        minutes = int(round((float(balance_str) - hours) * 60))
-                except Exception as e:
-                    print(f"Invalid balance format in login: {balance_str}, error: {e}")
-                    hours, minutes = 0, 0
-
-                balance_hours = hours + minutes / 60
+                balance_hours = minutes_to_hours(account['balance_minutes'])
                 is_premium = balance_hours > 50
                 account['balance'] = round(balance_hours, 2)
             else:
@@ -222,7 +211,7 @@ def get_account_status():
         # Create Account object (without account_id)
         account = Account(
             account_number=record["account_number"],
-            balance=record["balance"],
+            balance=format_hhmm(record["balance_minutes"]),
             status_code=record["account_status"]
         )
 
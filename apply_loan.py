@@ -1,6 +1,9 @@
 from flask import Blueprint, request, render_template, redirect, url_for, session
 from datetime import date, timedelta
 from singleton_db import DatabaseConnection
+from event_bus import bus, LOAN_CHANGED
+from amortization import build_schedule, insert_schedule
+from time_codec import format_hhmm
 
 loan_bp = Blueprint('loan', __name__, template_folder='../templates')
 
@@ -19,17 +22,14 @@ def get_user_account(user_id, account_number=None):
         """, (user_id,))
     return cursor.fetchone()
 
-def add_minutes_to_balance(balance, additional_minutes):
-    if not balance or ':' not in balance:
-        return "0:00"
+def parse_optional_int(value, label):
+    """None for a blank form field, the whole number otherwise; anything else is a ValueError for the user."""
+    if value is None or not value.strip():
+        return None
     try:
-        hours, minutes = map(int, balance.split(':'))
-        total_minutes = hours * 60 + minutes + additional_minutes
-        new_hours = total_minutes // 60
-        new_minutes = total_minutes % 60
-        return f"{new_hours}:{new_minutes:02d}"
-    except Exception:
-        return "0:00"
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{label} must be a whole number.")
 
 @loan_bp.route('/loan', methods=['GET'])
 def dashboard():
@@ -47,6 +47,7 @@ def dashboard():
 
     warnings = session.pop('warnings', [])
     message = session.pop('message', "")
+    account['balance'] = format_hhmm(account['balance_minutes'])
 
     cursor.execute("""
         SELECT loan_id, loan_amount, strategy, status, applied_at, repayment_due 
@@ -116,22 +117,34 @@ def apply_loan():
     status = "Approved" if loan_amount_hours <= 500 else "Rejected"
     repayment_due = date.today() + timedelta(days=5) if status == "Approved" else None
 
+    schedule = None
+    if status == "Approved" and strategy.lower() in ['installment', 'fixed']:
+        try:
+            installments = parse_optional_int(request.form.get('installments'), "Installments")
+            interval_days = parse_optional_int(request.form.get('interval_days'), "Installment interval")
+            schedule = build_schedule(loan_amount_hours, strategy, installments,
+                                      request.form.get('frequency', 'weekly'), interval_days)
+        except ValueError as e:
+            warnings.append(str(e))
+            session['warnings'] = warnings
+            return redirect(url_for('loan.dashboard', active_tab='alerts'))
+        # The loan is due when its last installment is.
+        repayment_due = schedule[-1].due_date
+
     cursor.execute("""
         INSERT INTO loans (user_id, loan_amount, status, strategy, repayment_due)
         VALUES (%s, %s, %s, %s, %s)
     """, (user_id, loan_amount_hours, status, strategy, repayment_due))
-    db.commit()
+    loan_id = cursor.lastrowid
 
     if status == "Approved":
         loan_amount_minutes = loan_amount_hours * 60
-        new_balance = add_minutes_to_balance(account['balance'], loan_amount_minutes)
 
-      
         cursor.execute("""
             UPDATE accounts 
-            SET balance = %s 
+            SET balance_minutes = balance_minutes + %s 
             WHERE user_id = %s AND account_number = %s
-        """, (new_balance, user_id, account_number))
+        """, (loan_amount_minutes, user_id, account_number))
 
         cursor.execute("""
             UPDATE users 
@@ -139,36 +152,12 @@ def apply_loan():
             WHERE id = %s
         """, (loan_amount_minutes, user_id))
 
-      
-        cursor.execute("""
-            SELECT loan_id FROM loans 
-            WHERE user_id = %s 
-            ORDER BY applied_at DESC 
-            LIMIT 1
-        """, (user_id,))
-        loan = cursor.fetchone()
-
-        if loan and strategy.lower() in ['installment', 'fixed']:
-            loan_id = loan['loan_id']
-            now = date.today()
-
-            if strategy.lower() == 'installment':
-                installment_amount = loan_amount_hours / 4
-                for i in range(4):
-                    due_date = now + timedelta(weeks=(i + 1))
-                    cursor.execute("""
-                        INSERT INTO repayments (loan_id, user_id, installment_number, amount, due_date, strategy, status)
-                        VALUES (%s, %s, %s, %s, %s, %s, 'Pending')
-                    """, (loan_id, user_id, i + 1, installment_amount, due_date, strategy))
-
-            elif strategy.lower() == 'fixed':
-                due_date = now + timedelta(weeks=4)
-                cursor.execute("""
-                    INSERT INTO repayments (loan_id, user_id, installment_number, amount, due_date, strategy, status)
-                    VALUES (%s, %s, %s, %s, %s, %s, 'Pending')
-                """, (loan_id, user_id, 1, loan_amount_hours, due_date, strategy))
+        if schedule:
+            insert_schedule(cursor, loan_id, user_id, strategy, schedule)
 
     db.commit()
+    if status == "Approved":
+        bus.publish(LOAN_CHANGED, {'user_id': user_id})
     session['message'] = f" Loan {status} for {loan_amount_hours} hours submitted."
     return redirect(url_for('loan.dashboard', active_tab='history'))
 
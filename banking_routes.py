@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify, render_template, session
 from facade import BankingFacade
+from time_codec import format_hhmm, parse_hhmm
 
 banking_bp = Blueprint('banking_bp', __name__, url_prefix='/banking')
 
@@ -30,12 +31,11 @@ def deposit():
     if not account:
         return jsonify({"error": "Account not found or is not linked to this user"}), 400
 
-    total_secs = BankingFacade.time_to_minutes(account[1]) * 60
-    new_total_secs = total_secs + total_minutes * 60
-    BankingFacade.update_account_balance(user_id, account_number, new_total_secs)
-    BankingFacade.update_user_balance(user_id, new_total_secs)
+    new_balance_minutes = BankingFacade.deposit(user_id, account_number, total_minutes)
+    if new_balance_minutes is None:
+        return jsonify({"error": "Invalid deposit amount"}), 400
 
-    new_total_balance = f"{new_total_secs // 3600:02}:{(new_total_secs % 3600) // 60:02}:00"
+    new_total_balance = format_hhmm(new_balance_minutes) + ":00"
     return jsonify({"message": "Deposit successful", "new_total_balance": new_total_balance})
 
 @banking_bp.route("/withdraw", methods=["POST"])
@@ -52,8 +52,7 @@ def withdraw():
         return jsonify({"error": "Missing account number or time field"}), 400
 
     try:
-        hours, minutes = map(int, time.strip().split(":"))
-        withdraw_minutes = hours * 60 + minutes
+        withdraw_minutes = parse_hhmm(time)
     except ValueError:
         return jsonify({"error": "Invalid time format, use HH:MM"}), 400
 
@@ -61,17 +60,11 @@ def withdraw():
     if not account:
         return jsonify({"error": "Account not found or is not linked to this user"}), 400
 
-    total_secs = BankingFacade.time_to_minutes(account[1]) * 60
-    withdraw_secs = withdraw_minutes * 60
-
-    if total_secs < withdraw_secs:
+    new_balance_minutes = BankingFacade.withdraw(user_id, account_number, withdraw_minutes)
+    if new_balance_minutes is None:
         return jsonify({"error": "Insufficient balance"}), 400
 
-    new_total_secs = total_secs - withdraw_secs
-    BankingFacade.update_account_balance(user_id, account_number, new_total_secs)
-    BankingFacade.update_user_balance(user_id, new_total_secs)
-
-    new_total_balance = f"{new_total_secs // 3600:02}:{(new_total_secs % 3600) // 60:02}:00"
+    new_total_balance = format_hhmm(new_balance_minutes) + ":00"
     return jsonify({"message": "Withdrawal successful", "new_total_balance": new_total_balance})
 
 @banking_bp.route("/balance", methods=["GET"])
@@ -88,5 +81,4 @@ def balance():
     if not account:
         return jsonify({"error": "Account not found or is not linked to this user"}), 400
 
-    current_balance = account[1]
-    return jsonify({"balance": BankingFacade.minutes_to_time(BankingFacade.time_to_minutes(current_balance))})
+    return jsonify({"balance": format_hhmm(account[1])})
@@ -0,0 +1,77 @@
+"""Compares JSON-era block hashing/storage with the binary block encoding.
+
+    python benchmarks/bench_block_codec.py --blocks 20000 --transactions 50
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from block_codec import Block, Transaction, decode_block, encode_block
+from blockchain import hash_block
+from merkle import leaf_hash
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocks", type=int, default=20_000)
+    parser.add_argument("--transactions", type=int, default=50, help="transactions per block")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    blocks = []
+    previous = None
+    for index in range(1, args.blocks + 1):
+        transactions = [
+            Transaction(rng.randrange(1, 10_000), rng.randrange(1, 10_000), rng.randrange(1, 6_000), 'transfer',
+                        1_700_000_000 + rng.random() * 1e7)
+            for _ in range(args.transactions)
+        ]
+        block = Block.seal(index, 1_700_000_000 + index, previous, transactions)
+        previous = block['hash']
+        blocks.append(block)
+    # The same blocks as the dicts the ledger used to hash and store.
+    dicts = []
+    for block in blocks:
+        legacy = {
+            'index': block.index,
+            'timestamp': block.timestamp,
+            'transactions': [txn.to_dict() for txn in block.transactions],
+            'previous_hash': block['previous_hash'],
+        }
+        legacy['hash'] = hash_block(legacy)
+        dicts.append(legacy)
+
+    json_hash, _ = timed(lambda: [hash_block(d) for d in dicts])
+    binary_hash, _ = timed(lambda: [b.compute_hash() for b in blocks])
+    cached_hash, _ = timed(lambda: [b.hash for b in blocks])
+
+    json_records = [encode_block(d) for d in dicts]
+    binary_records = [encode_block(b) for b in blocks]
+    json_decode, _ = timed(lambda: [decode_block(r) for r in json_records])
+    binary_decode, decoded = timed(lambda: [decode_block(r) for r in binary_records])
+    binary_leaves, _ = timed(lambda: [b.leaf_hashes() for b in decoded])
+    json_leaves, _ = timed(lambda: [[leaf_hash(t) for t in d['transactions']] for d in dicts])
+
+    json_size = sum(len(r) for r in json_records)
+    binary_size = sum(len(r) for r in binary_records)
+    print(f"blocks: {args.blocks:,} x {args.transactions} transactions")
+    print(f"hash    json {json_hash:8.3f}s  binary {binary_hash:8.3f}s  speedup {json_hash / binary_hash:6.1f}x"
+          f"  (cached: {cached_hash:.4f}s)")
+    print(f"decode  json {json_decode:8.3f}s  binary {binary_decode:8.3f}s  speedup {json_decode / binary_decode:6.1f}x")
+    print(f"leaves  json {json_leaves:8.3f}s  binary {binary_leaves:8.3f}s  speedup {json_leaves / binary_leaves:6.1f}x")
+    print(f"size    json {json_size / 1e6:7.1f}MB  binary {binary_size / 1e6:7.1f}MB  ratio   {json_size / binary_size:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Compares full, checkpointed and parallel verification of the ledger.
+
+    python benchmarks/bench_chain_verify.py --blocks 1000000
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blockchain import Blockchain
+from chain_verifier import ChainVerifier
+from ledger_store import LedgerStore
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+def append_blocks(blockchain, count, rng):
+    for _ in range(count):
+        txn = {
+            'sender': rng.randrange(1, 1000),
+            'receiver': rng.randrange(1, 1000),
+            'amount': rng.randrange(1, 600),
+            'type': 'transfer',
+            'timestamp': time.time(),
+        }
+        blockchain.seal_block([txn])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocks", type=int, default=1_000_000)
+    parser.add_argument("--tail", type=int, default=1_000, help="blocks appended before the incremental check")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    directory = tempfile.mkdtemp(prefix="chronobank-ledger-")
+    try:
+        # Large fsync batches: the build is setup, not what is measured.
+        store = LedgerStore(directory, sync_every=100_000, sync_interval=60)
+        blockchain = Blockchain(store=store)
+        build, _ = timed(append_blocks, blockchain, args.blocks - 1, rng)
+        verifier = ChainVerifier(store)
+
+        sequential, valid = timed(blockchain.is_chain_valid)
+        assert valid
+        parallel, audit = timed(verifier.full_audit, workers=args.workers)
+        assert audit['valid'], audit
+
+        append_blocks(blockchain, args.tail, rng)
+        incremental, result = timed(verifier.verify_incremental)
+        assert result['valid'] and result['verified_from'] == args.blocks + 1, result
+        noop, _ = timed(verifier.verify_incremental)
+
+        print(f"blocks: {len(store):,}  (built in {build:.1f}s)")
+        print(f"full, sequential (is_chain_valid)     {sequential:8.3f}s")
+        print(f"full audit, {args.workers} worker(s), {audit['ranges']} ranges   {parallel:8.3f}s"
+              f"  speedup {sequential / parallel:5.1f}x")
+        print(f"incremental, {args.tail:,} new blocks          {incremental:8.3f}s"
+              f"  speedup {sequential / incremental:8.0f}x")
+        print(f"incremental, nothing new               {noop:8.3f}s")
+        store.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Load test: how many idle alert streams one sse_gateway process holds.
+
+    python benchmarks/bench_sse_gateway.py --streams 5000
+
+Starts the gateway in a subprocess on a scratch SQLite database, opens
+--streams authenticated /monitor/events connections, then pushes large
+transfers (a transactions row plus its event through the bridge) and times
+how long the alerts take to reach their streams.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from event_bus import TRANSFERS
+
+
+def gateway_rss_kb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def seed_users(path, count):
+    from db_backends import SQLiteBackend
+
+    conn = SQLiteBackend(path).connect()
+    cursor = conn.cursor()
+    # High balances, so connecting does not raise low-balance alerts.
+    cursor.executemany("INSERT INTO users (username, password, total_balance_minutes) VALUES (%s, 'p', %s)",
+                       [(f"user{i}", 600_000) for i in range(count)])
+    conn.commit()
+    conn.close()
+
+
+def record_transfer(conn, user_id):
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO transactions (sender_id, receiver_id, sender_account_number, receiver_account_number,
+                                  amount_minutes, transaction_type)
+        VALUES (%s, %s, 0, 0, 6000, 'Transfer')
+    """, (user_id, user_id))
+    conn.commit()
+    cursor.close()
+
+
+async def open_stream(port, cookie, ready):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET /monitor/events HTTP/1.1\r\nHost: localhost\r\nCookie: session={cookie}\r\n\r\n".encode())
+    await writer.drain()
+    await reader.readuntil(b"retry:")
+    ready()
+    return reader, writer
+
+
+async def read_alert(reader):
+    while True:
+        line = await reader.readline()
+        if line.startswith(b"data:") and b"Suspicious" in line:
+            return time.perf_counter()
+
+
+async def run(args, port, bridge, database, cookies, gateway_pid):
+    from db_backends import SQLiteBackend
+
+    opened = 0
+
+    def ready():
+        nonlocal opened
+        opened += 1
+
+    started = time.perf_counter()
+    connections = []
+    for i in range(0, len(cookies), args.connect_batch):
+        connections += await asyncio.gather(*[open_stream(port, cookie, ready)
+                                              for cookie in cookies[i:i + args.connect_batch]])
+    connect_time = time.perf_counter() - started
+    await asyncio.sleep(1)
+    rss = gateway_rss_kb(gateway_pid)
+
+    sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    conn = SQLiteBackend(database).connect()
+    latencies = []
+    step = max(1, len(connections) // args.alerts)
+    for user_index in range(0, len(connections), step)[:args.alerts]:
+        reader, _ = connections[user_index]
+        waiting = asyncio.ensure_future(read_alert(reader))
+        sent = time.perf_counter()
+        record_transfer(conn, user_index + 1)
+        event = [TRANSFERS, [{'sender_id': user_index + 1, 'receiver_id': user_index + 1, 'amount_minutes': 6000}]]
+        sender.sendto(json.dumps(event).encode(), bridge)
+        latencies.append((await asyncio.wait_for(waiting, 10) - sent) * 1000)
+    conn.close()
+
+    for _, writer in connections:
+        writer.close()
+    latencies.sort()
+    print(f"streams held        {opened}")
+    print(f"connect all         {connect_time:.2f}s ({opened / connect_time:.0f}/s)")
+    print(f"gateway RSS         {rss / 1024:.1f} MB ({rss / max(opened, 1):.1f} KB per stream)")
+    print(f"alert latency p50   {latencies[len(latencies) // 2]:.2f} ms")
+    print(f"alert latency p99   {latencies[int(len(latencies) * 0.99) - 1]:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", type=int, default=5000)
+    parser.add_argument("--alerts", type=int, default=200, help="alerts pushed while all streams are open")
+    parser.add_argument("--connect-batch", type=int, default=500)
+    parser.add_argument("--port", type=int, default=18081)
+    args = parser.parse_args()
+
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    workdir = tempfile.mkdtemp(prefix="chronobank-sse-")
+    database = os.path.join(workdir, "bench.sqlite3")
+    bridge = os.path.join(workdir, "events.sock")
+    seed_users(database, args.streams)
+
+    from sse_gateway import SECRET_KEY, session_serializer
+    from datetime import timedelta
+    _, serializer = session_serializer(SECRET_KEY, timedelta(days=31))
+    cookies = [serializer.dumps({'user_id': i + 1}) for i in range(args.streams)]
+
+    env = dict(os.environ, CHRONOBANK_DB_BACKEND="sqlite", CHRONOBANK_SQLITE_PATH=database)
+    gateway = subprocess.Popen([sys.executable, os.path.join(ROOT, "sse_gateway.py"), "--host", "127.0.0.1",
+                                "--port", str(args.port), "--bridge", bridge], env=env, cwd=workdir,
+                               stdout=subprocess.DEVNULL)
+    try:
+        while not os.path.exists(bridge):
+            time.sleep(0.05)
+        time.sleep(0.2)
+        asyncio.run(run(args, args.port, bridge, database, cookies, gateway.pid))
+    finally:
+        gateway.terminate()
+        gateway.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Compares the scalar and NumPy batch paths of time_codec.
+
+    python benchmarks/bench_time_codec.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time_codec
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+# Malformed or unusual values: the batch path must accept exactly what
+# parse_hhmm accepts, with the same result.
+EDGE_CASES = ["12:345", "12:5", "12:60", "1:2:3", "12:34:", "12:34:56", "12:34:5x", " 12:34", "12:34 ",
+              "+1:30", "-1:30", "1:-3", "12", ":30", "1:", "1:3a", "a1:30", "1::30", "1:30:00:00",
+              "007:05", "1_0:30", "12:34\n", "9" * 16 + ":00",
+              "\uff11\uff12:30", "12:\uff13\uff10", "\u00e912:30", timedelta(days=1, hours=2), timedelta(minutes=-90),
+              b"12:30", 1230, None]
+
+
+def check_parity():
+    for value in EDGE_CASES:
+        try:
+            expected = time_codec.parse_hhmm(value)
+        except ValueError as e:
+            expected = str(e)
+        try:
+            got = int(time_codec.parse_hhmm_batch([value, "00:00"])[0])
+        except ValueError as e:
+            got = str(e)
+        assert got == expected, f"{value!r}: batch {got!r}, parse_hhmm {expected!r}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if time_codec.np is None:
+        sys.exit("NumPy is not installed; the batch path would fall back to the scalar one.")
+    check_parity()
+
+    rng = random.Random(args.seed)
+    minutes = [rng.randrange(0, 5000 * 60) for _ in range(args.rows)]
+    strings = [time_codec.format_hhmm(m) for m in minutes]
+
+    scalar_parse, parsed = timed(lambda: [time_codec.parse_hhmm(s) for s in strings])
+    batch_parse, parsed_batch = timed(time_codec.parse_hhmm_batch, strings)
+    assert parsed == parsed_batch.tolist()
+    column = time_codec.np.asarray(strings, dtype=time_codec.np.bytes_)
+    packed_parse, _ = timed(time_codec.parse_hhmm_batch, column)
+
+    scalar_format, formatted = timed(lambda: [time_codec.format_hhmm(m) for m in minutes])
+    batch_format, formatted_batch = timed(time_codec.format_hhmm_batch, minutes)
+    assert formatted == formatted_batch.tolist()
+
+    print(f"rows: {args.rows:,}")
+    print(f"parse   scalar {scalar_parse:8.3f}s  batch {batch_parse:8.3f}s  speedup {scalar_parse / batch_parse:6.1f}x")
+    print(f"parse   scalar {scalar_parse:8.3f}s  packed {packed_parse:7.3f}s  speedup {scalar_parse / packed_parse:6.1f}x"
+          "  (column already a bytes array)")
+    print(f"format  scalar {scalar_format:8.3f}s  batch {batch_format:8.3f}s  speedup {scalar_format / batch_format:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
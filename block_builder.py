@@ -0,0 +1,160 @@
+import threading
+import time
+
+from block_codec import Transaction
+
+MAX_BLOCK_TRANSACTIONS = 1000
+BLOCK_WINDOW = 0.05
+
+
+class PendingReceipt:
+    """Handed out on submit. txn_hash is known at once; the block position once the block is sealed."""
+
+    def __init__(self, txn_hash):
+        self.txn_hash = txn_hash
+        self._sealed = threading.Event()
+        self._receipt = None
+        self._error = None
+
+    def _resolve(self, receipt=None, error=None):
+        self._receipt = receipt
+        self._error = error
+        self._sealed.set()
+
+    def done(self):
+        return self._sealed.is_set()
+
+    def result(self, timeout=None):
+        """Waits for the block and returns {'block_index', 'leaf_position', 'txn_hash', 'merkle_root'}."""
+        if not self._sealed.wait(timeout):
+            raise TimeoutError("Block not sealed yet")
+        if self._error is not None:
+            raise self._error
+        return self._receipt
+
+
+class BlockBuilder:
+    """Collects ledger transactions and seals them into one Merkle block.
+
+    A block is sealed when it holds `max_transactions` transactions or when
+    the oldest pending one has waited `max_wait` seconds, whichever is first.
+    """
+
+    def __init__(self, blockchain, max_transactions=MAX_BLOCK_TRANSACTIONS, max_wait=BLOCK_WINDOW):
+        self.blockchain = blockchain
+        self.max_transactions = max_transactions
+        self.max_wait = max_wait
+        self._pending = []
+        self._opened_at = None
+        self._cond = threading.Condition()
+        self._seal_lock = threading.Lock()
+        self._worker = None
+        self._listeners = []
+        self._sealed = []
+
+    def add_listener(self, listener):
+        """Calls `listener(receipts)` with the receipt dicts of every sealed block.
+
+        Listeners run on the builder thread, never inside the caller's
+        database transaction.
+        """
+        self._listeners.append(listener)
+
+    def _start(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="block-builder", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._sealed and (not self._pending or time.monotonic() < self._opened_at + self.max_wait):
+                    timeout = self._opened_at + self.max_wait - time.monotonic() if self._pending else None
+                    self._cond.wait(timeout)
+                due = bool(self._pending) and time.monotonic() >= self._opened_at + self.max_wait
+            self._deliver()
+            if due:
+                self.flush()
+
+    def _deliver(self):
+        with self._cond:
+            sealed, self._sealed = self._sealed, []
+        for receipts in sealed:
+            for listener in self._listeners:
+                try:
+                    listener(receipts)
+                except Exception as e:
+                    print(f"[Block Builder] listener failed for block {receipts[0]['block_index']}: {e}")
+
+    def _add(self, sender_id, receiver_id, amount, txn_type):
+        return self._add_transaction(Transaction(sender_id, receiver_id, amount, txn_type, time.time()))
+
+    def _add_transaction(self, txn):
+        receipt = PendingReceipt(txn.hash)
+        if not self._pending:
+            self._opened_at = time.monotonic()
+        self._pending.append((txn, receipt))
+        return receipt
+
+    def submit(self, sender_id, receiver_id, amount, txn_type):
+        with self._cond:
+            self._start()
+            receipt = self._add(sender_id, receiver_id, amount, txn_type)
+            full = len(self._pending) >= self.max_transactions
+            self._cond.notify()
+        if full:
+            self.flush()
+        return receipt
+
+    def submit_many(self, entries, txn_type='transfer'):
+        """Adds every (sender_id, receiver_id, amount) entry and seals them in one block right away."""
+        return self.submit_transactions([Transaction(sender_id, receiver_id, amount, txn_type, time.time())
+                                         for sender_id, receiver_id, amount in entries])
+
+    def submit_transactions(self, transactions):
+        """Like submit_many, for Transactions built by the caller (their hashes are already known)."""
+        with self._seal_lock:
+            with self._cond:
+                self._start()
+                receipts = [self._add_transaction(txn) for txn in transactions]
+                batch = self._take()
+            self._seal(batch)
+        return receipts
+
+    def _take(self):
+        batch, self._pending = self._pending, []
+        self._opened_at = None
+        return batch
+
+    def close(self):
+        """Seals what is pending and runs the listeners for it before shutdown."""
+        self.flush()
+        self._deliver()
+
+    def flush(self):
+        """Seals whatever is pending now."""
+        with self._seal_lock:
+            with self._cond:
+                batch = self._take()
+            if batch:
+                self._seal(batch)
+
+    def _seal(self, batch):
+        try:
+            block = self.blockchain.seal_block([txn for txn, _ in batch])
+        except Exception as e:
+            for _, receipt in batch:
+                receipt._resolve(error=e)
+            return
+        receipts = []
+        for position, (_, receipt) in enumerate(batch):
+            receipts.append({
+                'block_index': block['index'],
+                'leaf_position': position,
+                'txn_hash': receipt.txn_hash,
+                'merkle_root': block['merkle_root'],
+            })
+            receipt._resolve(receipts[-1])
+        with self._cond:
+            self._sealed.append(receipts)
+            self._cond.notify()
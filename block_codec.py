@@ -0,0 +1,197 @@
+import hashlib
+import json
+import struct
+
+from merkle import merkle_root
+
+# Canonical binary encoding of ledger blocks; every integer is little-endian.
+#
+#   transaction: sender int64, receiver int64, amount (minutes) int64,
+#                timestamp float64, type (uint8 length + UTF-8)
+#   header:      index uint64, timestamp float64, previous_hash 32 bytes,
+#                merkle_root 32 bytes, tx_count uint32
+#   record:      FORMAT_VERSION byte, header, block hash 32 bytes, transactions
+#
+# A leaf hash is sha256(0x00 + transaction) and a block hash is
+# sha256(header). Records written before this format are JSON objects and
+# are decoded back into dicts.
+FORMAT_VERSION = 1
+TRANSACTION = struct.Struct("<qqqdB")
+HEADER = struct.Struct("<Qd32s32sI")
+GENESIS_PREVIOUS_HASH = bytes(32)
+
+
+class Transaction:
+    __slots__ = ('sender', 'receiver', 'amount', 'type', 'timestamp', '_encoded', '_hash')
+
+    def __init__(self, sender, receiver, amount, type, timestamp):
+        self.sender = sender
+        self.receiver = receiver
+        self.amount = amount
+        self.type = type
+        self.timestamp = timestamp
+        self._encoded = None
+        self._hash = None
+
+    @classmethod
+    def from_dict(cls, txn):
+        return cls(txn['sender'], txn['receiver'], txn['amount'], txn['type'], txn['timestamp'])
+
+    def encode(self):
+        if self._encoded is None:
+            txn_type = self.type.encode()
+            self._encoded = TRANSACTION.pack(self.sender, self.receiver, self.amount, self.timestamp,
+                                             len(txn_type)) + txn_type
+        return self._encoded
+
+    @property
+    def hash(self):
+        """Hex leaf hash; this is the transaction's txn_hash."""
+        if self._hash is None:
+            self._hash = hashlib.sha256(b"\x00" + self.encode()).hexdigest()
+        return self._hash
+
+    def to_dict(self):
+        return {
+            'sender': self.sender,
+            'receiver': self.receiver,
+            'amount': self.amount,
+            'type': self.type,
+            'timestamp': self.timestamp,
+        }
+
+
+class Block:
+    """A sealed ledger block. The hash is computed once and cached.
+
+    Blocks can be read like the dicts the ledger used to store
+    (block['index'], block['hash'], ...); hashes are returned as hex.
+    """
+
+    __slots__ = ('index', 'timestamp', 'previous_hash', 'merkle_root', 'tx_count', '_transactions', '_encoded_transactions',
+                 '_hash')
+
+    def __init__(self, index, timestamp, previous_hash, merkle_root, transactions, hash=None):
+        self.index = index
+        self.timestamp = timestamp
+        self.previous_hash = previous_hash
+        self.merkle_root = merkle_root
+        self._transactions = tuple(transactions)
+        self.tx_count = len(self._transactions)
+        self._encoded_transactions = None
+        self._hash = hash
+
+    @property
+    def transactions(self):
+        # Decoded blocks keep their transactions as bytes until they are asked for.
+        if self._transactions is None:
+            self._transactions = tuple(decode_transactions(self._encoded_transactions, self.tx_count))
+        return self._transactions
+
+    @classmethod
+    def seal(cls, index, timestamp, previous_hash, transactions):
+        """Builds a block; previous_hash is hex (or None for the genesis block)."""
+        transactions = tuple(transactions)
+        root = merkle_root([txn.hash for txn in transactions])
+        previous = bytes.fromhex(previous_hash) if previous_hash else GENESIS_PREVIOUS_HASH
+        return cls(index, timestamp, previous, bytes.fromhex(root), transactions)
+
+    def header(self):
+        return HEADER.pack(self.index, self.timestamp, self.previous_hash, self.merkle_root, self.tx_count)
+
+    def compute_hash(self):
+        return hashlib.sha256(self.header()).digest()
+
+    @property
+    def hash(self):
+        if self._hash is None:
+            self._hash = self.compute_hash()
+        return self._hash
+
+    def leaf_hashes(self):
+        if self._transactions is not None:
+            return [txn.hash for txn in self._transactions]
+        return [hashlib.sha256(b"\x00" + encoded).hexdigest()
+                for encoded in _split_transactions(self._encoded_transactions, self.tx_count)]
+
+    def encode(self):
+        if self._encoded_transactions is not None:
+            transactions = self._encoded_transactions
+        else:
+            transactions = b"".join(txn.encode() for txn in self._transactions)
+        return b"".join([bytes([FORMAT_VERSION]), self.header(), self.hash, transactions])
+
+    @classmethod
+    def decode(cls, data):
+        if data[0] != FORMAT_VERSION:
+            raise ValueError("Unknown block format %d" % data[0])
+        index, timestamp, previous_hash, root, tx_count = HEADER.unpack_from(data, 1)
+        offset = 1 + HEADER.size
+        block_hash = bytes(data[offset:offset + 32])
+        block = cls(index, timestamp, previous_hash, root, (), hash=block_hash)
+        block._transactions = None
+        block._encoded_transactions = bytes(data[offset + 32:])
+        block.tx_count = tx_count
+        return block
+
+    def to_dict(self):
+        return {
+            'index': self.index,
+            'timestamp': self.timestamp,
+            'previous_hash': self.previous_hash.hex(),
+            'merkle_root': self.merkle_root.hex(),
+            'tx_count': self.tx_count,
+            'transactions': [txn.to_dict() for txn in self.transactions],
+            'hash': self.hash.hex(),
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), sort_keys=True)
+
+    def __getitem__(self, key):
+        if key == 'index':
+            return self.index
+        if key == 'timestamp':
+            return self.timestamp
+        if key == 'previous_hash':
+            return self.previous_hash.hex()
+        if key == 'merkle_root':
+            return self.merkle_root.hex()
+        if key == 'tx_count':
+            return self.tx_count
+        if key == 'transactions':
+            return [txn.to_dict() for txn in self.transactions]
+        if key == 'hash':
+            return self.hash.hex()
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in ('index', 'timestamp', 'previous_hash', 'merkle_root', 'tx_count', 'transactions', 'hash')
+
+
+def _split_transactions(data, count):
+    offset = 0
+    for _ in range(count):
+        end = offset + TRANSACTION.size + data[offset + TRANSACTION.size - 1]
+        yield data[offset:end]
+        offset = end
+
+
+def decode_transactions(data, count):
+    for encoded in _split_transactions(data, count):
+        sender, receiver, amount, timestamp, _ = TRANSACTION.unpack_from(encoded)
+        txn = Transaction(sender, receiver, amount, encoded[TRANSACTION.size:].decode(), timestamp)
+        txn._encoded = encoded
+        yield txn
+
+
+def encode_block(block):
+    if isinstance(block, Block):
+        return block.encode()
+    return json.dumps(block, sort_keys=True, separators=(",", ":")).encode()
+
+
+def decode_block(data):
+    if data[:1] == b"{":
+        return json.loads(bytes(data))
+    return Block.decode(data)
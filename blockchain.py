@@ -2,49 +2,106 @@ import hashlib
 import json
 from time import time
 
-class Blockchain:
+from block_codec import Block, Transaction
+from merkle import leaf_hash, merkle_root
+
+MERKLE_HEADER_FIELDS = ('index', 'timestamp', 'previous_hash', 'merkle_root', 'tx_count')
+
+def hash_block(block):
+    if isinstance(block, Block):
+        return block.compute_hash().hex()
+    if 'merkle_root' in block:
+        header = {field: block[field] for field in MERKLE_HEADER_FIELDS}
+        return hashlib.sha256(json.dumps(header, sort_keys=True).encode()).hexdigest()
+    block_copy = block.copy()
+    block_copy['hash'] = ''
+    block_string = json.dumps(block_copy, sort_keys=True).encode()
+    return hashlib.sha256(block_string).hexdigest()
+
+def is_block_valid(block, previous):
+    """Checks one block against its predecessor (None for the genesis block)."""
+    if previous is None:
+        return True
+    if isinstance(block, Block):
+        return (block['previous_hash'] == previous['hash']
+                and block.compute_hash() == block.hash
+                and merkle_root(block.leaf_hashes()) == block['merkle_root'])
+    # Blocks stored as JSON dicts by earlier versions.
+    if block['previous_hash'] != previous['hash'] or block['hash'] != hash_block(block):
+        return False
+    if 'merkle_root' in block and block['merkle_root'] != merkle_root([leaf_hash(t) for t in block['transactions']]):
+        return False
+    return True
+
+class InMemoryStore:
     def __init__(self):
-        self.chain = []
+        self.blocks = []
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def __iter__(self):
+        return iter(self.blocks)
+
+    def get(self, index):
+        return self.blocks[index - 1]
+
+    def last(self):
+        return self.blocks[-1] if self.blocks else None
+
+    def append(self, build, only_if_empty=False):
+        if only_if_empty and self.blocks:
+            return None
+        block = build(self.last())
+        self.blocks.append(block)
+        return block
+
+class Blockchain:
+    def __init__(self, store=None):
+        # store defaults to an in-memory list; ledger_store.LedgerStore keeps
+        # the chain on disk and shares it between worker processes.
+        self.store = store if store is not None else InMemoryStore()
         self.pending_transactions = []
-        self.create_block(previous_hash='1')
+        if not getattr(self.store, 'read_only', False):
+            self.store.append(lambda last: Block.seal(1, time(), None, []), only_if_empty=True)
+
+    @property
+    def chain(self):
+        return list(self.store)
 
     def create_block(self, previous_hash):
-        block = {
-            'index': len(self.chain) + 1,
-            'timestamp': time(),
-            'transactions': self.pending_transactions,
-            'previous_hash': previous_hash,
-        }
-        block['hash'] = self.hash_block(block)
+        # The block links to the actual tail of the stored chain, which another
+        # worker may have extended since the caller read `previous_hash`.
+        block = self.seal_block(self.pending_transactions)
         self.pending_transactions = []
-        self.chain.append(block)
         return block
 
+    def seal_block(self, transactions):
+        """Appends one block committing to `transactions` through their Merkle root.
+
+        The block hash covers only the binary header, so each transaction is
+        hashed once (as a leaf) and the block hash is computed once.
+        """
+        transactions = [txn if isinstance(txn, Transaction) else Transaction.from_dict(txn) for txn in transactions]
+        return self.store.append(
+            lambda last: Block.seal(last['index'] + 1 if last else 1, time(), last['hash'] if last else None,
+                                    transactions)
+        )
+
     def add_transaction(self, sender_id, receiver_id, amount, txn_type):
-        self.pending_transactions.append({
-            'sender': sender_id,
-            'receiver': receiver_id,
-            'amount': amount,
-            'type': txn_type,
-            'timestamp': time()
-        })
+        self.pending_transactions.append(Transaction(sender_id, receiver_id, amount, txn_type, time()))
         return self.get_last_block()['index'] + 1
 
     def get_last_block(self):
-        return self.chain[-1]
+        return self.store.last()
 
     def hash_block(self, block):
-        block_copy = block.copy()
-        block_copy['hash'] = ''
-        block_string = json.dumps(block_copy, sort_keys=True).encode()
-        return hashlib.sha256(block_string).hexdigest()
+        return hash_block(block)
 
     def is_chain_valid(self):
-        for i in range(1, len(self.chain)):
-            curr = self.chain[i]
-            prev = self.chain[i - 1]
-            if curr['previous_hash'] != prev['hash']:
-                return False
-            if curr['hash'] != self.hash_block(curr):
+        prev = None
+        for curr in self.store:
+            if not is_block_valid(curr, prev):
                 return False
+            prev = curr
         return True
@@ -0,0 +1,158 @@
+import argparse
+import hashlib
+import hmac
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from blockchain import is_block_valid
+from ledger_store import LedgerStore, LEDGER_DIR
+
+LEDGER_KEY = os.environ.get("CHRONOBANK_LEDGER_KEY")
+AUDIT_RANGE_SIZE = 50000
+
+
+class ChainVerificationError(Exception):
+    pass
+
+
+def _verify_blocks(store, start, end):
+    """Verifies blocks start..end of `store` on their own.
+
+    The first block is only checked against its own hash; whether its
+    previous_hash matches the block before the range is up to the caller.
+    """
+    previous = None
+    for index in range(start, end + 1):
+        block = store.get(index)
+        if previous is None and index > 1:
+            previous = {'hash': block['previous_hash']}
+        if block['index'] != index or not is_block_valid(block, previous):
+            return {'valid': False, 'error_block': index}
+        previous = block
+    first = store.get(start)
+    return {
+        'valid': True,
+        'first_previous_hash': first['previous_hash'] if start > 1 else None,
+        'last_hash': previous['hash'],
+    }
+
+
+def _audit_range(directory, start, end):
+    store = LedgerStore(directory, read_only=True)
+    try:
+        return _verify_blocks(store, start, end)
+    finally:
+        store.close()
+
+
+class ChainVerifier:
+    """Verifies the ledger from a checkpoint instead of from genesis.
+
+    A checkpoint says "blocks 1..N are verified and block N has hash H". It is
+    HMAC-signed with CHRONOBANK_LEDGER_KEY when that is set, so it cannot be
+    moved forward by someone who can only write the ledger directory.
+    """
+
+    def __init__(self, store, checkpoint_path=None, key=LEDGER_KEY):
+        self.store = store
+        if checkpoint_path is None:
+            checkpoint_path = os.path.join(getattr(store, "directory", "."), "checkpoint.json")
+        self.checkpoint_path = checkpoint_path
+        self.key = key.encode() if isinstance(key, str) else key
+
+    def _signature(self, block_index, block_hash):
+        if not self.key:
+            return None
+        return hmac.new(self.key, f"{block_index}:{block_hash}".encode(), hashlib.sha256).hexdigest()
+
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return None
+        expected = self._signature(checkpoint['block_index'], checkpoint['block_hash'])
+        if expected is not None and not hmac.compare_digest(expected, checkpoint.get('signature') or ''):
+            raise ChainVerificationError("Checkpoint signature does not match")
+        return checkpoint
+
+    def save_checkpoint(self, block_index, block_hash):
+        checkpoint = {
+            'block_index': block_index,
+            'block_hash': block_hash,
+            'signature': self._signature(block_index, block_hash),
+        }
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+        return checkpoint
+
+    def verify_incremental(self):
+        """Verifies only the blocks appended since the last checkpoint, then moves it forward."""
+        try:
+            checkpoint = self.load_checkpoint()
+        except ChainVerificationError as e:
+            return {'valid': False, 'error': str(e)}
+
+        count = len(self.store)
+        start = 1
+        previous = None
+        if checkpoint:
+            anchor_index = checkpoint['block_index']
+            if anchor_index > count:
+                return {'valid': False, 'error': f"Chain is shorter than the checkpoint at block {anchor_index}"}
+            previous = self.store.get(anchor_index)
+            if previous['hash'] != checkpoint['block_hash']:
+                return {'valid': False, 'error_block': anchor_index, 'error': "Checkpointed block was rewritten"}
+            start = anchor_index + 1
+
+        for index in range(start, count + 1):
+            block = self.store.get(index)
+            if block['index'] != index or not is_block_valid(block, previous):
+                return {'valid': False, 'error_block': index}
+            previous = block
+
+        if count >= start:
+            self.save_checkpoint(count, previous['hash'])
+        return {'valid': True, 'verified_from': start, 'verified_to': count}
+
+    def full_audit(self, workers=None, range_size=AUDIT_RANGE_SIZE):
+        """Re-verifies the whole chain in parallel ranges and resets the checkpoint."""
+        count = len(self.store)
+        ranges = [(start, min(start + range_size - 1, count)) for start in range(1, count + 1, range_size)]
+        if isinstance(self.store, LedgerStore):
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_audit_range,
+                                        [self.store.directory] * len(ranges),
+                                        [start for start, _ in ranges],
+                                        [end for _, end in ranges]))
+        else:
+            results = [_verify_blocks(self.store, start, end) for start, end in ranges]
+
+        # Each range checked its own blocks; stitch the ranges together here.
+        last_hash = None
+        for (start, _), result in zip(ranges, results):
+            if not result['valid']:
+                return {'valid': False, 'error_block': result['error_block']}
+            if last_hash is not None and result['first_previous_hash'] != last_hash:
+                return {'valid': False, 'error_block': start}
+            last_hash = result['last_hash']
+
+        if count:
+            self.save_checkpoint(count, last_hash)
+        return {'valid': True, 'verified_from': 1, 'verified_to': count, 'ranges': len(ranges)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify the ChronoBank ledger.")
+    parser.add_argument("--full", action="store_true", help="re-verify every block instead of the new tail")
+    parser.add_argument("--workers", type=int, default=None, help="processes for --full")
+    parser.add_argument("--ledger-dir", default=LEDGER_DIR)
+    args = parser.parse_args()
+
+    verifier = ChainVerifier(LedgerStore(args.ledger_dir))
+    print(verifier.full_audit(args.workers) if args.full else verifier.verify_incremental())
@@ -63,7 +63,7 @@ def update_preferences():
 
     db = get_db_connection()
     cursor = db.cursor(dictionary=True)
-    cursor.execute("SELECT balance FROM accounts WHERE user_id = %s", (user_id,))
+    cursor.execute("SELECT balance_minutes FROM accounts WHERE user_id = %s", (user_id,))
     account = cursor.fetchone()
 
     if not account:
@@ -1,4 +1,4 @@
-from datetime import timedelta
+from time_codec import minutes_to_hours
 
 class CustomizeAccountBuilder:
     def __init__(self, account):
@@ -6,25 +6,11 @@ class CustomizeAccountBuilder:
         self.result = {}
 
     def convert_balance_to_hours(self):
-        """Converts the balance from HH:MM format to hours."""
-        balance = self.account.get('balance', '0:0')  
-
-        
-        if isinstance(balance, str):
-            try:
-                
-                hours, minutes = map(int, balance.split(':'))
-                balance_minutes = (hours * 60) + minutes  
-                balance_hours = balance_minutes / 60  
-            except ValueError:
-                
-                balance_hours = 0.0
-        else:
-            
-            try:
-                balance_hours = float(balance)
-            except (ValueError, TypeError):
-                balance_hours = 0.0
+        """Converts the balance from whole minutes to hours."""
+        try:
+            balance_hours = minutes_to_hours(self.account.get('balance_minutes'))
+        except (ValueError, TypeError):
+            balance_hours = 0.0
 
         self.result['balance_hours'] = round(balance_hours, 2)
         return self
@@ -0,0 +1,249 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import lru_cache
+
+MYSQL_CONFIG = {
+    "host": os.environ.get("CHRONOBANK_DB_HOST", "localhost"),
+    "user": os.environ.get("CHRONOBANK_DB_USER", "root"),
+    "password": os.environ.get("CHRONOBANK_DB_PASSWORD", ""),
+    "database": os.environ.get("CHRONOBANK_DB_NAME", "chronobank"),
+}
+
+SQLITE_PATH = os.environ.get("CHRONOBANK_SQLITE_PATH", "chronobank.sqlite3")
+
+
+class MySQLBackend:
+    dialect = "mysql"
+
+    def __init__(self, **config):
+        self.config = dict(MYSQL_CONFIG, **config)
+
+    def connect(self):
+        import mysql.connector
+
+        return mysql.connector.connect(**self.config)
+
+
+class SQLiteBackend:
+    """Embedded engine for benchmarking and profiling without a MySQL server.
+
+    Connections mimic the mysql.connector API used by the blueprints: `%s`
+    placeholders, cursor(dictionary=True, buffered=True), lastrowid and the
+    MySQL-only functions the queries rely on (NOW, SEC_TO_TIME, FLOOR, ...).
+    """
+
+    dialect = "sqlite"
+
+    def __init__(self, path=SQLITE_PATH, bootstrap=True):
+        self.path = path
+        self.bootstrap = bootstrap
+        self._bootstrapped = False
+        self._lock = threading.Lock()
+        # Every pooled connection to ":memory:" has to see the same database,
+        # so use a named shared-cache in-memory database instead.
+        if path == ":memory:":
+            self._target, self._uri = "file:chronobank?mode=memory&cache=shared", True
+        else:
+            self._target, self._uri = path, False
+
+    def connect(self):
+        raw = sqlite3.connect(
+            self._target,
+            uri=self._uri,
+            timeout=30,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+        )
+        _register_functions(raw)
+        if not self._uri:
+            raw.execute("PRAGMA journal_mode=WAL")
+        conn = SQLiteConnection(raw, self)
+
+        if self.bootstrap and not self._bootstrapped:
+            with self._lock:
+                if not self._bootstrapped:
+                    from migrations import run_migrations
+
+                    run_migrations(conn, self.dialect)
+                    self._bootstrapped = True
+        return conn
+
+
+class SQLiteConnection:
+    def __init__(self, raw, backend):
+        self._raw = raw
+        self._backend = backend
+
+    def cursor(self, dictionary=False, buffered=False, **kwargs):
+        return SQLiteCursor(self._raw.cursor(), dictionary)
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def close(self):
+        if self._raw is not None:
+            self._raw.close()
+            self._raw = None
+
+    def is_connected(self):
+        if self._raw is None:
+            return False
+        try:
+            self._raw.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        if not self.is_connected() and reconnect:
+            self.reconnect()
+
+    def reconnect(self, attempts=1, delay=0):
+        self.close()
+        self._raw = self._backend.connect()._raw
+
+    @property
+    def in_transaction(self):
+        return self._raw.in_transaction
+
+
+class SQLiteCursor:
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        if dictionary:
+            cursor.row_factory = _dict_row
+
+    def execute(self, operation, params=None):
+        if not self._cursor.connection.in_transaction and _LOCKING_READ.search(operation):
+            # Stand-in for SELECT ... FOR UPDATE: take the write lock up front so
+            # a concurrent writer cannot invalidate what this transaction read.
+            self._cursor.execute("BEGIN IMMEDIATE")
+        self._cursor.execute(translate_sql(operation), tuple(params or ()))
+
+    def executemany(self, operation, seq_params):
+        self._cursor.executemany(translate_sql(operation), [tuple(p) for p in seq_params])
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def _dict_row(cursor, row):
+    return {col[0]: value for col, value in zip(cursor.description, row)}
+
+
+_UPDATE_LIMIT = re.compile(r"^(\s*(?:UPDATE|DELETE)\b.*?)\s+LIMIT\s+\d+\s*;?\s*$", re.IGNORECASE | re.DOTALL)
+_LOCKING_READ = re.compile(r"\s+(?:FOR\s+UPDATE|LOCK\s+IN\s+SHARE\s+MODE)(?:\s+(?:SKIP\s+LOCKED|NOWAIT))?", re.IGNORECASE)
+_INSERT_IGNORE = re.compile(r"\bINSERT\s+IGNORE\b", re.IGNORECASE)
+
+
+@lru_cache(maxsize=512)
+def translate_sql(operation):
+    """Rewrites a MySQL-flavoured statement into one SQLite accepts."""
+    sql = operation.replace("%s", "?").replace("%%", "%")
+    sql = _UPDATE_LIMIT.sub(r"\1", sql)
+    # SQLite has no row locks; SQLiteCursor.execute takes the database write lock instead.
+    sql = _LOCKING_READ.sub("", sql)
+    sql = _INSERT_IGNORE.sub("INSERT OR IGNORE", sql)
+    return sql
+
+
+def _sec_to_time(seconds):
+    if seconds is None:
+        return None
+    seconds = int(seconds)
+    sign = "-" if seconds < 0 else ""
+    seconds = abs(seconds)
+    return f"{sign}{seconds // 3600:02d}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+
+def _time_to_sec(value):
+    if value is None:
+        return None
+    parts = [int(float(p)) for p in str(value).lstrip("-").split(":")]
+    parts += [0] * (3 - len(parts))
+    seconds = parts[0] * 3600 + parts[1] * 60 + parts[2]
+    return -seconds if str(value).startswith("-") else seconds
+
+
+def _register_functions(raw):
+    raw.create_function("NOW", 0, lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    raw.create_function("CURDATE", 0, lambda: date.today().isoformat())
+    raw.create_function("SEC_TO_TIME", 1, _sec_to_time, deterministic=True)
+    raw.create_function("TIME_TO_SEC", 1, _time_to_sec, deterministic=True)
+    raw.create_function("FLOOR", 1, lambda x: None if x is None else math.floor(x), deterministic=True)
+    raw.create_function("CEIL", 1, lambda x: None if x is None else math.ceil(x), deterministic=True)
+    raw.create_function("GREATEST", -1, lambda *args: max(args), deterministic=True)
+    raw.create_function("LEAST", -1, lambda *args: min(args), deterministic=True)
+
+
+def _parse_time(value):
+    text = value.decode()
+    negative = text.startswith("-")
+    parts = [int(float(p)) for p in text.lstrip("-").split(":")]
+    parts += [0] * (3 - len(parts))
+    delta = timedelta(hours=parts[0], minutes=parts[1], seconds=parts[2])
+    return -delta if negative else delta
+
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value.decode())
+
+
+# Return the same Python types mysql.connector does for these column types.
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(" "))
+sqlite3.register_adapter(timedelta, lambda d: _sec_to_time(d.total_seconds()))
+sqlite3.register_converter("DECIMAL", lambda v: Decimal(v.decode()))
+sqlite3.register_converter("DATE", lambda v: date.fromisoformat(v.decode()))
+sqlite3.register_converter("DATETIME", _parse_datetime)
+sqlite3.register_converter("TIMESTAMP", _parse_datetime)
+sqlite3.register_converter("TIME", _parse_time)
+
+
+def backend_from_config(name=None, **options):
+    name = (name or os.environ.get("CHRONOBANK_DB_BACKEND", "mysql")).lower()
+    if name == "mysql":
+        return MySQLBackend(**options)
+    if name == "sqlite":
+        return SQLiteBackend(**options)
+    raise ValueError(f"Unknown database backend: {name}")
@@ -0,0 +1,112 @@
+import json
+import os
+import queue
+import socket
+import threading
+
+# Topics and their payloads.
+TRANSFERS = 'transfers'  # [{'sender_id', 'receiver_id', 'amount_minutes'}, ...], one event per committed request
+LOAN_CHANGED = 'loan_changed'  # {'user_id'}
+REPAYMENT_CHANGED = 'repayment_changed'  # {'user_id'}
+BALANCE_CHANGED = 'balance_changed'  # {'user_id'}, for balance writes that are not transfers
+TOPICS = (TRANSFERS, LOAN_CHANGED, REPAYMENT_CHANGED, BALANCE_CHANGED)
+
+# Unix datagram socket of an sse_gateway process. When it is set, every event
+# published here is also sent there, so the gateway can push alerts for
+# writes made by this worker.
+EVENT_BRIDGE = os.environ.get("CHRONOBANK_EVENT_BRIDGE")
+BRIDGE_CHUNK = 500
+
+
+class EventBus:
+    """In-process publish/subscribe.
+
+    publish() only queues the event; handlers run one at a time on the bus
+    thread, so a publisher never waits for them and they never run inside the
+    publisher's DB transaction. Publish after commit.
+    """
+
+    def __init__(self):
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._events = queue.Queue()
+        self._worker = None
+
+    def subscribe(self, topic, handler):
+        with self._lock:
+            self._handlers.setdefault(topic, []).append(handler)
+
+    def unsubscribe(self, topic, handler):
+        with self._lock:
+            handlers = self._handlers.get(topic, [])
+            if handler in handlers:
+                handlers.remove(handler)
+
+    def publish(self, topic, payload):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="event-bus", daemon=True)
+                    self._worker.start()
+        self._events.put((topic, payload))
+
+    def _run(self):
+        while True:
+            topic, payload = self._events.get()
+            with self._lock:
+                handlers = list(self._handlers.get(topic, ()))
+            for handler in handlers:
+                try:
+                    handler(payload)
+                except Exception as e:
+                    print(f"[Event Bus] {topic} handler failed: {e}")
+
+
+class BridgeSender:
+    """Bus handler that forwards events to another process as JSON datagrams.
+
+    Sending never blocks; events are dropped while nobody is listening.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+
+    def handler(self, topic):
+        def forward(payload):
+            if isinstance(payload, list):
+                # Keeps bulk transfer events under the datagram size limit.
+                chunks = [payload[i:i + BRIDGE_CHUNK] for i in range(0, len(payload), BRIDGE_CHUNK)]
+            else:
+                chunks = [payload]
+            for chunk in chunks:
+                try:
+                    self._sock.sendto(json.dumps([topic, chunk]).encode(), self.path)
+                except OSError:
+                    pass
+        return forward
+
+
+def decode_bridge_event(datagram):
+    """Returns the (topic, payload) a BridgeSender sent."""
+    topic, payload = json.loads(datagram)
+    return topic, payload
+
+
+bus = EventBus()
+_bridge_handlers = {}
+
+
+def stop_forwarding():
+    """Unhooks the bridge; the process receiving bridged events calls this so they do not loop back."""
+    for topic, handler in _bridge_handlers.items():
+        bus.unsubscribe(topic, handler)
+    _bridge_handlers.clear()
+
+
+if EVENT_BRIDGE:
+    _bridge = BridgeSender(EVENT_BRIDGE)
+    for _topic in TOPICS:
+        _bridge_handlers[_topic] = _bridge.handler(_topic)
+        bus.subscribe(_topic, _bridge_handlers[_topic])
@@ -1,20 +1,17 @@
 from datetime import datetime
 from singleton_db import DatabaseConnection
+from event_bus import bus, BALANCE_CHANGED
+from time_codec import hours_to_minutes
 
 class Command:
     def execute(self): pass
     def undo(self): pass
 
-def format_minutes_to_time_string(minutes):
-    hours = minutes // 60
-    remaining_minutes = minutes % 60
-    return f"{hours:02d}:{remaining_minutes:02d}"
-
 def update_account_balance_from_user(cur, user_id):
-    cur.execute("SELECT total_balance_minutes FROM users WHERE id = %s", (user_id,))
-    minutes = cur.fetchone()[0]
-    formatted = format_minutes_to_time_string(minutes)
-    cur.execute("UPDATE accounts SET balance = %s WHERE user_id = %s", (formatted, user_id))
+    cur.execute("""
+        UPDATE accounts SET balance_minutes = (SELECT total_balance_minutes FROM users WHERE id = %s)
+        WHERE user_id = %s
+    """, (user_id, user_id))
 
 class AllocateTimeCommand(Command):
     def __init__(self, user_id, goal_id, hours):
@@ -27,7 +24,7 @@ class AllocateTimeCommand(Command):
         conn = DatabaseConnection.get_instance().get_connection()
         cur = conn.cursor()
         try:
-            minutes = int(self.hours * 60)
+            minutes = hours_to_minutes(self.hours)
 
             cur.execute("UPDATE time_goals SET saved_hours = saved_hours + %s WHERE id = %s", (self.hours, self.goal_id))
             cur.execute("UPDATE users SET total_balance_minutes = total_balance_minutes - %s WHERE id = %s", (minutes, self.user_id))
@@ -38,6 +35,7 @@ class AllocateTimeCommand(Command):
             self.transaction_id = cur.lastrowid
 
             conn.commit()
+            bus.publish(BALANCE_CHANGED, {'user_id': self.user_id})
         except Exception as e:
             print(f"Error during execution: {e}")
             conn.rollback()
@@ -49,7 +47,7 @@ class AllocateTimeCommand(Command):
         try:
             conn = DatabaseConnection.get_instance().get_connection()
             cur = conn.cursor()
-            minutes = int(self.hours * 60)
+            minutes = hours_to_minutes(self.hours)
 
             cur.execute("UPDATE users SET total_balance_minutes = total_balance_minutes + %s WHERE id = %s",
                         (minutes, self.user_id))
@@ -61,6 +59,7 @@ class AllocateTimeCommand(Command):
                 cur.execute("DELETE FROM goal_transactions WHERE id = %s", (self.transaction_id,))
 
             conn.commit()
+            bus.publish(BALANCE_CHANGED, {'user_id': self.user_id})
         except Exception as e:
             if conn:
                 conn.rollback()
@@ -80,7 +79,7 @@ class WithdrawTimeCommand(Command):
         try:
             conn = DatabaseConnection.get_instance().get_connection()
             cur = conn.cursor()
-            minutes = int(self.hours * 60)
+            minutes = hours_to_minutes(self.hours)
 
             cur.execute("UPDATE users SET total_balance_minutes = total_balance_minutes + %s WHERE id = %s",
                         (minutes, self.user_id))
@@ -93,6 +92,7 @@ class WithdrawTimeCommand(Command):
             self.transaction_id = cur.lastrowid
 
             conn.commit()
+            bus.publish(BALANCE_CHANGED, {'user_id': self.user_id})
         except Exception as e:
             if conn:
                 conn.rollback()
@@ -105,7 +105,7 @@ class WithdrawTimeCommand(Command):
         try:
             conn = DatabaseConnection.get_instance().get_connection()
             cur = conn.cursor()
-            minutes = int(self.hours * 60)
+            minutes = hours_to_minutes(self.hours)
 
             cur.execute("UPDATE users SET total_balance_minutes = total_balance_minutes - %s WHERE id = %s",
                         (minutes, self.user_id))
@@ -117,6 +117,7 @@ class WithdrawTimeCommand(Command):
                 cur.execute("DELETE FROM goal_transactions WHERE id = %s", (self.transaction_id,))
 
             conn.commit()
+            bus.publish(BALANCE_CHANGED, {'user_id': self.user_id})
         except Exception as e:
             if conn:
                 conn.rollback()
@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, request, redirect, session, flash,
 from goal_command import AllocateTimeCommand, WithdrawTimeCommand, DeleteGoalCommand, command_manager
 from goal_models import serialize_goal
 from singleton_db import DatabaseConnection
+from time_codec import format_hhmm, hours_to_minutes, parse_hours
 
 goal_bp = Blueprint('goal_bp', __name__)
 
@@ -13,11 +14,6 @@ def get_user_balance_minutes(user_id, conn):
     cur.execute("SELECT total_balance_minutes FROM users WHERE id = %s", (user_id,))
     return cur.fetchone()[0]
 
-def format_minutes_to_time_string(minutes):
-    hours = minutes // 60
-    remaining_minutes = minutes % 60
-    return f"{int(hours)}:{int(remaining_minutes):02d}"
-
 @goal_bp.route('/goals')
 def goals():
     if 'user_id' not in session:
@@ -28,7 +24,7 @@ def goals():
     try:
         conn = get_db_connection()
         total_balance_minutes = get_user_balance_minutes(user_id, conn)
-        total_balance = format_minutes_to_time_string(total_balance_minutes)
+        total_balance = format_hhmm(total_balance_minutes)
 
         cur = conn.cursor()
         cur.execute("SELECT * FROM time_goals WHERE user_id = %s", (user_id,))
@@ -50,7 +46,7 @@ def create_goal():
         title = request.form['title']
         time_str = request.form['hours']
         hours = convert_to_hours(time_str)
-        minutes_requested = int(hours * 60)
+        minutes_requested = hours_to_minutes(hours)
 
         try:
             conn = get_db_connection()
@@ -180,10 +176,7 @@ def redo():
 
 def convert_to_hours(time_str):
     try:
-        if ':' in time_str:
-            hh, mm = map(int, time_str.split(':'))
-            return hh + mm / 60
-        return float(time_str)
+        return parse_hours(time_str)
     except ValueError:
         flash("Invalid time format")
         return 0.0
@@ -0,0 +1,102 @@
+import atexit
+import os
+
+from blockchain import Blockchain
+from block_builder import BlockBuilder
+from chain_verifier import ChainVerifier
+from ledger_outbox import LedgerOutbox
+from ledger_receipts import find_receipt, index_receipts
+from ledger_sequencer import SequencerClient
+from ledger_store import LedgerStore
+from block_codec import Block
+from merkle import leaf_hash, merkle_proof
+
+# Unix socket of a running ledger_sequencer. When it is set, this process only
+# reads the ledger and leaves ordering and sealing to the sequencer.
+LEDGER_SEQUENCER = os.environ.get("CHRONOBANK_LEDGER_SEQUENCER")
+
+if LEDGER_SEQUENCER:
+    blockchain = Blockchain(store=LedgerStore(read_only=True))
+    block_builder = SequencerClient(LEDGER_SEQUENCER)
+else:
+    blockchain = Blockchain(store=LedgerStore())
+    block_builder = BlockBuilder(blockchain)
+chain_verifier = ChainVerifier(blockchain.store)
+
+
+def block_leaves(block):
+    if isinstance(block, Block):
+        return block.leaf_hashes()
+    # Merkle block stored as JSON by an earlier version.
+    return [leaf_hash(txn) for txn in block['transactions']]
+
+
+def rebuild_receipt_index(from_block=1):
+    """Re-indexes every Merkle block from `from_block` on, e.g. after a crash between sealing and indexing."""
+    for index in range(from_block, len(blockchain.store) + 1):
+        block = blockchain.store.get(index)
+        if 'merkle_root' not in block:
+            continue
+        index_receipts([
+            {'txn_hash': txn_hash, 'block_index': index, 'leaf_position': position}
+            for position, txn_hash in enumerate(block_leaves(block))
+        ])
+
+
+def index_blocks_since(timestamp, after=0):
+    """Indexes the tail blocks sealed at or after `timestamp` and returns the newest block's index.
+
+    Walks back from the newest block, stopping at block `after`, which the
+    caller has already indexed or checked.
+    """
+    newest = index = len(blockchain.store)
+    while index > max(after, 1):
+        block = blockchain.store.get(index)
+        if block['timestamp'] < timestamp:
+            break
+        if 'merkle_root' in block:
+            index_receipts([
+                {'txn_hash': txn_hash, 'block_index': index, 'leaf_position': position}
+                for position, txn_hash in enumerate(block_leaves(block))
+            ])
+        index -= 1
+    return newest
+
+
+def inclusion_proof(block_index, leaf_position):
+    """Everything a client needs to check a transaction against the chain offline."""
+    block = blockchain.store.get(block_index)
+    leaves = block_leaves(block)
+    proof = {
+        'txn_hash': leaves[leaf_position],
+        'transaction': block['transactions'][leaf_position],
+        'block_index': block['index'],
+        'leaf_position': leaf_position,
+        'merkle_root': block['merkle_root'],
+        'proof': merkle_proof(leaves, leaf_position),
+        'block_header': {
+            'index': block['index'],
+            'timestamp': block['timestamp'],
+            'previous_hash': block['previous_hash'],
+            'merkle_root': block['merkle_root'],
+            'tx_count': block['tx_count'],
+            'hash': block['hash'],
+        },
+    }
+    if isinstance(block, Block):
+        # The exact bytes behind txn_hash (sha256 of 0x00 + transaction) and
+        # the block hash (sha256 of the header).
+        proof['encoded_transaction'] = block.transactions[leaf_position].encode().hex()
+        proof['block_header']['encoded'] = block.header().hex()
+    return proof
+
+
+if not LEDGER_SEQUENCER:
+    # The sequencer indexes receipts itself.
+    block_builder.add_listener(index_receipts)
+
+ledger_outbox = LedgerOutbox(block_builder, recover=index_blocks_since)
+
+# Seal what is still pending before the store is closed on shutdown
+# (atexit runs handlers in reverse registration order).
+atexit.register(block_builder.close)
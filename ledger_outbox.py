@@ -0,0 +1,205 @@
+import fcntl
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from block_codec import Transaction
+from singleton_db import DatabaseConnection
+
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_POLL_INTERVAL = 1.0
+OUTBOX_LOCK = 'chronobank_ledger_outbox'
+
+_clock_lock = threading.Lock()
+_last_timestamp = 0.0
+
+
+def _ledger_timestamp():
+    # Strictly increasing within the process, so identical transfers made in
+    # the same instant still get different txn_hashes.
+    global _last_timestamp
+    with _clock_lock:
+        _last_timestamp = max(time.time(), _last_timestamp + 1e-6)
+        return _last_timestamp
+
+
+def enqueue_ledger_entries(cursor, entries, txn_type='transfer'):
+    """Writes (sender_id, receiver_id, amount_minutes) entries to the outbox and returns their txn_hashes.
+
+    Runs in the caller's transaction: the entries are committed (or rolled
+    back) together with the transfer that produced them. Several entries
+    share a batch_id and are sealed into one block together.
+    """
+    transactions = [Transaction(sender_id, receiver_id, amount_minutes, txn_type, _ledger_timestamp())
+                    for sender_id, receiver_id, amount_minutes in entries]
+    batch_id = transactions[0].hash if len(transactions) > 1 else None
+    cursor.executemany("""
+        INSERT INTO ledger_outbox (txn_hash, batch_id, sender_id, receiver_id, amount_minutes, txn_type, ledger_timestamp)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, [(txn.hash, batch_id, txn.sender, txn.receiver, txn.amount, txn.type, txn.timestamp) for txn in transactions])
+    return [txn.hash for txn in transactions]
+
+
+class LedgerOutbox:
+    """Moves committed outbox rows onto the ledger, off the request path.
+
+    A background thread takes a batch of rows and seals them into blocks,
+    then indexes the receipts and deletes the rows in a single commit. Rows
+    of one batch_id (one bulk request) always share a block; rows of single
+    transfers are sealed together. One drainer runs at a time across all
+    processes (GET_LOCK on MySQL, an flock next to the SQLite file).
+
+    A drainer that died between sealing and committing leaves rows whose
+    blocks are on the ledger but not indexed. So every drain first calls
+    `recover(since, after)`, which indexes the blocks newer than block
+    `after` sealed at or after `since` and returns the newest block index.
+    Rows whose txn_hash is then indexed are only deleted, so every entry
+    reaches the ledger once.
+    """
+
+    def __init__(self, block_builder, recover=None, batch_size=OUTBOX_BATCH_SIZE, poll_interval=OUTBOX_POLL_INTERVAL):
+        self.block_builder = block_builder
+        self.recover = recover
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        # Every block up to this one has been indexed or checked by this process.
+        self._recovered_through = 0
+
+    def start(self):
+        """Starts the drainer; call at startup so rows left by a previous run are delivered."""
+        if self._worker is None:
+            with self._start_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="ledger-outbox", daemon=True)
+                    self._worker.start()
+
+    def notify(self):
+        """Tells the worker that new rows were committed."""
+        self.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            try:
+                while self.drain() == self.batch_size:
+                    pass
+            except Exception as e:
+                print(f"[Ledger Outbox] delivery failed: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def drain(self):
+        """Delivers one batch of outbox rows and returns how many it took."""
+        db = DatabaseConnection.get_instance()
+        with db.pool.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                with self._drain_lock(db, cursor) as locked:
+                    if not locked:
+                        return 0
+                    self._recover(cursor)
+                    conn.commit()
+                    return self._deliver(conn, cursor)
+            finally:
+                cursor.close()
+
+    @contextmanager
+    def _drain_lock(self, db, cursor):
+        # One drainer across all worker processes; the others skip this round.
+        if db.dialect == "mysql":
+            cursor.execute("SELECT GET_LOCK(%s, 0) AS acquired", (OUTBOX_LOCK,))
+            locked = cursor.fetchone()['acquired'] == 1
+            try:
+                yield locked
+            finally:
+                if locked:
+                    cursor.execute("SELECT RELEASE_LOCK(%s)", (OUTBOX_LOCK,))
+                    cursor.fetchone()
+            return
+
+        path = getattr(db.backend, "path", ":memory:")
+        if path == ":memory:":
+            # An in-memory database is private to this process.
+            yield True
+            return
+        # The kernel drops the flock if the process dies, like GET_LOCK.
+        fd = os.open(f"{path}.outbox-lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                locked = True
+            except BlockingIOError:
+                locked = False
+            yield locked
+        finally:
+            os.close(fd)
+
+    def _recover(self, cursor):
+        cursor.execute("SELECT MIN(ledger_timestamp) AS since FROM ledger_outbox")
+        since = cursor.fetchone()['since']
+        if since is not None and self.recover is not None:
+            # Every block holding an outbox entry was sealed after the entry was made.
+            self._recovered_through = self.recover(since, self._recovered_through)
+
+    def _deliver(self, conn, cursor):
+        cursor.execute("""
+            SELECT id, txn_hash, batch_id, sender_id, receiver_id, amount_minutes, txn_type, ledger_timestamp
+            FROM ledger_outbox
+            ORDER BY id
+            LIMIT %s
+        """, (self.batch_size,))
+        rows = cursor.fetchall()
+        if not rows:
+            conn.rollback()
+            return 0
+        taken = len(rows)
+        batch_ids = sorted({row['batch_id'] for row in rows if row['batch_id'] is not None})
+        if batch_ids:
+            # The rest of any bulk request cut off by the LIMIT.
+            placeholders = ", ".join(["%s"] * len(batch_ids))
+            cursor.execute(f"""
+                SELECT id, txn_hash, batch_id, sender_id, receiver_id, amount_minutes, txn_type, ledger_timestamp
+                FROM ledger_outbox
+                WHERE batch_id IN ({placeholders}) AND id > %s
+                ORDER BY id
+            """, (*batch_ids, rows[-1]['id']))
+            rows += cursor.fetchall()
+
+        placeholders = ", ".join(["%s"] * len(rows))
+        cursor.execute(f"SELECT txn_hash FROM ledger_receipts WHERE txn_hash IN ({placeholders})",
+                       tuple(row['txn_hash'] for row in rows))
+        on_ledger = {row['txn_hash'] for row in cursor.fetchall()}
+        conn.rollback()
+
+        # Blocks in outbox order: one per batch_id, one for the single transfers.
+        blocks = {}
+        for row in rows:
+            if row['txn_hash'] in on_ledger:
+                continue
+            txn = Transaction(row['sender_id'], row['receiver_id'], row['amount_minutes'], row['txn_type'],
+                              row['ledger_timestamp'])
+            if txn.hash != row['txn_hash']:
+                raise Exception(f"Outbox row {row['id']} does not match its txn_hash")
+            blocks.setdefault(row['batch_id'], []).append(txn)
+
+        receipts = []
+        for transactions in blocks.values():
+            receipts += [receipt.result() for receipt in self.block_builder.submit_transactions(transactions)]
+
+        try:
+            if receipts:
+                cursor.executemany(
+                    "INSERT IGNORE INTO ledger_receipts (txn_hash, block_index, leaf_position) VALUES (%s, %s, %s)",
+                    [(r['txn_hash'], r['block_index'], r['leaf_position']) for r in receipts]
+                )
+            cursor.execute(f"DELETE FROM ledger_outbox WHERE id IN ({placeholders})",
+                           tuple(row['id'] for row in rows))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return taken
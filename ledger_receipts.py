@@ -0,0 +1,25 @@
+from singleton_db import DatabaseConnection
+
+
+def index_receipts(receipts):
+    """Stores txn_hash -> (block_index, leaf_position) for a sealed block."""
+    if not receipts:
+        return
+    with DatabaseConnection.get_instance().pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(
+                "INSERT IGNORE INTO ledger_receipts (txn_hash, block_index, leaf_position) VALUES (%s, %s, %s)",
+                [(r['txn_hash'], r['block_index'], r['leaf_position']) for r in receipts]
+            )
+            conn.commit()
+        finally:
+            cursor.close()
+
+
+def find_receipt(cursor, txn_hash):
+    cursor.execute(
+        "SELECT block_index, leaf_position FROM ledger_receipts WHERE txn_hash = %s",
+        (txn_hash,)
+    )
+    return cursor.fetchone()
@@ -0,0 +1,356 @@
+import argparse
+import asyncio
+import os
+import socket
+import struct
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from block_builder import BLOCK_WINDOW, MAX_BLOCK_TRANSACTIONS, PendingReceipt
+from block_codec import Transaction, decode_transactions
+
+SEQUENCER_SOCKET = os.environ.get("CHRONOBANK_LEDGER_SEQUENCER", "")
+
+# Every message is a FRAME (body length) followed by the body.
+#
+#   request:  REQUEST (request id, flags, transaction count) + encoded transactions
+#   response: RESPONSE (request id, status) + one RECEIPT per transaction,
+#             or a UTF-8 error message when status is not STATUS_OK
+#
+# Requests are pipelined: a client does not wait for a response before
+# sending its next request, and responses carry the request id they answer.
+FRAME = struct.Struct("<I")
+REQUEST = struct.Struct("<QBI")
+RESPONSE = struct.Struct("<QB")
+RECEIPT = struct.Struct("<QI32s")
+FLAG_SEAL_NOW = 1
+STATUS_OK = 0
+STATUS_ERROR = 1
+# Hashes of the latest transactions the sequencer took; a resubmission of one
+# of them is answered with the original's receipt instead of sealed again.
+RECENT_TRANSACTIONS = 65536
+
+CLIENT_BATCH_SIZE = 256
+CLIENT_BATCH_DELAY = 0.002
+# How long submit_transactions waits for the sequencer to seal, in seconds.
+CLIENT_TIMEOUT = 10
+CLIENT_CLOSE_TIMEOUT = 1
+
+
+class LedgerSequencer:
+    """Single writer of the ledger for every worker process on the host.
+
+    Transactions arrive from all workers over one Unix socket, get their
+    global order here and are sealed into Merkle blocks by size or time
+    window, exactly like BlockBuilder does within one process.
+
+    A client that timed out resubmits the same transactions (same hashes);
+    those among the last RECENT_TRANSACTIONS get the first copy's receipt.
+    """
+
+    def __init__(self, blockchain, socket_path, max_transactions=MAX_BLOCK_TRANSACTIONS, max_wait=BLOCK_WINDOW):
+        self.blockchain = blockchain
+        self.socket_path = socket_path
+        self.max_transactions = max_transactions
+        self.max_wait = max_wait
+        self._pending = []
+        self._recent = OrderedDict()  # txn_hash -> future of its receipt
+        self._timer = None
+        self._listeners = []
+        # Sealing writes to disk; one thread keeps blocks in submission order.
+        self._sealer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sequencer-seal")
+        self._notifier = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sequencer-notify")
+
+    def add_listener(self, listener):
+        """Calls `listener(receipts)` (on a worker thread) for every sealed block."""
+        self._listeners.append(listener)
+
+    async def serve(self):
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                header = await reader.readexactly(FRAME.size)
+                body = await reader.readexactly(FRAME.unpack(header)[0])
+                request_id, flags, count = REQUEST.unpack_from(body)
+                transactions = list(decode_transactions(body[REQUEST.size:], count))
+                futures = [self._enqueue(txn) for txn in transactions]
+                if flags & FLAG_SEAL_NOW or len(self._pending) >= self.max_transactions:
+                    await self._seal()
+                asyncio.ensure_future(self._respond(writer, request_id, futures))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _enqueue(self, txn):
+        future = self._recent.get(txn.hash)
+        if future is not None and not (future.done() and future.exception() is not None):
+            return future
+        future = asyncio.get_running_loop().create_future()
+        self._recent[txn.hash] = future
+        if len(self._recent) > RECENT_TRANSACTIONS:
+            self._recent.popitem(last=False)
+        self._pending.append((txn, future))
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.max_wait, lambda: asyncio.ensure_future(self._seal()))
+        return future
+
+    async def _seal(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            block = await loop.run_in_executor(self._sealer, self.blockchain.seal_block, [txn for txn, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        receipts = []
+        for position, (txn, future) in enumerate(batch):
+            future.set_result((block.index, position, block.merkle_root))
+            receipts.append({
+                'block_index': block.index,
+                'leaf_position': position,
+                'txn_hash': txn.hash,
+                'merkle_root': block['merkle_root'],
+            })
+        for listener in self._listeners:
+            loop.run_in_executor(self._notifier, _notify, listener, receipts)
+
+    async def _respond(self, writer, request_id, futures):
+        try:
+            results = await asyncio.gather(*futures)
+            body = RESPONSE.pack(request_id, STATUS_OK) + b"".join(RECEIPT.pack(*result) for result in results)
+        except Exception as e:
+            body = RESPONSE.pack(request_id, STATUS_ERROR) + str(e).encode()
+        try:
+            writer.write(FRAME.pack(len(body)) + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+def _notify(listener, receipts):
+    try:
+        listener(receipts)
+    except Exception as e:
+        print(f"[Ledger Sequencer] listener failed for block {receipts[0]['block_index']}: {e}")
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("Ledger sequencer closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+class SequencerClient:
+    """Drop-in for BlockBuilder in a worker process that hands sealing to the sequencer.
+
+    submit() returns at once with the transaction's hash; submissions from
+    all threads are batched into one request every CLIENT_BATCH_DELAY
+    seconds (or CLIENT_BATCH_SIZE transactions) and sent without waiting for
+    earlier responses.
+    """
+
+    def __init__(self, socket_path=SEQUENCER_SOCKET, batch_size=CLIENT_BATCH_SIZE, batch_delay=CLIENT_BATCH_DELAY,
+                 timeout=CLIENT_TIMEOUT):
+        self.socket_path = socket_path
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.timeout = timeout
+        self._queue = []
+        self._urgent = False
+        self._closing = False
+        self._inflight = {}
+        self._next_request = 0
+        self._sock = None
+        self._cond = threading.Condition()
+        self._sender = None
+
+    def _start(self):
+        if self._closing:
+            raise ConnectionError("Ledger sequencer client is closed")
+        if self._sender is None:
+            self._sender = threading.Thread(target=self._send_loop, name="sequencer-client", daemon=True)
+            self._sender.start()
+
+    def _add(self, sender_id, receiver_id, amount, txn_type):
+        return self._add_transaction(Transaction(sender_id, receiver_id, amount, txn_type, time.time()))
+
+    def _add_transaction(self, txn):
+        receipt = PendingReceipt(txn.hash)
+        self._queue.append((txn, receipt))
+        return receipt
+
+    def submit(self, sender_id, receiver_id, amount, txn_type):
+        with self._cond:
+            self._start()
+            receipt = self._add(sender_id, receiver_id, amount, txn_type)
+            self._cond.notify()
+        return receipt
+
+    def submit_many(self, entries, txn_type='transfer'):
+        """Adds every (sender_id, receiver_id, amount) entry and asks the sequencer to seal right away."""
+        return self.submit_transactions([Transaction(sender_id, receiver_id, amount, txn_type, time.time())
+                                         for sender_id, receiver_id, amount in entries])
+
+    def submit_transactions(self, transactions):
+        """Like submit_many, for Transactions built by the caller (their hashes are already known).
+
+        Raises TimeoutError if the sequencer has not sealed them all within
+        `timeout` seconds. Those not sent yet are withdrawn first; a
+        resubmission of the ones already sent gets their original receipts.
+        """
+        with self._cond:
+            self._start()
+            receipts = [self._add_transaction(txn) for txn in transactions]
+            self._urgent = True
+            self._cond.notify()
+        deadline = time.monotonic() + self.timeout
+        for receipt in receipts:
+            try:
+                receipt.result(timeout=max(0, deadline - time.monotonic()))
+            except TimeoutError:
+                with self._cond:
+                    withdrawn = {id(r) for r in receipts}
+                    self._queue = [(txn, r) for txn, r in self._queue if id(r) not in withdrawn]
+                raise TimeoutError(f"Ledger sequencer did not seal the transactions within {self.timeout}s")
+        return receipts
+
+    def _send_loop(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    if self._closing:
+                        return
+                    self._cond.wait()
+                deadline = time.monotonic() + self.batch_delay
+                while not self._urgent and not self._closing and len(self._queue) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._queue = self._queue, []
+                urgent, self._urgent = self._urgent, False
+            self._send(batch, urgent)
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.socket_path)
+        self._sock = sock
+        threading.Thread(target=self._read_loop, args=(sock,), name="sequencer-client-reader", daemon=True).start()
+
+    def _send(self, batch, urgent):
+        with self._cond:
+            self._next_request += 1
+            request_id = self._next_request
+            self._inflight[request_id] = [receipt for _, receipt in batch]
+        body = REQUEST.pack(request_id, FLAG_SEAL_NOW if urgent else 0, len(batch)) \
+            + b"".join(txn.encode() for txn, _ in batch)
+        try:
+            if self._sock is None:
+                self._connect()
+            self._sock.sendall(FRAME.pack(len(body)) + body)
+        except OSError as e:
+            self._fail(self._sock, ConnectionError(f"Ledger sequencer unavailable: {e}"))
+
+    def _read_loop(self, sock):
+        try:
+            while True:
+                body = _recv_exactly(sock, FRAME.unpack(_recv_exactly(sock, FRAME.size))[0])
+                request_id, status = RESPONSE.unpack_from(body)
+                with self._cond:
+                    receipts = self._inflight.pop(request_id, [])
+                if status != STATUS_OK:
+                    error = Exception(body[RESPONSE.size:].decode())
+                    for receipt in receipts:
+                        receipt._resolve(error=error)
+                    continue
+                for i, receipt in enumerate(receipts):
+                    block_index, position, root = RECEIPT.unpack_from(body, RESPONSE.size + i * RECEIPT.size)
+                    receipt._resolve({
+                        'block_index': block_index,
+                        'leaf_position': position,
+                        'txn_hash': receipt.txn_hash,
+                        'merkle_root': root.hex(),
+                    })
+        except (OSError, struct.error) as e:
+            self._fail(sock, ConnectionError(f"Ledger sequencer connection lost: {e}"))
+
+    def _fail(self, sock, error):
+        # Whatever was sent on this connection has no answer coming; the next
+        # batch reconnects.
+        with self._cond:
+            if sock is not None and self._sock is not sock:
+                return
+            inflight, self._inflight = self._inflight, {}
+            self._sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        for receipts in inflight.values():
+            for receipt in receipts:
+                receipt._resolve(error=error)
+
+    def close(self):
+        """Sends what is still queued before shutdown, waits briefly for the answers and disconnects.
+
+        The sender thread sends the last batch and exits; only then is the
+        socket closed, so the two never use it at the same time.
+        """
+        with self._cond:
+            self._closing = True
+            pending = [receipt for _, receipt in self._queue]
+            sender = self._sender
+            self._cond.notify()
+        deadline = time.monotonic() + CLIENT_CLOSE_TIMEOUT
+        if sender is not None:
+            sender.join(timeout=CLIENT_CLOSE_TIMEOUT)
+        for receipt in pending:
+            try:
+                receipt.result(timeout=max(0, deadline - time.monotonic()))
+            except Exception:
+                pass
+        with self._cond:
+            sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    from blockchain import Blockchain
+    from ledger_receipts import index_receipts
+    from ledger_store import LEDGER_DIR, LedgerStore
+
+    parser = argparse.ArgumentParser(description="Run the ChronoBank ledger sequencer.")
+    parser.add_argument("--socket", default=SEQUENCER_SOCKET or "chronobank-ledger.sock")
+    parser.add_argument("--ledger-dir", default=LEDGER_DIR)
+    args = parser.parse_args()
+
+    sequencer = LedgerSequencer(Blockchain(store=LedgerStore(args.ledger_dir)), args.socket)
+    sequencer.add_listener(index_receipts)
+    print(f"Ledger sequencer listening on {args.socket}")
+    asyncio.run(sequencer.serve())
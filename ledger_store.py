@@ -0,0 +1,311 @@
+import atexit
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from block_codec import decode_block, encode_block
+
+LEDGER_DIR = os.environ.get("CHRONOBANK_LEDGER_DIR", "ledger")
+
+SEGMENT_SIZE = 64 * 1024 * 1024
+SYNC_EVERY = 64
+SYNC_INTERVAL = 0.05
+
+# A segment is a sequence of records: payload length, crc32 of the payload,
+# then the block in block_codec's binary encoding.
+RECORD_HEADER = struct.Struct("<II")
+# index.dat holds one fixed-size entry per block (block N at entry N - 1):
+# segment number, record offset, record length.
+INDEX_ENTRY = struct.Struct("<IQI")
+
+
+class LedgerCorruptError(Exception):
+    pass
+
+
+class LedgerStore:
+    """Append-only, segmented block store shared by every process on the host.
+
+    Appends are serialised with an flock on the ledger directory, so all
+    workers extend one chain. Records are written to the segment before their
+    index entry and fsynced in batches (every `sync_every` blocks or
+    `sync_interval` seconds; a timer flushes a batch that no later append
+    completes). Reads go through mmaps of the segment files.
+    On open, a torn tail left by a crash is cut off and index entries missing
+    for complete records are rebuilt.
+
+    A `read_only` store skips recovery and cannot append; verifier worker
+    processes use it to read the chain next to a live writer.
+    """
+
+    def __init__(self, directory=LEDGER_DIR, segment_size=SEGMENT_SIZE, sync_every=SYNC_EVERY,
+                 sync_interval=SYNC_INTERVAL, read_only=False):
+        self.directory = directory
+        self.read_only = read_only
+        self.segment_size = segment_size
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self._lock = threading.RLock()
+        self._segment_fd = None
+        self._segment_no = None
+        self._segment_end = 0
+        self._maps = {}
+        self._count = 0
+        self._last = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._flush_timer = None
+        self._closed = False
+
+        if read_only:
+            self._lock_fd = None
+            # The ledger may not have been written yet when a reader starts.
+            os.makedirs(directory, exist_ok=True)
+            self._index_fd = os.open(os.path.join(directory, "index.dat"), os.O_RDONLY | os.O_CREAT, 0o644)
+            self._count = os.fstat(self._index_fd).st_size // INDEX_ENTRY.size
+            return
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock_fd = os.open(os.path.join(directory, "ledger.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        self._index_fd = os.open(os.path.join(directory, "index.dat"), os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        with self._exclusive():
+            self._recover()
+        atexit.register(self.close)
+
+    # -- locking -----------------------------------------------------------
+
+    @contextmanager
+    def _exclusive(self):
+        with self._lock:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    # -- files -------------------------------------------------------------
+
+    def _segment_path(self, segment_no):
+        return os.path.join(self.directory, "segment-%06d.log" % segment_no)
+
+    def _segment_numbers(self):
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith("segment-") and name.endswith(".log"):
+                numbers.append(int(name[len("segment-"):-len(".log")]))
+        return sorted(numbers)
+
+    def _open_segment(self, segment_no):
+        if self._segment_no == segment_no:
+            return
+        if self._segment_fd is not None:
+            os.fsync(self._segment_fd)
+            os.close(self._segment_fd)
+        self._segment_fd = os.open(self._segment_path(segment_no), os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self._segment_no = segment_no
+        self._segment_end = os.fstat(self._segment_fd).st_size
+
+    def _read_entry(self, position):
+        raw = os.pread(self._index_fd, INDEX_ENTRY.size, position * INDEX_ENTRY.size)
+        if len(raw) != INDEX_ENTRY.size:
+            raise LedgerCorruptError("Index entry %d is missing" % position)
+        return INDEX_ENTRY.unpack(raw)
+
+    def _map(self, segment_no, end):
+        mapped = self._maps.get(segment_no)
+        if mapped is None or len(mapped) < end:
+            # The active segment grows, so its map is replaced once a read
+            # goes past the end of the previous one.
+            if mapped is not None:
+                mapped.close()
+            with open(self._segment_path(segment_no), "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment_no] = mapped
+        return mapped
+
+    def _read_record(self, segment_no, offset, length):
+        mapped = self._map(segment_no, offset + length)
+        size, crc = RECORD_HEADER.unpack_from(mapped, offset)
+        payload = mapped[offset + RECORD_HEADER.size:offset + length]
+        if size != length - RECORD_HEADER.size or zlib.crc32(payload) != crc:
+            raise LedgerCorruptError("Bad record at segment %d offset %d" % (segment_no, offset))
+        return decode_block(payload)
+
+    # -- recovery ----------------------------------------------------------
+
+    def _recover(self):
+        index_size = os.fstat(self._index_fd).st_size
+        count = index_size // INDEX_ENTRY.size
+        if index_size % INDEX_ENTRY.size:
+            os.ftruncate(self._index_fd, count * INDEX_ENTRY.size)
+
+        # Drop index entries whose record did not make it to disk.
+        while count:
+            segment_no, offset, length = self._read_entry(count - 1)
+            path = self._segment_path(segment_no)
+            if os.path.exists(path) and os.path.getsize(path) >= offset + length:
+                try:
+                    self._read_record(segment_no, offset, length)
+                    break
+                except LedgerCorruptError:
+                    pass
+            count -= 1
+            os.ftruncate(self._index_fd, count * INDEX_ENTRY.size)
+
+        if count:
+            segment_no, offset, length = self._read_entry(count - 1)
+            position = offset + length
+        else:
+            segment_no, position = 0, 0
+
+        # Index whatever complete records follow the last indexed one, and cut
+        # the segment at the first torn record.
+        for number in [n for n in self._segment_numbers() if n >= segment_no]:
+            start = position if number == segment_no else 0
+            with open(self._segment_path(number), "r+b") as f:
+                data_end = os.fstat(f.fileno()).st_size
+                end = start
+                while end + RECORD_HEADER.size <= data_end:
+                    f.seek(end)
+                    size, crc = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+                    payload = f.read(size)
+                    if len(payload) != size or zlib.crc32(payload) != crc:
+                        break
+                    os.write(self._index_fd, INDEX_ENTRY.pack(number, end, RECORD_HEADER.size + size))
+                    count += 1
+                    end += RECORD_HEADER.size + size
+                torn = end < data_end
+                if torn:
+                    f.truncate(end)
+                    f.flush()
+                    os.fsync(f.fileno())
+            if end > start:
+                segment_no, position = number, end
+            if torn:
+                # Anything in later segments was written after the torn record.
+                for later in self._segment_numbers():
+                    if later > number:
+                        os.remove(self._segment_path(later))
+                break
+
+        os.fsync(self._index_fd)
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps.clear()
+        self._count = count
+        self._last = None
+        self._open_segment(segment_no)
+
+    def _refresh(self):
+        # Another process may have appended since we last looked.
+        count = os.fstat(self._index_fd).st_size // INDEX_ENTRY.size
+        if count != self._count:
+            self._count = count
+            self._last = None
+            if count and not self.read_only:
+                segment_no, offset, length = self._read_entry(count - 1)
+                self._open_segment(segment_no)
+                self._segment_end = offset + length
+
+    # -- public API --------------------------------------------------------
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return self._count
+
+    def get(self, index):
+        """Returns block `index` (1-based, like block['index'])."""
+        with self._lock:
+            segment_no, offset, length = self._read_entry(index - 1)
+            return self._read_record(segment_no, offset, length)
+
+    def last(self):
+        with self._lock:
+            self._refresh()
+            if not self._count:
+                return None
+            if self._last is None:
+                self._last = self.get(self._count)
+            return self._last
+
+    def __iter__(self):
+        for index in range(1, len(self) + 1):
+            yield self.get(index)
+
+    def append(self, build, only_if_empty=False):
+        """Appends the block `build(last_block)` returns and hands it back.
+
+        `build` runs under the ledger lock, so the last block it is given is
+        the real tail of the shared chain.
+        """
+        if self.read_only:
+            raise LedgerCorruptError("Ledger store was opened read-only")
+        with self._exclusive():
+            self._refresh()
+            if only_if_empty and self._count:
+                return None
+            block = build(self.last())
+            payload = encode_block(block)
+            record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+            # A writer that died mid-append can leave a record it never
+            # indexed, or part of an index entry; write after what is on disk.
+            if os.fstat(self._index_fd).st_size != self._count * INDEX_ENTRY.size:
+                os.ftruncate(self._index_fd, self._count * INDEX_ENTRY.size)
+            self._segment_end = os.fstat(self._segment_fd).st_size
+            if self._segment_end and self._segment_end + len(record) > self.segment_size:
+                self._open_segment(self._segment_no + 1)
+            offset = self._segment_end
+            os.write(self._segment_fd, record)
+            os.write(self._index_fd, INDEX_ENTRY.pack(self._segment_no, offset, len(record)))
+            self._segment_end += len(record)
+            self._count += 1
+            self._last = block
+
+            self._unsynced += 1
+            since_sync = time.monotonic() - self._last_sync
+            if self._unsynced >= self.sync_every or since_sync >= self.sync_interval:
+                self.sync()
+            elif self._flush_timer is None:
+                # Bounds how long the batch can stay unsynced if appends stop here.
+                self._flush_timer = threading.Timer(self.sync_interval - since_sync, self._flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+            return block
+
+    def _flush(self):
+        with self._lock:
+            self._flush_timer = None
+            if not self._closed:
+                self.sync()
+
+    def sync(self):
+        with self._lock:
+            if self._unsynced:
+                os.fsync(self._segment_fd)
+                os.fsync(self._index_fd)
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self.read_only:
+                self.sync()
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+            for fd in (self._segment_fd, self._index_fd, self._lock_fd):
+                if fd is not None:
+                    os.close(fd)
+            self._closed = True
@@ -0,0 +1,55 @@
+import hashlib
+import json
+
+
+def leaf_hash(txn):
+    """Hex sha256 of the canonical JSON of a transaction, the leaf hash of JSON-encoded blocks."""
+    return hashlib.sha256(json.dumps(txn, sort_keys=True).encode()).hexdigest()
+
+
+def node_hash(left, right):
+    # The 0x01 prefix keeps interior nodes from ever colliding with a leaf,
+    # whose preimage is JSON text.
+    return hashlib.sha256(b"\x01" + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def merkle_levels(leaves):
+    """Every level of the tree, leaves first. An odd node is carried up unchanged."""
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+
+def merkle_root(leaves):
+    if not leaves:
+        return hashlib.sha256(b"").hexdigest()
+    return merkle_levels(leaves)[-1][0]
+
+
+def merkle_proof(leaves, position):
+    """Sibling hashes from leaf `position` up to the root, as [side, hash] pairs.
+
+    side is "L" when the sibling sits to the left. A level where the node is
+    carried up without a sibling contributes nothing.
+    """
+    proof = []
+    for level in merkle_levels(leaves)[:-1]:
+        if position % 2:
+            proof.append(["L", level[position - 1]])
+        elif position + 1 < len(level):
+            proof.append(["R", level[position + 1]])
+        position //= 2
+    return proof
+
+
+def verify_proof(txn_hash, proof, root):
+    """Checks offline that `txn_hash` is a leaf of the tree with this root."""
+    current = txn_hash
+    for side, sibling in proof:
+        current = node_hash(sibling, current) if side == "L" else node_hash(current, sibling)
+    return current == root
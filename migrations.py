@@ -0,0 +1,347 @@
+import argparse
+
+from schema import TABLES
+
+
+class Migration:
+    def __init__(self, version, name, statements):
+        self.version = version
+        self.name = name
+        self.statements = statements
+
+    def statements_for(self, dialect):
+        return self.statements[dialect]
+
+
+def _same_for_both(*statements):
+    return {"mysql": list(statements), "sqlite": list(statements)}
+
+
+# repayment_strategy.calculate_installment_interest, per hour of the loan.
+_INSTALLMENT_RATE_SQL = "(CASE WHEN l.loan_amount <= 200 THEN 0.04 WHEN l.loan_amount <= 400 THEN 0.06 ELSE 0.10 END)"
+
+
+def _hhmm_to_minutes_sql(dialect, column):
+    # Legacy values are "H:MM", "HH:MM:SS" or, in a few old rows, decimal hours.
+    if dialect == "mysql":
+        as_minutes = (
+            f"CAST(SUBSTRING_INDEX({column}, ':', 1) AS SIGNED) * 60"
+            f" + CAST(SUBSTRING_INDEX(SUBSTRING_INDEX({column}, ':', 2), ':', -1) AS SIGNED)"
+        )
+        return f"CASE WHEN {column} LIKE '%:%' THEN {as_minutes} ELSE ROUND({column} * 60) END"
+    return (
+        f"CASE WHEN {column} LIKE '%:%' THEN TIME_TO_SEC({column}) / 60"
+        f" ELSE CAST(ROUND({column} * 60) AS INTEGER) END"
+    )
+
+
+MIGRATIONS = [
+    Migration(1, "initial schema", TABLES),
+    # Access paths of the hot queries. The sender-OR-receiver lookups are
+    # answered as a UNION of two range scans, one on each participant index,
+    # both already ordered by (timestamp, id).
+    Migration(2, "indexes for hot queries", _same_for_both(
+        "CREATE INDEX idx_transactions_sender ON transactions (sender_id, timestamp, id)",
+        "CREATE INDEX idx_transactions_receiver ON transactions (receiver_id, timestamp, id)",
+        "CREATE INDEX idx_transactions_txn_hash ON transactions (txn_hash)",
+        "CREATE INDEX idx_accounts_user ON accounts (user_id, account_number, is_deleted)",
+        "CREATE INDEX idx_loans_user_status ON loans (user_id, status, applied_at)",
+        "CREATE INDEX idx_repayments_loan_status ON repayments (loan_id, status, installment_number)",
+        "CREATE INDEX idx_money_time_transactions_user ON money_time_transactions (user_id, timestamp)",
+        "CREATE INDEX idx_time_goals_user ON time_goals (user_id)",
+        "CREATE INDEX idx_goal_transactions_goal ON goal_transactions (goal_id)",
+    )),
+    # Balances and ledger amounts become integer minutes so arithmetic can be
+    # done in SQL; "HH:MM" formatting only happens at the template/JSON edge.
+    Migration(3, "store balances as integer minutes", {
+        "mysql": [
+            "ALTER TABLE accounts ADD COLUMN balance_minutes BIGINT NOT NULL DEFAULT 0 AFTER account_type",
+            "UPDATE accounts SET balance_minutes = " + _hhmm_to_minutes_sql("mysql", "balance"),
+            "ALTER TABLE accounts DROP COLUMN balance",
+            "ALTER TABLE users DROP COLUMN total_balance",
+            """
+            ALTER TABLE transactions
+                ADD COLUMN amount_minutes BIGINT NOT NULL DEFAULT 0 AFTER receiver_account_number,
+                ADD COLUMN tax_minutes BIGINT NOT NULL DEFAULT 0 AFTER transaction_type,
+                ADD COLUMN bonus_minutes BIGINT NOT NULL DEFAULT 0 AFTER tax_minutes
+            """,
+            """
+            UPDATE transactions
+            SET amount_minutes = ROUND(time_amount * 60), tax_minutes = ROUND(tax * 60), bonus_minutes = ROUND(bonus * 60)
+            """,
+            "ALTER TABLE transactions DROP COLUMN time_amount, DROP COLUMN tax, DROP COLUMN bonus",
+            "ALTER TABLE repayments ADD COLUMN amount_minutes BIGINT NOT NULL DEFAULT 0 AFTER installment_number",
+            "UPDATE repayments SET amount_minutes = ROUND(amount * 60)",
+            "ALTER TABLE repayments DROP COLUMN amount",
+            "ALTER TABLE money_time_transactions ADD COLUMN time_minutes BIGINT NOT NULL DEFAULT 0 AFTER time_amount",
+            "UPDATE money_time_transactions SET time_minutes = " + _hhmm_to_minutes_sql("mysql", "time_equivalent"),
+            "ALTER TABLE money_time_transactions DROP COLUMN time_equivalent",
+        ],
+        "sqlite": [
+            "ALTER TABLE accounts ADD COLUMN balance_minutes BIGINT NOT NULL DEFAULT 0",
+            "UPDATE accounts SET balance_minutes = " + _hhmm_to_minutes_sql("sqlite", "balance"),
+            "ALTER TABLE accounts DROP COLUMN balance",
+            "ALTER TABLE users DROP COLUMN total_balance",
+            "ALTER TABLE transactions ADD COLUMN amount_minutes BIGINT NOT NULL DEFAULT 0",
+            "ALTER TABLE transactions ADD COLUMN tax_minutes BIGINT NOT NULL DEFAULT 0",
+            "ALTER TABLE transactions ADD COLUMN bonus_minutes BIGINT NOT NULL DEFAULT 0",
+            """
+            UPDATE transactions
+            SET amount_minutes = CAST(ROUND(time_amount * 60) AS INTEGER),
+                tax_minutes = CAST(ROUND(tax * 60) AS INTEGER),
+                bonus_minutes = CAST(ROUND(bonus * 60) AS INTEGER)
+            """,
+            "ALTER TABLE transactions DROP COLUMN time_amount",
+            "ALTER TABLE transactions DROP COLUMN tax",
+            "ALTER TABLE transactions DROP COLUMN bonus",
+            "ALTER TABLE repayments ADD COLUMN amount_minutes BIGINT NOT NULL DEFAULT 0",
+            "UPDATE repayments SET amount_minutes = CAST(ROUND(amount * 60) AS INTEGER)",
+            "ALTER TABLE repayments DROP COLUMN amount",
+            "ALTER TABLE money_time_transactions ADD COLUMN time_minutes BIGINT NOT NULL DEFAULT 0",
+            "UPDATE money_time_transactions SET time_minutes = " + _hhmm_to_minutes_sql("sqlite", "time_equivalent"),
+            "ALTER TABLE money_time_transactions DROP COLUMN time_equivalent",
+        ],
+    }),
+    # Where each transaction hash sits on the ledger, so an inclusion proof
+    # needs one lookup and one block read instead of a chain walk.
+    Migration(4, "ledger receipt index", {
+        "mysql": [
+            """
+            CREATE TABLE IF NOT EXISTS ledger_receipts (
+                txn_hash CHAR(64) PRIMARY KEY,
+                block_index BIGINT NOT NULL,
+                leaf_position INT NOT NULL
+            ) ENGINE=InnoDB
+            """,
+        ],
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS ledger_receipts (
+                txn_hash CHAR(64) PRIMARY KEY,
+                block_index INTEGER NOT NULL,
+                leaf_position INTEGER NOT NULL
+            )
+            """,
+        ],
+    }),
+    # Transfers commit their ledger entries here, in their own transaction;
+    # ledger_outbox.LedgerOutbox seals them into blocks afterwards and deletes
+    # each row once its receipt is indexed.
+    Migration(5, "ledger outbox", {
+        "mysql": [
+            """
+            CREATE TABLE IF NOT EXISTS ledger_outbox (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                txn_hash CHAR(64) NOT NULL UNIQUE,
+                sender_id INT NOT NULL,
+                receiver_id INT NOT NULL,
+                amount_minutes BIGINT NOT NULL,
+                txn_type VARCHAR(20) NOT NULL,
+                ledger_timestamp DOUBLE NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB
+            """,
+        ],
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS ledger_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                txn_hash CHAR(64) NOT NULL UNIQUE,
+                sender_id INTEGER NOT NULL,
+                receiver_id INTEGER NOT NULL,
+                amount_minutes BIGINT NOT NULL,
+                txn_type VARCHAR(20) NOT NULL,
+                ledger_timestamp DOUBLE NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime'))
+            )
+            """,
+        ],
+    }),
+    # Alerts sent to each user; the id is the SSE event id that clients
+    # resume from with Last-Event-ID.
+    Migration(6, "notification inbox", {
+        "mysql": [
+            """
+            CREATE TABLE IF NOT EXISTS notifications (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                user_id INT NOT NULL,
+                message VARCHAR(255) NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_notifications_user (user_id, id)
+            ) ENGINE=InnoDB
+            """,
+        ],
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS notifications (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                message VARCHAR(255) NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime'))
+            )
+            """,
+            "CREATE INDEX idx_notifications_user ON notifications (user_id, id)",
+        ],
+    }),
+    # High-water marks of incremental alert scans. The suspicious-transfer
+    # scan starts at the current last transaction, so history never alerts.
+    Migration(7, "alert scan marks", {
+        "mysql": [
+            """
+            CREATE TABLE IF NOT EXISTS alert_marks (
+                name VARCHAR(64) PRIMARY KEY,
+                last_id BIGINT NOT NULL
+            ) ENGINE=InnoDB
+            """,
+            "INSERT INTO alert_marks (name, last_id) SELECT 'suspicious_transfers', COALESCE(MAX(id), 0) FROM transactions",
+        ],
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS alert_marks (
+                name VARCHAR(64) PRIMARY KEY,
+                last_id INTEGER NOT NULL
+            )
+            """,
+            "INSERT INTO alert_marks (name, last_id) SELECT 'suspicious_transfers', COALESCE(MAX(id), 0) FROM transactions",
+        ],
+    }),
+    # One row per due-date reminder sent, so each is sent once whichever
+    # process fires it first.
+    Migration(8, "sent reminders", {
+        "mysql": [
+            """
+            CREATE TABLE IF NOT EXISTS sent_reminders (
+                kind VARCHAR(16) NOT NULL,
+                ref_id INT NOT NULL,
+                due_date DATE NOT NULL,
+                sent_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (kind, ref_id, due_date)
+            ) ENGINE=InnoDB
+            """,
+        ],
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS sent_reminders (
+                kind VARCHAR(16) NOT NULL,
+                ref_id INTEGER NOT NULL,
+                due_date DATE NOT NULL,
+                sent_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (kind, ref_id, due_date)
+            )
+            """,
+        ],
+    }),
+    # Each installment's share of the loan's interest, fixed by the schedule
+    # (amortization.build_schedule). Unpaid installments get the share
+    # InstallmentRepayment used to work out when they were paid.
+    Migration(9, "repayment interest", {
+        "mysql": [
+            "ALTER TABLE repayments ADD COLUMN interest_minutes BIGINT NOT NULL DEFAULT 0 AFTER amount_minutes",
+            """
+            UPDATE repayments r
+            JOIN loans l ON l.loan_id = r.loan_id
+            JOIN (SELECT loan_id, COUNT(*) AS installments FROM repayments GROUP BY loan_id) c ON c.loan_id = r.loan_id
+            SET r.interest_minutes = ROUND(l.loan_amount * """ + _INSTALLMENT_RATE_SQL + """ / c.installments * 60)
+            WHERE LOWER(r.strategy) = 'installment' AND LOWER(r.status) <> 'paid'
+            """,
+        ],
+        "sqlite": [
+            "ALTER TABLE repayments ADD COLUMN interest_minutes BIGINT NOT NULL DEFAULT 0",
+            """
+            UPDATE repayments SET interest_minutes = (
+                SELECT CAST(ROUND(l.loan_amount * """ + _INSTALLMENT_RATE_SQL + """
+                                  / (SELECT COUNT(*) FROM repayments c WHERE c.loan_id = repayments.loan_id) * 60) AS INTEGER)
+                FROM loans l WHERE l.loan_id = repayments.loan_id
+            )
+            WHERE LOWER(strategy) = 'installment' AND LOWER(status) <> 'paid'
+            """,
+        ],
+    }),
+    # Outbox rows of one bulk request share a batch_id and are sealed into
+    # one block; single transfers leave it NULL.
+    Migration(10, "ledger outbox batches", {
+        "mysql": [
+            "ALTER TABLE ledger_outbox ADD COLUMN batch_id CHAR(64) NULL AFTER txn_hash",
+            "CREATE INDEX idx_ledger_outbox_batch ON ledger_outbox (batch_id, id)",
+        ],
+        "sqlite": [
+            "ALTER TABLE ledger_outbox ADD COLUMN batch_id CHAR(64)",
+            "CREATE INDEX idx_ledger_outbox_batch ON ledger_outbox (batch_id, id)",
+        ],
+    }),
+]
+
+MIGRATIONS_TABLE = {
+    "mysql": """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB
+    """,
+    "sqlite": """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime'))
+        )
+    """,
+}
+
+
+def current_version(conn, dialect):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(MIGRATIONS_TABLE[dialect])
+        cursor.execute("SELECT MAX(version) FROM schema_migrations")
+        row = cursor.fetchone()
+        return row[0] or 0
+    finally:
+        cursor.close()
+
+
+def run_migrations(conn, dialect, target=None):
+    """Applies every pending migration up to `target`, each in its own commit."""
+    cursor = conn.cursor()
+    applied = []
+    try:
+        if dialect == "mysql":
+            # Several workers may start at once; only one of them migrates.
+            cursor.execute("SELECT GET_LOCK('chronobank_migrations', 60)")
+            cursor.fetchone()
+
+        version = current_version(conn, dialect)
+        for migration in MIGRATIONS:
+            if migration.version <= version or (target is not None and migration.version > target):
+                continue
+            try:
+                for statement in migration.statements_for(dialect):
+                    cursor.execute(statement)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (migration.version, migration.name),
+                )
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                raise Exception(f"Migration {migration.version} ({migration.name}) failed: {e}")
+            applied.append(migration.version)
+    finally:
+        if dialect == "mysql":
+            cursor.execute("SELECT RELEASE_LOCK('chronobank_migrations')")
+            cursor.fetchone()
+        cursor.close()
+    return applied
+
+
+if __name__ == "__main__":
+    from singleton_db import DatabaseConnection
+
+    parser = argparse.ArgumentParser(description="Apply pending ChronoBank schema migrations.")
+    parser.add_argument("--target", type=int, default=None, help="stop after this version")
+    args = parser.parse_args()
+
+    db = DatabaseConnection.get_instance()
+    with db.pool.connection() as conn:
+        applied = run_migrations(conn, db.dialect, args.target)
+        print(f"Applied migrations: {applied or 'none'}; schema at version {current_version(conn, db.dialect)}")
@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify, render_template, session
 from adapter import MoneyToTimeAdapter
 from adapter_legacy_system import LegacyBankSystem
 from singleton_db import DatabaseConnection
+from event_bus import bus, BALANCE_CHANGED
+from time_codec import format_hhmm
 import datetime
 
 money_time_transactions_bp = Blueprint('legacy', __name__)
@@ -38,20 +40,21 @@ def legacy_deposit():
 
         account_type = row[0]
 
-        time_equivalent_str = adapter.deposit(user_id, account_number, money_amount)
+        time_minutes = adapter.deposit(user_id, account_number, money_amount)
 
         cursor.execute('''
             INSERT INTO money_time_transactions
-            (user_id, account_type, transaction_type, time_amount, time_equivalent)
+            (user_id, account_type, transaction_type, time_amount, time_minutes)
             VALUES (%s, %s, %s, %s, %s)
-        ''', (user_id, account_type, 'deposit', money_amount, time_equivalent_str))
+        ''', (user_id, account_type, 'deposit', money_amount, time_minutes))
 
         conn.commit()
         cursor.close()
+        bus.publish(BALANCE_CHANGED, {'user_id': user_id})
 
         return jsonify({
             'message': 'Deposit successful via legacy system.',
-            'time_equivalent': time_equivalent_str
+            'time_equivalent': format_hhmm(time_minutes)
         })
 
     except Exception as e:
@@ -85,20 +88,21 @@ def legacy_withdraw():
 
         account_type = row[0]
 
-        time_equivalent_str = adapter.withdraw(user_id, account_number, money_amount)
+        time_minutes = adapter.withdraw(user_id, account_number, money_amount)
 
         cursor.execute('''
             INSERT INTO money_time_transactions 
-            (user_id, account_type, transaction_type, time_amount, time_equivalent)
+            (user_id, account_type, transaction_type, time_amount, time_minutes)
             VALUES (%s, %s, %s, %s, %s)
-        ''', (user_id, account_type, 'withdraw', money_amount, time_equivalent_str))
+        ''', (user_id, account_type, 'withdraw', money_amount, time_minutes))
 
         conn.commit()
         cursor.close()
+        bus.publish(BALANCE_CHANGED, {'user_id': user_id})
 
         return jsonify({
             'message': 'Withdrawal successful via legacy system.',
-            'time_equivalent': time_equivalent_str
+            'time_equivalent': format_hhmm(time_minutes)
         })
 
     except Exception as e:
@@ -119,7 +123,7 @@ def get_transactions():
     cursor = conn.cursor(dictionary=True)
 
     cursor.execute(''' 
-        SELECT transaction_type, time_amount, timestamp, time_equivalent 
+        SELECT transaction_type, time_amount, timestamp, time_minutes 
         FROM money_time_transactions 
         WHERE user_id = %s 
         ORDER BY timestamp DESC
@@ -133,7 +137,7 @@ def get_transactions():
             'type': row['transaction_type'],
             'amount': row['time_amount'],
             'timestamp': row['timestamp'].strftime('%Y-%m-%d %H:%M:%S') if isinstance(row['timestamp'], datetime.datetime) else row['timestamp'],
-            'time_equivalent': row['time_equivalent']
+            'time_equivalent': format_hhmm(row['time_minutes'])
         }
         for row in transactions
     ]
@@ -0,0 +1,113 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from singleton_db import DatabaseConnection
+
+NOTIFICATION_TTL = timedelta(days=7)
+COMPACT_INTERVAL = 3600
+COMPACT_BATCH = 5000
+REPLAY_PAGE = 500
+
+
+class NotificationInbox:
+    """Every alert a user was sent, kept for NOTIFICATION_TTL.
+
+    Notification ids come from one auto-increment column, so they only grow
+    and double as SSE event ids: a client that reconnects with Last-Event-ID
+    gets the rows after that id from the (user_id, id) index.
+    """
+
+    def __init__(self, ttl=NOTIFICATION_TTL, compact_interval=COMPACT_INTERVAL):
+        self.ttl = ttl
+        self.compact_interval = compact_interval
+        self._last_compacted = None  # the first call after startup compacts
+        self._lock = threading.Lock()
+
+    def add(self, cursor, user_id, message):
+        """Inserts one notification in the caller's transaction and returns its event id."""
+        cursor.execute("INSERT INTO notifications (user_id, message) VALUES (%s, %s)", (user_id, message))
+        return cursor.lastrowid
+
+    def append(self, user_id, message):
+        """Stores one notification and returns its event id."""
+        with DatabaseConnection.get_instance().pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                event_id = self.add(cursor, user_id, message)
+                conn.commit()
+            finally:
+                cursor.close()
+        self.maybe_compact()
+        return event_id
+
+    def since(self, user_id, last_event_id, limit=REPLAY_PAGE):
+        """Up to `limit` notifications after `last_event_id`, oldest first, as {'id', 'message'} dicts."""
+        with DatabaseConnection.get_instance().pool.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute("""
+                    SELECT id, message FROM notifications
+                    WHERE user_id = %s AND id > %s
+                    ORDER BY id
+                    LIMIT %s
+                """, (user_id, last_event_id, limit))
+                rows = cursor.fetchall()
+                conn.rollback()
+            finally:
+                cursor.close()
+        return rows
+
+    def pages(self, user_id, last_event_id, size=REPLAY_PAGE):
+        """Yields every notification after `last_event_id` in pages of at most `size`, oldest first."""
+        while True:
+            page = self.since(user_id, last_event_id, size)
+            if page:
+                yield page
+            if len(page) < size:
+                return
+            last_event_id = page[-1]['id']
+
+    def maybe_compact(self):
+        """Runs compact() if compact_interval has passed since the last run; call it after storing alerts."""
+        with self._lock:
+            if self._last_compacted is not None and time.monotonic() - self._last_compacted < self.compact_interval:
+                return
+            self._last_compacted = time.monotonic()
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"[Notification Inbox] compaction failed: {e}")
+
+    def compact(self):
+        """Deletes notifications older than the TTL and returns how many went."""
+        cutoff = (datetime.now() - self.ttl).strftime('%Y-%m-%d %H:%M:%S')
+        deleted = 0
+        with DatabaseConnection.get_instance().pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                # Ids grow with created_at, so everything below the first
+                # unexpired id has expired; finding it walks only expired rows.
+                cursor.execute("SELECT MIN(id) FROM notifications")
+                low = cursor.fetchone()[0]
+                cursor.execute("SELECT id FROM notifications WHERE created_at >= %s ORDER BY id LIMIT 1", (cutoff,))
+                row = cursor.fetchone()
+                if row is not None:
+                    boundary = row[0]
+                else:
+                    cursor.execute("SELECT MAX(id) FROM notifications")
+                    high = cursor.fetchone()[0]
+                    boundary = high + 1 if high is not None else None
+                conn.rollback()
+                if low is None or boundary is None:
+                    return 0
+                # Short transactions, so appends are never held up for long.
+                while low < boundary:
+                    upper = min(low + COMPACT_BATCH, boundary)
+                    cursor.execute("DELETE FROM notifications WHERE id >= %s AND id < %s", (low, upper))
+                    deleted += cursor.rowcount
+                    conn.commit()
+                    low = upper
+            finally:
+                cursor.close()
+        return deleted
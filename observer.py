@@ -12,6 +12,9 @@ class Subject:
     def remove_observer(self, observer: Observer):
         self._observers.remove(observer)
 
+    def observers(self):
+        return list(self._observers)
+
     def notify_observers(self, message):
         for observer in self._observers:
             observer.update(message)
@@ -0,0 +1,173 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from singleton_db import DatabaseConnection
+from time_codec import format_hhmm
+
+REMINDER_LEAD = timedelta(hours=24)
+MAX_SLEEP = 300  # re-reads the wall clock at least this often, in seconds
+RETRY_DELAY = 30
+QUERY_CHUNK = 500
+
+LOAN_REMINDERS = """
+    SELECT l.loan_id, l.user_id, l.loan_amount, l.repayment_due FROM loans l
+    WHERE l.status = 'Approved' AND l.repayment_due IS NOT NULL{users}
+"""
+INSTALLMENT_REMINDERS = """
+    SELECT r.repayment_id, r.loan_id, l.user_id, r.installment_number, r.amount_minutes, r.interest_minutes, r.due_date
+    FROM repayments r JOIN loans l ON l.loan_id = r.loan_id
+    WHERE l.status = 'Approved' AND r.due_date IS NOT NULL AND LOWER(r.status) <> 'paid'{users}
+"""
+# A reminder is sent by whichever process claims it first, and only if the
+# loan or installment is still outstanding with the same due date.
+CLAIMS = {
+    'loan': """
+        INSERT IGNORE INTO sent_reminders (kind, ref_id, due_date)
+        SELECT 'loan', loan_id, repayment_due FROM loans
+        WHERE loan_id = %s AND repayment_due = %s AND status = 'Approved'
+    """,
+    'installment': """
+        INSERT IGNORE INTO sent_reminders (kind, ref_id, due_date)
+        SELECT 'installment', r.repayment_id, r.due_date FROM repayments r JOIN loans l ON l.loan_id = r.loan_id
+        WHERE r.repayment_id = %s AND r.due_date = %s AND LOWER(r.status) <> 'paid' AND l.status = 'Approved'
+    """,
+}
+
+Reminder = namedtuple('Reminder', 'fire_at kind ref_id user_id due_date message')
+
+
+class ReminderScheduler:
+    """Fires loan and installment due-date reminders from a min-heap of timers.
+
+    Timers are loaded once from loans.repayment_due and repayments.due_date,
+    then refreshed per user by reload(). The thread sleeps until the earliest
+    timer is due, so nothing is queried between deadlines. A reminder fires
+    REMINDER_LEAD before its due date; sent_reminders records it, so it is
+    sent once across processes and restarts.
+    """
+
+    def __init__(self, inbox, push, lead=REMINDER_LEAD):
+        self.inbox = inbox
+        self.push = push
+        self.lead = lead
+        self._heap = []
+        self._timers = {}  # (kind, ref_id) -> Reminder
+        self._by_user = {}  # user_id -> {(kind, ref_id)}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._worker = None
+
+    def start(self):
+        with self._cond:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="reminder-scheduler", daemon=True)
+                self._worker.start()
+
+    def reload(self, user_ids):
+        """Replaces the users' timers with their outstanding loans and installments."""
+        user_ids = sorted(set(user_ids))
+        reminders = []
+        for i in range(0, len(user_ids), QUERY_CHUNK):
+            reminders += self._query(user_ids[i:i + QUERY_CHUNK])
+        with self._cond:
+            for user_id in user_ids:
+                for key in self._by_user.pop(user_id, ()):
+                    self._timers.pop(key, None)
+            self._schedule(reminders)
+
+    def _query(self, user_ids=None):
+        users, params = "", ()
+        if user_ids is not None:
+            users = f" AND l.user_id IN ({', '.join(['%s'] * len(user_ids))})"
+            params = tuple(user_ids)
+        with DatabaseConnection.get_instance().pool.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute(LOAN_REMINDERS.format(users=users), params)
+                loans = cursor.fetchall()
+                cursor.execute(INSTALLMENT_REMINDERS.format(users=users), params)
+                installments = cursor.fetchall()
+                conn.rollback()
+            finally:
+                cursor.close()
+
+        reminders = [self._reminder('loan', loan['loan_id'], loan['user_id'], loan['repayment_due'],
+                                    f"⏰ Reminder: Loan repayment due soon for User {loan['user_id']}. "
+                                    f"Loan amount: {loan['loan_amount']}")
+                     for loan in loans]
+        reminders += [self._reminder('installment', row['repayment_id'], row['user_id'], row['due_date'],
+                                     f"⏰ Reminder: Installment {row['installment_number']} of loan {row['loan_id']} "
+                                     f"due soon for User {row['user_id']}. "
+                                     f"Amount: {format_hhmm(row['amount_minutes'] + row['interest_minutes'])}")
+                      for row in installments]
+        return reminders
+
+    def _reminder(self, kind, ref_id, user_id, due_date, message):
+        fire_at = datetime.combine(due_date, datetime.min.time()) - self.lead
+        return Reminder(fire_at.timestamp(), kind, ref_id, user_id, due_date, message)
+
+    def _schedule(self, reminders):
+        # Replaced timers stay in the heap and are skipped when popped.
+        for reminder in reminders:
+            key = (reminder.kind, reminder.ref_id)
+            self._timers[key] = reminder
+            self._by_user.setdefault(reminder.user_id, set()).add(key)
+            heapq.heappush(self._heap, (reminder.fire_at, next(self._seq), reminder))
+        self._cond.notify()
+
+    def _run(self):
+        while True:
+            try:
+                reminders = self._query()
+                break
+            except Exception as e:
+                print(f"[Reminder Scheduler] loading timers failed: {e}")
+                time.sleep(RETRY_DELAY)
+        with self._cond:
+            self._schedule(reminders)
+
+        while True:
+            with self._cond:
+                due = []
+                now = time.time()
+                while self._heap and self._heap[0][0] <= now:
+                    reminder = heapq.heappop(self._heap)[2]
+                    if self._timers.get((reminder.kind, reminder.ref_id)) is reminder:
+                        due.append(reminder)
+                if not due:
+                    timeout = min(self._heap[0][0] - now, MAX_SLEEP) if self._heap else MAX_SLEEP
+                    self._cond.wait(timeout)
+                    continue
+            try:
+                self._fire(due)
+            except Exception as e:
+                print(f"[Reminder Scheduler] sending reminders failed: {e}")
+                with self._cond:
+                    for reminder in due:
+                        heapq.heappush(self._heap, (time.time() + RETRY_DELAY, next(self._seq), reminder))
+
+    def _fire(self, reminders):
+        notifications = []
+        with DatabaseConnection.get_instance().pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                for reminder in reminders:
+                    cursor.execute(CLAIMS[reminder.kind], (reminder.ref_id, reminder.due_date))
+                    if cursor.rowcount == 1:
+                        notifications.append((reminder.user_id, {
+                            'id': self.inbox.add(cursor, reminder.user_id, reminder.message),
+                            'message': reminder.message,
+                        }))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        for user_id, notification in notifications:
+            self.push(user_id, notification)
+        self.inbox.maybe_compact()
@@ -1,35 +1,75 @@
 from datetime import datetime
 from abc import ABC, abstractmethod
+from time_codec import hours_to_minutes
+from transfer_engine import apply_balance_deltas
+
+# Which accounts a repayment drains first. Each key sorts the locked
+# (id, account_type, balance_minutes) rows.
+ACCOUNT_TYPE_PRIORITY = {'Savings': 0, 'Investment': 1}
+DEDUCTION_ORDERS = {
+    'oldest_first': lambda account: account[0],
+    'highest_balance_first': lambda account: (-account[2], account[0]),
+    'by_account_type': lambda account: (ACCOUNT_TYPE_PRIORITY.get(account[1], len(ACCOUNT_TYPE_PRIORITY)), account[0]),
+}
 
 class RepaymentStrategy(ABC):
+    def __init__(self, deduction_order='oldest_first'):
+        if deduction_order not in DEDUCTION_ORDERS:
+            raise ValueError(f"Unknown deduction order: {deduction_order}")
+        self.deduction_order = deduction_order
+
     @abstractmethod
     def repay(self, db, user_id, loan_id, loan_hours):
         pass
 
-def deduct_from_accounts(cursor, user_id, minutes_to_deduct):
+def deduct_from_accounts(cursor, user_id, minutes_to_deduct, order='oldest_first'):
+    """Takes `minutes_to_deduct` from the user's non-Loan accounts, draining them in `order`.
+
+    The accounts (and the user) are locked in account_number order, as
+    transfer_engine.lock_accounts does, and the waterfall is applied with one
+    CASE-based UPDATE. Returns {account id: minutes taken}.
+    """
     cursor.execute("""
-        SELECT id, balance FROM accounts 
-        WHERE user_id = %s AND account_type != 'Loan' 
-        ORDER BY id ASC
+        SELECT a.id, a.account_type, a.balance_minutes
+        FROM accounts a
+        JOIN users u ON u.id = a.user_id
+        WHERE a.user_id = %s AND a.account_type != 'Loan'
+        ORDER BY a.account_number
+        FOR UPDATE
     """, (user_id,))
+    accounts = sorted(cursor.fetchall(), key=DEDUCTION_ORDERS[order])
 
-    accounts = cursor.fetchall()
-
-    for acc_id, balance_str in accounts:
-        hours, minutes = map(int, balance_str.split(":"))
-        total = hours * 60 + minutes
-
-        if total == 0:
-            continue
-
-        if total >= minutes_to_deduct:
-            new_total = total - minutes_to_deduct
-            new_balance = f"{new_total // 60:02}:{new_total % 60:02}"
-            cursor.execute("UPDATE accounts SET balance = %s WHERE id = %s", (new_balance, acc_id))
+    deductions = {}
+    for acc_id, account_type, balance in accounts:
+        if minutes_to_deduct <= 0:
             break
-        else:
-            cursor.execute("UPDATE accounts SET balance = '00:00' WHERE id = %s", (acc_id,))
-            minutes_to_deduct -= total
+        if balance <= 0:
+            continue
+        deductions[acc_id] = min(balance, minutes_to_deduct)
+        minutes_to_deduct -= deductions[acc_id]
+
+    if minutes_to_deduct > 0:
+        raise Exception("Insufficient balance across accounts.")
+    if deductions:
+        apply_balance_deltas(cursor, 'accounts', {acc_id: -minutes for acc_id, minutes in deductions.items()})
+    return deductions
+
+def lock_loan(cursor, loan_id, user_id):
+    """Locks the loan, so two repayments of it queue behind each other; it must still be Approved.
+
+    Taken before deduct_from_accounts locks the accounts. Transfers never
+    lock loans, so this order cannot deadlock with them.
+    """
+    cursor.execute("SELECT status FROM loans WHERE loan_id = %s AND user_id = %s FOR UPDATE", (loan_id, user_id))
+    loan = cursor.fetchone()
+    if loan is None or loan[0] != 'Approved':
+        raise Exception("Loan is not awaiting repayment.")
+
+def check_total_balance(cursor, user_id, minutes, message):
+    """Raises `message` unless the user's total balance, read under its row lock, covers `minutes`."""
+    cursor.execute("SELECT total_balance_minutes FROM users WHERE id = %s FOR UPDATE", (user_id,))
+    if int(cursor.fetchone()[0]) < minutes:
+        raise Exception(message)
 
 def calculate_fixed_interest_minutes(loan_minutes):
     if loan_minutes <= 200 * 60:
@@ -49,16 +89,16 @@ def calculate_installment_interest(loan_hours):
 
 class FixedRepayment(RepaymentStrategy):
     def repay(self, db, user_id, loan_id, loan_hours):
-        loan_minutes = int(float(loan_hours) * 60)
+        loan_minutes = hours_to_minutes(loan_hours)
         interest_minutes = calculate_fixed_interest_minutes(loan_minutes)
         total_minutes = loan_minutes + interest_minutes
 
         cursor = db.cursor()
         try:
-            cursor.execute("SELECT total_balance_minutes FROM users WHERE id = %s", (user_id,))
-            current_balance = int(cursor.fetchone()[0])
-            if current_balance < total_minutes:
-                raise Exception("Insufficient balance for fixed repayment.")
+            # Locks first, then checks: the loan, then the accounts and the user.
+            lock_loan(cursor, loan_id, user_id)
+            deduct_from_accounts(cursor, user_id, total_minutes, self.deduction_order)
+            check_total_balance(cursor, user_id, total_minutes, "Insufficient balance for fixed repayment.")
 
             cursor.execute("""
                 SELECT repayment_id FROM repayments 
@@ -69,21 +109,19 @@ class FixedRepayment(RepaymentStrategy):
             if repayment_record:
                 cursor.execute("""
                     UPDATE repayments
-                    SET status = 'Paid', amount = %s, due_date = %s
+                    SET status = 'Paid', amount_minutes = %s, interest_minutes = %s, due_date = %s
                     WHERE repayment_id = %s
-                """, (total_minutes / 60, datetime.today().date(), repayment_record[0]))
+                """, (loan_minutes, interest_minutes, datetime.today().date(), repayment_record[0]))
             else:
                 cursor.execute("""
-                    INSERT INTO repayments (user_id, loan_id, strategy, amount, status, installment_number, due_date)
-                    VALUES (%s, %s, 'Fixed', %s, 'Paid', 1, %s)
-                """, (user_id, loan_id, total_minutes / 60, datetime.today().date()))
+                    INSERT INTO repayments (user_id, loan_id, strategy, amount_minutes, interest_minutes, status, installment_number, due_date)
+                    VALUES (%s, %s, 'Fixed', %s, %s, 'Paid', 1, %s)
+                """, (user_id, loan_id, loan_minutes, interest_minutes, datetime.today().date()))
 
             cursor.execute("""
                 UPDATE users SET total_balance_minutes = total_balance_minutes - %s WHERE id = %s
             """, (total_minutes, user_id))
 
-            deduct_from_accounts(cursor, user_id, total_minutes)
-
             cursor.execute("""
                 UPDATE loans SET status = 'Repaid' WHERE loan_id = %s
             """, (loan_id,))
@@ -96,42 +134,45 @@ class FixedRepayment(RepaymentStrategy):
             cursor.close()
 
 class InstallmentRepayment(RepaymentStrategy):
-    def repay(self, db, user_id, loan_id, loan_hours):
-        loan_hours = float(loan_hours)
+    """Pays the loan's next pending installment and returns its number.
+
+    With `installment_number`, that installment must be the next one due.
+    """
 
+    def __init__(self, deduction_order='oldest_first', installment_number=None):
+        super().__init__(deduction_order)
+        self.installment_number = installment_number
+
+    def repay(self, db, user_id, loan_id, loan_hours):
         cursor = db.cursor()
         try:
+            # The loan lock makes this the only payment of the loan in flight,
+            # so the installment read here is still unpaid when it is marked.
+            lock_loan(cursor, loan_id, user_id)
+            # interest_minutes is this installment's share of the loan's
+            # interest, fixed when the schedule was built.
             cursor.execute("""
-                SELECT repayment_id, amount, installment_number FROM repayments 
+                SELECT repayment_id, amount_minutes, interest_minutes, installment_number FROM repayments 
                 WHERE loan_id = %s AND user_id = %s AND status = 'pending'
                 ORDER BY installment_number ASC LIMIT 1
+                FOR UPDATE
             """, (loan_id, user_id))
             installment = cursor.fetchone()
 
             if not installment:
                 raise Exception("No pending installment found.")
 
-            repayment_id, amount, installment_number = installment
+            repayment_id, amount_minutes, interest_minutes, installment_number = installment
+            if self.installment_number is not None and self.installment_number != installment_number:
+                raise Exception(f"Installment {installment_number} is the next one due.")
+            total_minutes = amount_minutes + interest_minutes
 
-            cursor.execute("""
-                SELECT COUNT(*) FROM repayments 
-                WHERE loan_id = %s AND user_id = %s
-            """, (loan_id, user_id))
-            total_installments = cursor.fetchone()[0]
-
-            interest = calculate_installment_interest(loan_hours) / total_installments
-            total_amount = float(amount) + interest
-            total_minutes = int(total_amount * 60)
-
-            cursor.execute("SELECT total_balance_minutes FROM users WHERE id = %s", (user_id,))
-            current_balance = int(cursor.fetchone()[0])
-
-            if current_balance < total_minutes:
-                raise Exception("Insufficient balance for installment.")
+            deduct_from_accounts(cursor, user_id, total_minutes, self.deduction_order)
+            check_total_balance(cursor, user_id, total_minutes, "Insufficient balance for installment.")
 
             cursor.execute("""
                 UPDATE repayments 
-                SET status = 'paid', due_date = %s 
+                SET status = 'Paid', due_date = %s 
                 WHERE repayment_id = %s
             """, (datetime.today().date(), repayment_id))
 
@@ -139,11 +180,9 @@ class InstallmentRepayment(RepaymentStrategy):
                 UPDATE users SET total_balance_minutes = total_balance_minutes - %s WHERE id = %s
             """, (total_minutes, user_id))
 
-            deduct_from_accounts(cursor, user_id, total_minutes)
-
             cursor.execute("""
                 SELECT COUNT(*) FROM repayments 
-                WHERE loan_id = %s AND status != 'paid'
+                WHERE loan_id = %s AND status != 'Paid'
             """, (loan_id,))
             remaining = cursor.fetchone()[0]
 
@@ -151,6 +190,7 @@ class InstallmentRepayment(RepaymentStrategy):
                 cursor.execute("UPDATE loans SET status = 'Repaid' WHERE loan_id = %s", (loan_id,))
 
             db.commit()
+            return installment_number
         except Exception as e:
             db.rollback()
             raise Exception(f"Installment repayment failed: {str(e)}")
@@ -163,4 +203,4 @@ class RepaymentContext:
         self.strategy = strategy
 
     def execute(self, db, user_id, loan_id, loan_hours):
-        self.strategy.repay(db, user_id, loan_id, loan_hours)
+        return self.strategy.repay(db, user_id, loan_id, loan_hours)
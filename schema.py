@@ -0,0 +1,201 @@
+TABLES = {
+    "mysql": [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(100) NOT NULL UNIQUE,
+            password VARCHAR(255) NOT NULL,
+            total_balance VARCHAR(16) NOT NULL DEFAULT '00:00',
+            total_balance_minutes BIGINT NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS accounts (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            fullname VARCHAR(255),
+            account_number BIGINT NOT NULL UNIQUE,
+            account_type VARCHAR(20) NOT NULL,
+            balance VARCHAR(16) NOT NULL DEFAULT '00:00',
+            interest_rate DECIMAL(5,2) NOT NULL DEFAULT 0,
+            transaction_limit DECIMAL(12,2) NOT NULL DEFAULT 0,
+            account_status VARCHAR(20) NOT NULL DEFAULT 'active',
+            loan_blocked TINYINT(1) NOT NULL DEFAULT 0,
+            is_deleted TINYINT(1) NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        ) ENGINE=InnoDB
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            sender_id INT NOT NULL,
+            receiver_id INT NOT NULL,
+            sender_account_number BIGINT NOT NULL,
+            receiver_account_number BIGINT NOT NULL,
+            time_amount VARCHAR(16) NOT NULL,
+            transaction_type VARCHAR(20) NOT NULL,
+            tax DECIMAL(10,2) NOT NULL DEFAULT 0,
+            bonus DECIMAL(10,2) NOT NULL DEFAULT 0,
+            timestamp DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            txn_hash CHAR(64)
+        ) ENGINE=InnoDB
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS loans (
+            loan_id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            loan_amount INT NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            strategy VARCHAR(20) NOT NULL DEFAULT 'basic',
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            repayment_due DATE NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        ) ENGINE=InnoDB
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS repayments (
+            repayment_id INT AUTO_INCREMENT PRIMARY KEY,
+            loan_id INT NOT NULL,
+            user_id INT NOT NULL,
+            installment_number INT NOT NULL DEFAULT 1,
+            amount DECIMAL(10,2) NOT NULL,
+            due_date DATE NULL,
+            strategy VARCHAR(20) NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'Pending',
+            FOREIGN KEY (loan_id) REFERENCES loans(loan_id)
+        ) ENGINE=InnoDB
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS time_goals (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            title VARCHAR(255) NOT NULL,
+            saved_hours DECIMAL(10,2) NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        ) ENGINE=InnoDB
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS goal_transactions (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            goal_id INT NOT NULL,
+            hours DECIMAL(10,2) NOT NULL,
+            type VARCHAR(20) NOT NULL,
+            timestamp DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS money_time_transactions (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            account_type VARCHAR(20) NOT NULL,
+            transaction_type VARCHAR(20) NOT NULL,
+            time_amount INT NOT NULL,
+            time_equivalent VARCHAR(16) NOT NULL,
+            timestamp DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB
+        """,
+    ],
+    # Text columns the queries compare against literals are NOCASE so SQLite
+    # matches MySQL's case-insensitive default collation ('Paid' vs 'paid').
+    "sqlite": [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username VARCHAR(100) NOT NULL UNIQUE COLLATE NOCASE,
+            password VARCHAR(255) NOT NULL,
+            total_balance VARCHAR(16) NOT NULL DEFAULT '00:00',
+            total_balance_minutes BIGINT NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime'))
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS accounts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            fullname VARCHAR(255),
+            account_number BIGINT NOT NULL UNIQUE,
+            account_type VARCHAR(20) NOT NULL COLLATE NOCASE,
+            balance VARCHAR(16) NOT NULL DEFAULT '00:00',
+            interest_rate DECIMAL(5,2) NOT NULL DEFAULT 0,
+            transaction_limit DECIMAL(12,2) NOT NULL DEFAULT 0,
+            account_status VARCHAR(20) NOT NULL DEFAULT 'active' COLLATE NOCASE,
+            loan_blocked TINYINT NOT NULL DEFAULT 0,
+            is_deleted TINYINT NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime')),
+            updated_at TIMESTAMP NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sender_id INTEGER NOT NULL,
+            receiver_id INTEGER NOT NULL,
+            sender_account_number BIGINT NOT NULL,
+            receiver_account_number BIGINT NOT NULL,
+            time_amount VARCHAR(16) NOT NULL,
+            transaction_type VARCHAR(20) NOT NULL COLLATE NOCASE,
+            tax DECIMAL(10,2) NOT NULL DEFAULT 0,
+            bonus DECIMAL(10,2) NOT NULL DEFAULT 0,
+            timestamp DATETIME NOT NULL DEFAULT (datetime('now', 'localtime')),
+            txn_hash CHAR(64)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS loans (
+            loan_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            loan_amount INTEGER NOT NULL,
+            status VARCHAR(20) NOT NULL COLLATE NOCASE,
+            strategy VARCHAR(20) NOT NULL DEFAULT 'basic' COLLATE NOCASE,
+            applied_at TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime')),
+            repayment_due DATE NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS repayments (
+            repayment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            loan_id INTEGER NOT NULL REFERENCES loans(loan_id),
+            user_id INTEGER NOT NULL,
+            installment_number INTEGER NOT NULL DEFAULT 1,
+            amount DECIMAL(10,2) NOT NULL,
+            due_date DATE NULL,
+            strategy VARCHAR(20) NOT NULL COLLATE NOCASE,
+            status VARCHAR(20) NOT NULL DEFAULT 'Pending' COLLATE NOCASE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS time_goals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            title VARCHAR(255) NOT NULL,
+            saved_hours DECIMAL(10,2) NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS goal_transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            goal_id INTEGER NOT NULL,
+            hours DECIMAL(10,2) NOT NULL,
+            type VARCHAR(20) NOT NULL COLLATE NOCASE,
+            timestamp DATETIME NOT NULL DEFAULT (datetime('now', 'localtime'))
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS money_time_transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            account_type VARCHAR(20) NOT NULL COLLATE NOCASE,
+            transaction_type VARCHAR(20) NOT NULL COLLATE NOCASE,
+            time_amount INTEGER NOT NULL,
+            time_equivalent VARCHAR(16) NOT NULL,
+            timestamp DATETIME NOT NULL DEFAULT (datetime('now', 'localtime'))
+        )
+        """,
+    ],
+}
+
@@ -1,37 +1,274 @@
-import mysql.connector
-from mysql.connector import errors
+import threading
+import time
+from collections import deque
+
+from flask import g, has_app_context
+
+from db_backends import backend_from_config
+
+POOL_MIN_SIZE = 2
+POOL_MAX_SIZE = 10
+POOL_WAIT_TIMEOUT = 10  # seconds a borrower waits for a free connection
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.created = 0
+        self.discarded = 0
+        self.failed_health_checks = 0
+
+    def record_checkout(self, waited):
+        with self._lock:
+            self.checkouts += 1
+            if waited is not None:
+                self.waits += 1
+                self.total_wait_time += waited
+                self.max_wait_time = max(self.max_wait_time, waited)
+
+    def increment(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "avg_wait_time": self.total_wait_time / self.waits if self.waits else 0.0,
+                "max_wait_time": self.max_wait_time,
+                "created": self.created,
+                "discarded": self.discarded,
+                "failed_health_checks": self.failed_health_checks,
+            }
+
+
+class PooledConnection:
+    """Proxy around a raw connection; close() hands it back to the pool."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._request_scoped = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self):
+        # Request-scoped connections are shared by every handler in the request
+        # and are returned by the teardown hook, not by individual callers.
+        if self._request_scoped:
+            return
+        self._pool.release(self)
+
+
+class ConnectionPool:
+    def __init__(self, connect, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE, wait_timeout=POOL_WAIT_TIMEOUT):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Invalid pool size: min_size=%s max_size=%s" % (min_size, max_size))
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.wait_timeout = wait_timeout
+        self.metrics = PoolMetrics()
+        self._idle = deque()
+        self._size = 0
+        self._cond = threading.Condition()
+
+        for _ in range(min_size):
+            self._size += 1
+            self._idle.append(self._create())
+
+    def _create(self):
+        # The caller has already reserved a slot in self._size.
+        try:
+            raw = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        self.metrics.increment("created")
+        return raw
+
+    def _discard(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+        self.metrics.increment("discarded")
+
+    def _is_healthy(self, raw):
+        try:
+            if raw.is_connected():
+                return True
+            raw.reconnect(attempts=1, delay=0)
+            return raw.is_connected()
+        except Exception:
+            return False
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.wait_timeout
+        waited = False
+
+        while True:
+            raw = None
+            create = False
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.metrics.increment("timeouts")
+                        raise PoolTimeoutError(
+                            "Timed out after %.1fs waiting for a database connection" % self.wait_timeout
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+                if self._idle:
+                    raw = self._idle.pop()
+                else:
+                    self._size += 1
+                    create = True
+
+            if create:
+                raw = self._create()
+            elif not self._is_healthy(raw):
+                self.metrics.increment("failed_health_checks")
+                self._discard(raw)
+                continue
+
+            self.metrics.record_checkout(time.monotonic() - started if waited else None)
+            return PooledConnection(self, raw)
+
+    def release(self, conn):
+        raw = conn._raw
+        if raw is None:
+            return
+        conn._raw = None
+        try:
+            # Drop anything the borrower left uncommitted so the next one starts clean.
+            raw.rollback()
+        except Exception:
+            self._discard(raw)
+            return
+        with self._cond:
+            self._idle.append(raw)
+            self._cond.notify()
+
+    def connection(self):
+        return _PoolCheckout(self)
+
+    def stats(self):
+        with self._cond:
+            stats = {"size": self._size, "idle": len(self._idle), "min_size": self.min_size, "max_size": self.max_size}
+        stats.update(self.metrics.snapshot())
+        return stats
+
+
+class _PoolCheckout:
+    def __init__(self, pool):
+        self._pool = pool
+        self._conn = None
+
+    def __enter__(self):
+        self._conn = self._pool.acquire()
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self._pool.release(self._conn)
+        return False
+
 
 class DatabaseConnection:
     _instance = None
+    _lock = threading.Lock()
+    _backend = None
+    _settings = {
+        "min_size": POOL_MIN_SIZE,
+        "max_size": POOL_MAX_SIZE,
+        "wait_timeout": POOL_WAIT_TIMEOUT,
+    }
 
     def __init__(self):
         if DatabaseConnection._instance is not None:
             raise Exception("This class is a singleton!")
-        self._connect()
+        if DatabaseConnection._backend is None:
+            DatabaseConnection._backend = backend_from_config()
+        self.backend = DatabaseConnection._backend
+        self.dialect = self.backend.dialect
+        self.pool = ConnectionPool(self._connect, **DatabaseConnection._settings)
         DatabaseConnection._instance = self
 
     def _connect(self):
-        self.connection = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="",
-            database="chronobank"
+        return self.backend.connect()
+
+    @staticmethod
+    def configure(min_size=None, max_size=None, wait_timeout=None, backend=None):
+        if DatabaseConnection._instance is not None:
+            raise Exception("Pool settings must be configured before the first connection is made.")
+        for key, value in (("min_size", min_size), ("max_size", max_size), ("wait_timeout", wait_timeout)):
+            if value is not None:
+                DatabaseConnection._settings[key] = value
+        if backend is not None:
+            DatabaseConnection._backend = backend
+
+    @staticmethod
+    def init_app(app):
+        backend = None
+        if app.config.get("DB_BACKEND"):
+            options = {}
+            if app.config["DB_BACKEND"] == "sqlite" and app.config.get("SQLITE_PATH"):
+                options["path"] = app.config["SQLITE_PATH"]
+            backend = backend_from_config(app.config["DB_BACKEND"], **options)
+        DatabaseConnection.configure(
+            min_size=app.config.get("DB_POOL_MIN_SIZE"),
+            max_size=app.config.get("DB_POOL_MAX_SIZE"),
+            wait_timeout=app.config.get("DB_POOL_WAIT_TIMEOUT"),
+            backend=backend,
         )
+        app.teardown_appcontext(DatabaseConnection.release_request_connection)
 
     @staticmethod
     def get_instance():
         if DatabaseConnection._instance is None:
-            DatabaseConnection()
+            with DatabaseConnection._lock:
+                if DatabaseConnection._instance is None:
+                    DatabaseConnection()
         return DatabaseConnection._instance
 
     def get_connection(self):
-        try:
-            if not self.connection.is_connected():
-                self.connection.reconnect(attempts=3, delay=2)
-        except errors.Error:
-            try:
-                self.connection.close()
-            except:
-                pass
-            self._connect()
-        return self.connection
+        # Inside a request every caller shares one checkout, released at teardown.
+        # Outside a request (scripts, worker threads) the caller owns the checkout
+        # and must close() it.
+        if not has_app_context():
+            return self.pool.acquire()
+
+        conn = g.get("_db_conn")
+        if conn is None or conn._raw is None:
+            conn = self.pool.acquire()
+            conn._request_scoped = True
+            g._db_conn = conn
+        return conn
+
+    @staticmethod
+    def release_request_connection(exc=None):
+        conn = g.pop("_db_conn", None)
+        if conn is not None and DatabaseConnection._instance is not None:
+            DatabaseConnection._instance.pool.release(conn)
+
+    def get_pool_stats(self):
+        return self.pool.stats()
@@ -0,0 +1,213 @@
+import argparse
+import asyncio
+import os
+import resource
+import socket
+from datetime import timedelta
+from http.cookies import SimpleCookie
+
+from flask import Flask
+from flask.sessions import SecureCookieSessionInterface
+
+import alert_routes
+from alert_routes import AlertStream, format_event, parse_last_event_id, start_reminders, subscribe_rules, transaction_monitor
+from event_bus import EVENT_BRIDGE, bus, decode_bridge_event, stop_forwarding
+
+SECRET_KEY = os.environ.get("CHRONOBANK_SECRET_KEY", "your_secret_key")
+EVENTS_PATH = "/monitor/events"
+MAX_REQUEST_HEAD = 8192
+REQUEST_TIMEOUT = 10
+RECONNECT_MILLISECONDS = 3000
+
+
+class GatewayStream(AlertStream):
+    """AlertStream that wakes an event loop instead of a waiting thread.
+
+    Alerts are produced on the event bus thread; the ring buffer and drop
+    counting are AlertStream's.
+    """
+
+    def __init__(self, user_id, loop):
+        super().__init__(user_id)
+        self._loop = loop
+        self._ready = asyncio.Event()
+
+    def update(self, message):
+        super().update(message)
+        self._loop.call_soon_threadsafe(self._ready.set)
+
+    def close(self):
+        super().close()
+        self._loop.call_soon_threadsafe(self._ready.set)
+
+    async def wait(self):
+        await self._ready.wait()
+        self._ready.clear()
+
+
+class BridgeReceiver(asyncio.DatagramProtocol):
+    def datagram_received(self, data, addr):
+        try:
+            topic, payload = decode_bridge_event(data)
+        except ValueError as e:
+            print(f"[SSE Gateway] bad bridge event: {e}")
+            return
+        bus.publish(topic, payload)
+
+
+def session_serializer(secret_key, session_lifetime):
+    # The same signer Flask uses for its session cookie, so a dashboard's
+    # cookie authenticates here unchanged.
+    app = Flask("sse_gateway")
+    app.secret_key = secret_key
+    app.permanent_session_lifetime = session_lifetime
+    return app, SecureCookieSessionInterface().get_signing_serializer(app)
+
+
+class SSEGateway:
+    """Serves /monitor/events for thousands of connections on one event loop.
+
+    Each stream is a coroutine waiting on its GatewayStream, not a worker
+    thread. Alert rules are TransactionMonitor's; events come from the
+    workers through the event bridge.
+    """
+
+    def __init__(self, secret_key=SECRET_KEY, session_lifetime=timedelta(days=31),
+                 heartbeat=alert_routes.HEARTBEAT_SECONDS, monitor=transaction_monitor):
+        self.app, self.serializer = session_serializer(secret_key, session_lifetime)
+        self.heartbeat = heartbeat
+        self.monitor = monitor
+        self.connections = 0
+
+    async def serve(self, host, port, bridge_path=EVENT_BRIDGE):
+        loop = asyncio.get_running_loop()
+        if bridge_path:
+            stop_forwarding()
+            subscribe_rules()
+            if os.path.exists(bridge_path):
+                os.remove(bridge_path)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(bridge_path)
+            await loop.create_datagram_endpoint(BridgeReceiver, sock=sock)
+        start_reminders()
+        server = await asyncio.start_server(self.handle, host, port, backlog=4096, limit=MAX_REQUEST_HEAD)
+        async with server:
+            await server.serve_forever()
+
+    def user_id(self, headers):
+        cookie = SimpleCookie(headers.get("cookie", ""))
+        morsel = cookie.get(self.app.config["SESSION_COOKIE_NAME"])
+        if morsel is None:
+            return None
+        try:
+            data = self.serializer.loads(morsel.value,
+                                         max_age=int(self.app.permanent_session_lifetime.total_seconds()))
+        except Exception:
+            return None
+        return data.get("user_id")
+
+    async def handle(self, reader, writer):
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            # Lets the kernel notice peers that vanished without closing.
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self.connections += 1
+        try:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), REQUEST_TIMEOUT)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+            method, path, headers = parse_request(head)
+            if method != "GET" or path.split("?", 1)[0] != EVENTS_PATH:
+                writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                return
+            writer.write(b"HTTP/1.1 200 OK\r\n"
+                         b"Content-Type: text/event-stream\r\n"
+                         b"Cache-Control: no-cache\r\n"
+                         b"Connection: keep-alive\r\n"
+                         b"X-Accel-Buffering: no\r\n\r\n")
+            user_id = self.user_id(headers)
+            if not user_id:
+                writer.write(b"data: Unauthorized\n\n")
+                return
+            writer.write(f"retry: {RECONNECT_MILLISECONDS}\n\n".encode())
+            await self.stream(reader, writer, user_id, parse_last_event_id(headers.get("last-event-id")))
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+            writer.close()
+
+    async def stream(self, reader, writer, user_id, last_event_id):
+        loop = asyncio.get_running_loop()
+        stream = GatewayStream(user_id, loop)
+        self.monitor.subscribe(stream)
+        # EventSource never sends after the request, so a finished read means the client left.
+        disconnected = asyncio.ensure_future(reader.read(1))
+        try:
+            caught_up = 0
+            if last_event_id is None:
+                self.monitor.request_evaluation(user_id)
+            else:
+                caught_up = last_event_id
+                # One page in memory at a time, however long the client was away.
+                pages = self.monitor.replay(user_id, last_event_id)
+                while True:
+                    missed = await loop.run_in_executor(None, next, pages, None)
+                    if missed is None:
+                        break
+                    writer.write("".join(format_event(notification) for notification in missed).encode())
+                    await writer.drain()
+                    caught_up = missed[-1]['id']
+            await writer.drain()
+            while not stream.closed:
+                waiter = asyncio.ensure_future(stream.wait())
+                done, _ = await asyncio.wait({waiter, disconnected}, timeout=self.heartbeat,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                if disconnected in done:
+                    break
+                messages, dropped = stream.take(0)
+                chunks = []
+                if dropped:
+                    chunks.append(f"event: dropped\ndata: {dropped}\n\n")
+                chunks.extend(format_event(notification) for notification in messages
+                              if notification['id'] > caught_up)
+                if not chunks:
+                    chunks.append(": heartbeat\n\n")
+                writer.write("".join(chunks).encode())
+                await writer.drain()
+        finally:
+            disconnected.cancel()
+            self.monitor.unsubscribe(stream)
+
+
+def parse_request(head):
+    lines = head.decode("latin-1").split("\r\n")
+    parts = lines[0].split(" ")
+    method, path = (parts[0], parts[1]) if len(parts) >= 2 else ("", "")
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return method, path, headers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the ChronoBank SSE alert gateway.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--bridge", default=EVENT_BRIDGE or "chronobank-events.sock",
+                        help="Unix datagram socket the workers send events to (CHRONOBANK_EVENT_BRIDGE)")
+    args = parser.parse_args()
+
+    # One descriptor per open stream.
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    print(f"SSE gateway listening on {args.host}:{args.port}, events from {args.bridge}")
+    asyncio.run(SSEGateway().serve(args.host, args.port, args.bridge))
@@ -0,0 +1,191 @@
+from flask import Blueprint, Response, request, jsonify, session
+from singleton_db import DatabaseConnection
+from time_codec import format_hhmm
+from datetime import date, datetime, timedelta
+import csv
+import io
+import json
+
+statement_export_bp = Blueprint('statement_export', __name__)
+
+FETCH_SIZE = 500
+
+COLUMNS = [
+    'record_type', 'id', 'timestamp', 'direction', 'account_number', 'counterparty_account_number',
+    'amount_minutes', 'amount', 'tax_minutes', 'bonus_minutes', 'money_amount', 'status', 'reference'
+]
+
+
+def _bounds_clause(column, since, until, params):
+    clause = ""
+    if since is not None:
+        clause += f" AND {column} >= %s"
+        params.append(since)
+    if until is not None:
+        clause += f" AND {column} < %s"
+        params.append(until)
+    return clause
+
+
+def _sections(user_id, since, until):
+    """(query, params, row_to_record) for every part of the statement.
+
+    Each query walks one of the per-user indexes in timestamp order, so rows
+    can be written out as they arrive.
+    """
+    def transfer(direction):
+        own, other = ('sender', 'receiver') if direction == 'sent' else ('receiver', 'sender')
+
+        def to_record(row):
+            return {
+                'record_type': 'transfer',
+                'id': row['id'],
+                'timestamp': row['timestamp'],
+                'direction': direction,
+                'account_number': row[f'{own}_account_number'],
+                'counterparty_account_number': row[f'{other}_account_number'],
+                'amount_minutes': row['amount_minutes'],
+                'tax_minutes': row['tax_minutes'],
+                'bonus_minutes': row['bonus_minutes'],
+                'status': 'completed',
+                'reference': row['txn_hash'],
+            }
+        return to_record
+
+    sent_params = [user_id]
+    received_params = [user_id, user_id]
+    conversion_params = [user_id]
+    repayment_params = [user_id]
+    # due_date is a DATE column, so bound it by date only.
+    since_date = since[:10] if since else None
+    until_date = until[:10] if until else None
+    return [
+        ("""
+            SELECT id, timestamp, sender_account_number, receiver_account_number,
+                   amount_minutes, tax_minutes, bonus_minutes, txn_hash
+            FROM transactions
+            WHERE sender_id = %s""" + _bounds_clause('timestamp', since, until, sent_params) + """
+            ORDER BY timestamp, id
+        """, sent_params, transfer('sent')),
+        ("""
+            SELECT id, timestamp, sender_account_number, receiver_account_number,
+                   amount_minutes, tax_minutes, bonus_minutes, txn_hash
+            FROM transactions
+            WHERE receiver_id = %s AND sender_id <> %s""" + _bounds_clause('timestamp', since, until, received_params) + """
+            ORDER BY timestamp, id
+        """, received_params, transfer('received')),
+        ("""
+            SELECT id, timestamp, account_type, transaction_type, time_amount, time_minutes
+            FROM money_time_transactions
+            WHERE user_id = %s""" + _bounds_clause('timestamp', since, until, conversion_params) + """
+            ORDER BY timestamp
+        """, conversion_params, lambda row: {
+            'record_type': 'conversion',
+            'id': row['id'],
+            'timestamp': row['timestamp'],
+            'direction': row['transaction_type'],
+            'amount_minutes': row['time_minutes'],
+            'money_amount': row['time_amount'],
+            'status': 'completed',
+            'reference': row['account_type'],
+        }),
+        ("""
+            SELECT repayment_id, loan_id, installment_number, amount_minutes, interest_minutes, due_date, status
+            FROM repayments
+            WHERE user_id = %s""" + _bounds_clause('due_date', since_date, until_date, repayment_params) + """
+            ORDER BY loan_id, installment_number
+        """, repayment_params, lambda row: {
+            'record_type': 'repayment',
+            'id': row['repayment_id'],
+            'timestamp': row['due_date'],
+            'direction': 'repayment',
+            'amount_minutes': row['amount_minutes'] + row['interest_minutes'],
+            'status': row['status'],
+            'reference': f"loan {row['loan_id']} installment {row['installment_number']}",
+        }),
+    ]
+
+
+def _records(user_id, since, until):
+    db = DatabaseConnection.get_instance()
+    # The response body is produced after the request has ended, so it gets
+    # its own checkout rather than the request-scoped connection.
+    conn = db.pool.acquire()
+    try:
+        for query, params, to_record in _sections(user_id, since, until):
+            # Unbuffered: rows stay on the server until fetched, FETCH_SIZE at a time.
+            cursor = conn.cursor(dictionary=True, buffered=False)
+            try:
+                cursor.execute(query, tuple(params))
+                while True:
+                    rows = cursor.fetchmany(FETCH_SIZE)
+                    if not rows:
+                        break
+                    yield [to_record(row) for row in rows]
+            finally:
+                try:
+                    cursor.close()
+                except Exception:
+                    # Export abandoned mid-section; the pool discards the connection.
+                    pass
+    finally:
+        conn.close()
+
+
+def _export_value(record, column):
+    value = record.get(column)
+    if column == 'amount' and record.get('amount_minutes') is not None:
+        return format_hhmm(record['amount_minutes'])
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def generate_csv(user_id, since, until):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for batch in _records(user_id, since, until):
+        for record in batch:
+            writer.writerow([_export_value(record, column) for column in COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def generate_ndjson(user_id, since, until):
+    for batch in _records(user_id, since, until):
+        yield "".join(
+            json.dumps({column: _export_value(record, column) for column in COLUMNS}, default=str) + "\n"
+            for record in batch
+        )
+
+
+@statement_export_bp.route('/statement/export', methods=['GET'])
+def export_statement():
+    if 'user_id' not in session:
+        return jsonify({'error': 'User not logged in'}), 401
+
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+
+    try:
+        since = datetime.strptime(request.args['from'], '%Y-%m-%d') if request.args.get('from') else None
+        until = datetime.strptime(request.args['to'], '%Y-%m-%d') + timedelta(days=1) if request.args.get('to') else None
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    since = since.strftime('%Y-%m-%d %H:%M:%S') if since else None
+    until = until.strftime('%Y-%m-%d %H:%M:%S') if until else None
+
+    user_id = session['user_id']
+    filename = f"chronobank-statement-{user_id}.{export_format}"
+    if export_format == 'csv':
+        body, mimetype = generate_csv(user_id, since, until), 'text/csv'
+    else:
+        body, mimetype = generate_ndjson(user_id, since, until), 'application/x-ndjson'
+    return Response(body, mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
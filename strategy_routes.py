@@ -1,16 +1,21 @@
 from flask import Blueprint, render_template, request, redirect, session, flash, url_for
 from repayment_strategy import RepaymentContext, FixedRepayment, InstallmentRepayment
 from singleton_db import DatabaseConnection
+from event_bus import bus, REPAYMENT_CHANGED
 from datetime import datetime
 
 repayment_bp = Blueprint('repayment', __name__)
-db = DatabaseConnection.get_instance().get_connection()
+
+
+def get_db_connection():
+    return DatabaseConnection.get_instance().get_connection()
 
 @repayment_bp.route('/repay', methods=['GET', 'POST'])
 def repay():
     if 'user_id' not in session:
         return redirect('/login')
     user_id = session['user_id']
+    db = get_db_connection()
 
     with db.cursor(dictionary=True) as cursor:
         cursor.execute(""" 
@@ -48,26 +53,12 @@ def repay():
             try:
                 
 
-                strategy_class = FixedRepayment() if strategy_type == 'fixed' else InstallmentRepayment()
+                deduction_order = request.form.get('deduction_order', 'oldest_first')
+                strategy_class = FixedRepayment(deduction_order) if strategy_type == 'fixed' else InstallmentRepayment(deduction_order)
                 context = RepaymentContext(strategy_class)
+                # The strategy marks what it paid and closes the loan in its own transaction.
                 context.execute(db, user_id, loan_id, loan_amount)
-
-                if strategy_type == 'installment' and installment_number:
-                    cursor.execute("""
-                        UPDATE repayments SET status = 'Paid'
-                        WHERE loan_id = %s AND installment_number = %s
-                    """, (loan_id, installment_number))
-
-                    cursor.execute("""
-                        SELECT COUNT(*) as remaining FROM repayments 
-                        WHERE loan_id = %s AND status != 'Paid'
-                    """, (loan_id,))
-                    if cursor.fetchone()['remaining'] == 0:
-                        cursor.execute("UPDATE loans SET status = 'Repaid' WHERE loan_id = %s", (loan_id,))
-                else:
-                    cursor.execute("UPDATE loans SET status = 'Repaid' WHERE loan_id = %s", (loan_id,))
-
-                db.commit()
+                bus.publish(REPAYMENT_CHANGED, {'user_id': user_id})
                 session['repayment_processed'] = True
                 return redirect('/repayment_success')
 
@@ -82,6 +73,7 @@ def repay():
 @repayment_bp.route('/repayment_success')
 def repayment_success():
     user_id = session['user_id']
+    db = get_db_connection()
     with db.cursor(dictionary=True) as cursor:
         cursor.execute("""
             SELECT * FROM loans
@@ -107,6 +99,7 @@ def repayment_success():
 @repayment_bp.route('/repay_next_installment/<int:loan_id>/<int:installment_number>', methods=['POST'])
 def repay_next_installment(loan_id, installment_number):
     user_id = session['user_id']
+    db = get_db_connection()
 
     with db.cursor(dictionary=True) as cursor:
         cursor.execute("SELECT * FROM loans WHERE loan_id = %s AND user_id = %s", (loan_id, user_id))
@@ -122,28 +115,16 @@ def repay_next_installment(loan_id, installment_number):
         """, (loan_id, installment_number))
         installment = cursor.fetchone()
 
-        if not installment or installment['status'] == 'Paid':
+        if not installment or installment['status'].lower() == 'paid':
             flash("Installment already paid or not found.", "warning")
             return redirect(url_for('dashboard'))
 
         try:
-            context = RepaymentContext(InstallmentRepayment())
+            # Pays installment_number only if it is the next one due, under the loan's lock.
+            context = RepaymentContext(InstallmentRepayment(request.form.get('deduction_order', 'oldest_first'),
+                                                            installment_number))
             context.execute(db, user_id, loan_id, loan['loan_amount'])
-
-            cursor.execute("""
-                UPDATE repayments 
-                SET status = 'Paid' 
-                WHERE loan_id = %s AND installment_number = %s
-            """, (loan_id, installment_number))
-
-            cursor.execute("""
-                SELECT COUNT(*) as remaining FROM repayments 
-                WHERE loan_id = %s AND status != 'Paid'
-            """, (loan_id,))
-            if cursor.fetchone()['remaining'] == 0:
-                cursor.execute("UPDATE loans SET status = 'Repaid' WHERE loan_id = %s", (loan_id,))
-
-            db.commit()
+            bus.publish(REPAYMENT_CHANGED, {'user_id': user_id})
             flash("Installment paid successfully.", "success")
         except Exception as e:
             db.rollback()
@@ -0,0 +1,164 @@
+from datetime import timedelta
+
+try:
+    import numpy as np
+except ImportError:  # batch functions fall back to the scalar path
+    np = None
+
+
+def parse_hhmm(value):
+    """Parses "H:MM", "HH:MM" or "HH:MM:SS" (or a timedelta) into whole minutes."""
+    if isinstance(value, timedelta):
+        return int(value.total_seconds() // 60)
+    try:
+        parts = str(value).strip().split(":")
+        if len(parts) not in (2, 3):
+            raise ValueError
+        hours, minutes = int(parts[0]), int(parts[1])
+    except ValueError:
+        raise ValueError("Invalid time format. Expected HH:MM.")
+    if minutes >= 60 or minutes < 0 or hours < 0:
+        raise ValueError("Invalid minute value.")
+    return hours * 60 + minutes
+
+
+def parse_hours(value):
+    """Parses "HH:MM" or decimal hours ("1.5") into hours as a float."""
+    text = str(value).strip()
+    if ":" in text:
+        return parse_hhmm(text) / 60
+    return float(text)
+
+
+def format_hhmm(total_minutes):
+    total_minutes = int(total_minutes)
+    sign = "-" if total_minutes < 0 else ""
+    total_minutes = abs(total_minutes)
+    return f"{sign}{total_minutes // 60:02d}:{total_minutes % 60:02d}"
+
+
+def hours_to_minutes(hours):
+    return int(round(float(hours) * 60))
+
+
+def minutes_to_hours(total_minutes):
+    return int(total_minutes or 0) / 60
+
+
+def parse_hhmm_batch(values):
+    """Parses a column of "HH:MM[:SS]" strings into an int64 array of minutes.
+
+    The strings are packed into a fixed-width byte matrix and decoded with
+    array arithmetic, so there is no per-row Python work for well-formed
+    values. Any other row (padding, signs, one-digit minutes, stray bytes,
+    timedeltas, non-ASCII digits) goes through parse_hhmm, so both paths
+    accept and reject the same input. A column that is already a bytes
+    array is decoded as it is.
+    """
+    if np is None:
+        return [parse_hhmm(v) for v in values]
+
+    scalar = {}
+    if isinstance(values, np.ndarray) and values.dtype.kind == "S":
+        raw = values.reshape(-1)
+    else:
+        items = values.reshape(-1).tolist() if isinstance(values, np.ndarray) else list(values)
+        try:
+            packable = "".join(items).isascii()
+        except TypeError:
+            packable = False
+        if not packable:
+            # Only ASCII strings can be packed into bytes unchanged.
+            scalar = {i: value for i, value in enumerate(items) if not (isinstance(value, str) and value.isascii())}
+            for i in scalar:
+                items[i] = "0:00"
+        raw = np.asarray(items, dtype=np.bytes_)
+    if raw.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    width = raw.dtype.itemsize
+    chars = raw.view(np.uint8).reshape(-1, width)
+    length = np.char.str_len(raw)
+    rows = np.arange(raw.size)
+
+    is_colon = chars == ord(":")
+    colon = is_colon.argmax(axis=1)
+    # Up to 15 hour digits (so hours * 60 fits in int64), two minute digits,
+    # then nothing or ":SS".
+    valid = is_colon.any(axis=1) & (colon > 0) & (colon <= 15)
+    with_seconds = length == colon + 6
+    valid &= (length == colon + 3) | with_seconds
+
+    def field(offset):
+        return chars[rows, np.minimum(colon + offset, width - 1)].astype(np.int64) - ord("0")
+
+    def is_digit(digits):
+        return (digits >= 0) & (digits <= 9)
+
+    tens, units = field(1), field(2)
+    valid &= is_digit(tens) & (tens <= 5) & is_digit(units)
+    valid &= ~with_seconds | ((field(3) == ord(":") - ord("0")) & is_digit(field(4)) & is_digit(field(5)))
+
+    # Horner's rule over the (few) character columns: hours = hours * 10 + digit
+    # for every position left of the colon.
+    hours = np.zeros(raw.size, dtype=np.int64)
+    for j in range(int(colon[valid].max()) if valid.any() else 0):
+        in_hours = valid & (colon > j)
+        digit = chars[:, j].astype(np.int64) - ord("0")
+        valid &= ~(in_hours & ~is_digit(digit))
+        hours = np.where(in_hours, hours * 10 + digit, hours)
+
+    minutes = hours * 60 + tens * 10 + units
+    for i in np.flatnonzero(~valid):
+        minutes[i] = parse_hhmm(raw[i].decode("latin-1"))
+    for i, value in scalar.items():
+        minutes[i] = parse_hhmm(value)
+    return minutes
+
+
+def format_hhmm_batch(minutes):
+    """Formats an array of minutes as "HH:MM" strings (hours zero-padded to two digits)."""
+    if np is None:
+        return [format_hhmm(m) for m in minutes]
+
+    minutes = np.asarray(minutes, dtype=np.int64).reshape(-1)
+    if minutes.size == 0:
+        return np.zeros(0, dtype="<U5")
+    if (minutes < 0).any():
+        return np.array([format_hhmm(m) for m in minutes])
+
+    hours, mins = np.divmod(minutes, 60)
+    hour_digits = np.full(minutes.size, 2, dtype=np.int64)
+    bound = 100
+    while (hours >= bound).any():
+        hour_digits += hours >= bound
+        bound *= 10
+    width = int(hour_digits.max()) + 3
+    result = np.empty(minutes.size, dtype=f"U{width}")
+
+    # One dense byte matrix per hour width (there are only a handful), viewed
+    # as fixed-width strings: no per-row Python work and no scatter writes.
+    for digits in np.unique(hour_digits):
+        selected = hour_digits == digits
+        group_hours = hours[selected]
+        group_mins = mins[selected]
+        out = np.empty((group_hours.size, digits + 3), dtype=np.uint8)
+        for place in range(digits - 1, -1, -1):
+            group_hours, digit = np.divmod(group_hours, 10)
+            out[:, place] = digit + ord("0")
+        out[:, digits] = ord(":")
+        out[:, digits + 1] = group_mins // 10 + ord("0")
+        out[:, digits + 2] = group_mins % 10 + ord("0")
+        result[selected] = out.reshape(-1).view(f"S{digits + 3}")
+    return result
+
+
+def hours_to_minutes_batch(hours):
+    if np is None:
+        return [hours_to_minutes(h) for h in hours]
+    return np.rint(np.asarray(hours, dtype=np.float64) * 60).astype(np.int64)
+
+
+def minutes_to_hours_batch(minutes):
+    if np is None:
+        return [minutes_to_hours(m) for m in minutes]
+    return np.asarray(minutes, dtype=np.int64) / 60
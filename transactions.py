@@ -1,31 +1,168 @@
 from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
 from singleton_db import DatabaseConnection
-from datetime import timedelta
-from admin.admin_decorator import BaseTransaction, TaxDecorator, BonusDecorator
-from blockchain import Blockchain
-import hashlib
+from ledger import find_receipt, inclusion_proof, ledger_outbox
+from ledger_outbox import enqueue_ledger_entries
+from event_bus import bus, TRANSFERS
+from time_codec import format_hhmm, parse_hhmm
+from transfer_engine import execute_transfer, execute_bulk_transfer, TransferError
+import base64
 import json
+from datetime import datetime, timedelta
 
 transactions_bp = Blueprint('transactions', __name__, url_prefix='/transactions')
-blockchain = Blockchain()
 
-def convert_to_decimal(time_str):
-    if isinstance(time_str, timedelta):
-        total_seconds = time_str.total_seconds()
-        return total_seconds / 3600
-    else:
-        try:
-            hours, minutes = map(int, time_str.split(":"))
-            if minutes >= 60 or minutes < 0:
-                raise ValueError("Invalid minute value.")
-            return hours + minutes / 60
-        except ValueError:
-            raise ValueError("Invalid time format. Expected HH:MM.")
-
-def convert_to_hhmm(decimal_amount):
-    hours = int(decimal_amount)
-    minutes = int((decimal_amount - hours) * 60)
-    return f"{hours:02d}:{minutes:02d}"
+MAX_BULK_TRANSFERS = 5000
+HISTORY_PAGE_SIZE = 25
+MAX_HISTORY_PAGE_SIZE = 100
+
+def fetch_recent_transactions(cursor, user_id, limit):
+    # "sender_id = x OR receiver_id = x" cannot use an index for the ORDER BY,
+    # so take the newest `limit` rows from each participant index and merge.
+    cursor.execute("""
+        SELECT * FROM (
+            SELECT * FROM transactions WHERE sender_id = %s
+            ORDER BY timestamp DESC, id DESC LIMIT %s
+        ) AS sent
+        UNION ALL
+        SELECT * FROM (
+            SELECT * FROM transactions WHERE receiver_id = %s AND sender_id <> %s
+            ORDER BY timestamp DESC, id DESC LIMIT %s
+        ) AS received
+        ORDER BY timestamp DESC, id DESC
+        LIMIT %s
+    """, (user_id, limit, user_id, user_id, limit, limit))
+    return cursor.fetchall()
+
+def encode_history_cursor(row):
+    timestamp = row['timestamp']
+    if isinstance(timestamp, datetime):
+        timestamp = timestamp.isoformat(" ")
+    raw = json.dumps([str(timestamp), row['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_history_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        timestamp, txn_id = json.loads(raw)
+        return str(timestamp), int(txn_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.")
+
+def fetch_transaction_page(cursor, user_id, direction='all', counterparty_id=None, min_minutes=None,
+                           max_minutes=None, since=None, until=None, before=None, limit=HISTORY_PAGE_SIZE):
+    """Returns up to `limit` transactions older than the `before` (timestamp, id) key, newest first.
+
+    Each participant side is a range scan on its (user, timestamp, id) index
+    that stops after `limit` rows, so the cost of a page does not grow with
+    the length of the history.
+    """
+    branches = []
+    params = []
+    sides = []
+    if direction in ('all', 'sent'):
+        sides.append(('sender_id', 'receiver_id', 'sent'))
+    if direction in ('all', 'received'):
+        sides.append(('receiver_id', 'sender_id', 'received'))
+
+    for own_column, other_column, alias in sides:
+        conditions = [f"{own_column} = %s"]
+        branch_params = [user_id]
+        if alias == 'received' and direction == 'all':
+            # Already returned by the sent branch.
+            conditions.append("sender_id <> %s")
+            branch_params.append(user_id)
+        if counterparty_id is not None:
+            conditions.append(f"{other_column} = %s")
+            branch_params.append(counterparty_id)
+        if min_minutes is not None:
+            conditions.append("amount_minutes >= %s")
+            branch_params.append(min_minutes)
+        if max_minutes is not None:
+            conditions.append("amount_minutes <= %s")
+            branch_params.append(max_minutes)
+        if since is not None:
+            conditions.append("timestamp >= %s")
+            branch_params.append(since)
+        if until is not None:
+            conditions.append("timestamp < %s")
+            branch_params.append(until)
+        if before is not None:
+            conditions.append("(timestamp < %s OR (timestamp = %s AND id < %s))")
+            branch_params.extend([before[0], before[0], before[1]])
+        branches.append(f"""
+            SELECT * FROM (
+                SELECT * FROM transactions WHERE {' AND '.join(conditions)}
+                ORDER BY timestamp DESC, id DESC LIMIT %s
+            ) AS {alias}
+        """)
+        params.extend(branch_params + [limit])
+
+    cursor.execute(f"""
+        SELECT
+            page.id, page.sender_id, page.receiver_id,
+            page.sender_account_number, page.receiver_account_number,
+            page.amount_minutes, page.tax_minutes, page.bonus_minutes,
+            page.transaction_type, page.timestamp, page.txn_hash,
+            s.username AS sender_username, r.username AS receiver_username
+        FROM ({' UNION ALL '.join(branches)}) AS page
+        JOIN users s ON s.id = page.sender_id
+        JOIN users r ON r.id = page.receiver_id
+        ORDER BY page.timestamp DESC, page.id DESC
+        LIMIT %s
+    """, tuple(params + [limit]))
+    return cursor.fetchall()
+
+def load_history_page(cursor, user_id, args, default_direction='all'):
+    """Parses history filters from query args and returns (rows, next_cursor)."""
+    direction = args.get('direction', default_direction)
+    if direction not in ('all', 'sent', 'received'):
+        raise ValueError("direction must be one of all, sent, received.")
+
+    try:
+        limit = int(args.get('limit', HISTORY_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("limit must be a number.")
+    limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+
+    filters = {}
+    if args.get('min_amount'):
+        filters['min_minutes'] = parse_hhmm(args['min_amount'])
+    if args.get('max_amount'):
+        filters['max_minutes'] = parse_hhmm(args['max_amount'])
+    try:
+        if args.get('from'):
+            filters['since'] = datetime.strptime(args['from'], '%Y-%m-%d').strftime('%Y-%m-%d %H:%M:%S')
+        if args.get('to'):
+            until = datetime.strptime(args['to'], '%Y-%m-%d') + timedelta(days=1)
+            filters['until'] = until.strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        raise ValueError("Dates must be YYYY-MM-DD.")
+    if args.get('cursor'):
+        filters['before'] = decode_history_cursor(args['cursor'])
+
+    if args.get('counterparty'):
+        cursor.execute("SELECT id FROM users WHERE username = %s", (args['counterparty'],))
+        counterparty = cursor.fetchone()
+        if not counterparty:
+            return [], None
+        filters['counterparty_id'] = counterparty['id']
+
+    # One extra row tells whether there is a next page.
+    rows = fetch_transaction_page(cursor, user_id, direction, limit=limit + 1, **filters)
+    next_cursor = encode_history_cursor(rows[limit - 1]) if len(rows) > limit else None
+    rows = rows[:limit]
+    for txn in rows:
+        txn['time_amount'] = format_hhmm(txn['amount_minutes'])
+    return rows, next_cursor
+
+def record_on_blockchain(cursor, sender_id, receiver_id, amount_minutes):
+    # Only the outbox row is written with the transfer; the ledger outbox
+    # seals it into a block after the commit.
+    return enqueue_ledger_entries(cursor, [(sender_id, receiver_id, amount_minutes)])[0]
+
+def record_block_on_blockchain(cursor, entries):
+    """Records every (sender_id, receiver_id, amount_minutes) entry in the outbox and returns their hashes."""
+    return enqueue_ledger_entries(cursor, entries)
 
 @transactions_bp.route('/record_transaction', methods=['GET', 'POST'])
 def record_transaction():
@@ -33,7 +170,6 @@ def record_transaction():
         return redirect(url_for('login'))
 
     conn = DatabaseConnection.get_instance().get_connection()
-    cursor = conn.cursor(dictionary=True)
 
     error = None
     success = None
@@ -50,124 +186,146 @@ def record_transaction():
             error = "All fields are required."
         else:
             try:
-                decimal_amount = convert_to_decimal(time_input)
-                if decimal_amount <= 0:
+                amount_minutes = parse_hhmm(time_input)
+                if amount_minutes <= 0:
                     raise ValueError("Amount must be greater than 0.")
             except ValueError as e:
                 error = f"Invalid amount format: {str(e)}"
 
         if not error:
-            cursor.execute("SELECT id FROM users WHERE username = %s", (receiver_username,))
-            receiver_user = cursor.fetchone()
-
-            if not receiver_user:
-                error = "Receiver username not found."
-            else:
-                receiver_id = receiver_user['id']
-
-                cursor.execute("SELECT * FROM accounts WHERE account_number = %s AND user_id = %s",
-                               (sender_account_number, sender_id))
-                sender_account = cursor.fetchone()
-
-                cursor.execute("SELECT * FROM accounts WHERE account_number = %s AND user_id = %s",
-                               (receiver_account_number, receiver_id))
-                receiver_account = cursor.fetchone()
-
-                if not sender_account:
-                    error = "Sender account not found."
-                elif not receiver_account:
-                    error = "Receiver account not found."
-                elif sender_id == receiver_id:
-                    error = "Cannot transfer to your own account."
-                else:
-                    try:
-                        sender_balance = sender_account.get('balance')
-                        receiver_balance = receiver_account.get('balance')
-
-                        if sender_balance is None or receiver_balance is None:
-                            error = "Account balances are not valid."
-                        else:
-                            sender_balance_decimal = convert_to_decimal(sender_balance)
-                            receiver_balance_decimal = convert_to_decimal(receiver_balance)
-
-                            base_transaction = BaseTransaction(decimal_amount)
-                            taxed_transaction = TaxDecorator(base_transaction)
-                            final_transaction = BonusDecorator(taxed_transaction)
-
-                            final_amount = final_transaction.get_final_amount()
-                            tax_amount = final_transaction.get_tax()
-                            bonus_amount = final_transaction.get_bonus()
-
-                            if sender_balance_decimal < final_amount:
-                                error = "Insufficient balance after tax and bonus."
-                            else:
-                                new_sender_balance = sender_balance_decimal - final_amount
-                                new_receiver_balance = receiver_balance_decimal + final_amount
-
-                                sender_balance_updated = convert_to_hhmm(new_sender_balance)
-                                receiver_balance_updated = convert_to_hhmm(new_receiver_balance)
-
-                                cursor.execute("UPDATE accounts SET balance = %s WHERE account_number = %s",
-                                               (sender_balance_updated, sender_account_number))
-                                cursor.execute("UPDATE accounts SET balance = %s WHERE account_number = %s",
-                                               (receiver_balance_updated, receiver_account_number))
-
-                                cursor.execute("SELECT balance FROM accounts WHERE user_id = %s", (sender_id,))
-                                sender_balances = cursor.fetchall()
-                                total_minutes_sender = sum(convert_to_decimal(acc['balance']) * 60 for acc in sender_balances)
-
-                                cursor.execute("UPDATE users SET total_balance_minutes = %s WHERE id = %s", 
-                                               (total_minutes_sender, sender_id))
-
-                                cursor.execute("SELECT balance FROM accounts WHERE user_id = %s", (receiver_id,))
-                                receiver_balances = cursor.fetchall()
-                                total_minutes_receiver = sum(convert_to_decimal(acc['balance']) * 60 for acc in receiver_balances)
-
-                                cursor.execute("UPDATE users SET total_balance_minutes = %s WHERE id = %s", 
-                                               (total_minutes_receiver, receiver_id))
-
-                              
-                                blockchain.add_transaction(
-                                    sender_id=sender_id,
-                                    receiver_id=receiver_id,
-                                    amount=final_amount,
-                                    txn_type='transfer'
-                                )
-                                block = blockchain.create_block(previous_hash=blockchain.get_last_block()['hash'])
-
-                                
-                                last_txn = block['transactions'][-1]
-                                txn_string = json.dumps(last_txn, sort_keys=True).encode()
-                                txn_hash = hashlib.sha256(txn_string).hexdigest()
-
-                               
-                                cursor.execute("""
-                                    INSERT INTO transactions (
-                                        sender_id, receiver_id, sender_account_number, receiver_account_number,
-                                        time_amount, transaction_type, tax, bonus, timestamp, txn_hash
-                                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), %s)
-                                """, (
-                                    sender_id,
-                                    receiver_id,
-                                    sender_account_number,
-                                    receiver_account_number,
-                                    f"{final_amount:.2f}",
-                                    'transfer',
-                                    f"{tax_amount:.2f}",
-                                    f"{bonus_amount:.2f}",
-                                    txn_hash
-                                ))
-
-                                conn.commit()
-                                success = "Transaction completed with tax and bonus, and recorded on blockchain."
-
-                    except (ValueError, TypeError) as e:
-                        error = f"Error processing transaction: {str(e)}"
-
-    cursor.close()
+            try:
+                result = execute_transfer(
+                    conn,
+                    sender_id,
+                    sender_account_number,
+                    receiver_username,
+                    receiver_account_number,
+                    amount_minutes,
+                    ledger_hash=record_on_blockchain
+                )
+                ledger_outbox.notify()
+                bus.publish(TRANSFERS, [{
+                    'sender_id': sender_id,
+                    'receiver_id': result['receiver_id'],
+                    'amount_minutes': result['final_minutes'],
+                }])
+                success = "Transaction completed with tax and bonus; its ledger entry will be recorded on the blockchain shortly."
+            except TransferError as e:
+                error = str(e)
+            except (ValueError, TypeError) as e:
+                error = f"Error processing transaction: {str(e)}"
+
     conn.close()
     return render_template('transactions.html', error=error, success=success)
 
+@transactions_bp.route('/bulk_transfer', methods=['POST'])
+def bulk_transfer():
+    if 'user_id' not in session:
+        return jsonify({"error": "User not logged in"}), 401
+
+    data = request.get_json(silent=True) or {}
+    items = data.get('transfers')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Expected a non-empty 'transfers' list"}), 400
+    if len(items) > MAX_BULK_TRANSFERS:
+        return jsonify({"error": f"At most {MAX_BULK_TRANSFERS} transfers per request"}), 400
+
+    results = [None] * len(items)
+    transfers = []
+    positions = []
+    for position, item in enumerate(items):
+        try:
+            if not isinstance(item, dict) or not all([item.get('sender_account_number'), item.get('receiver_username'),
+                                                      item.get('receiver_account_number'), item.get('amount')]):
+                raise ValueError("All fields are required.")
+            amount_minutes = parse_hhmm(item['amount'])
+            if amount_minutes <= 0:
+                raise ValueError("Amount must be greater than 0.")
+            transfers.append({
+                'sender_account_number': int(item['sender_account_number']),
+                'receiver_username': str(item['receiver_username']),
+                'receiver_account_number': int(item['receiver_account_number']),
+                'amount_minutes': amount_minutes,
+            })
+            positions.append(position)
+        except (ValueError, TypeError) as e:
+            results[position] = {'status': 'failed', 'error': str(e)}
+
+    if transfers:
+        conn = DatabaseConnection.get_instance().get_connection()
+        try:
+            outcomes = execute_bulk_transfer(conn, session['user_id'], transfers, ledger_block=record_block_on_blockchain)
+            ledger_outbox.notify()
+        except Exception as e:
+            return jsonify({"error": f"Error processing transfers: {str(e)}"}), 500
+        finally:
+            conn.close()
+        for position, outcome in zip(positions, outcomes):
+            results[position] = outcome
+        completed = [{'sender_id': session['user_id'], 'receiver_id': outcome['receiver_id'],
+                      'amount_minutes': outcome['final_minutes']}
+                     for outcome in outcomes if outcome['status'] == 'ok']
+        if completed:
+            bus.publish(TRANSFERS, completed)
+
+    for position, result in enumerate(results):
+        result['index'] = position
+        if result['status'] == 'ok':
+            result['amount'] = format_hhmm(result['final_minutes'])
+
+    succeeded = sum(1 for result in results if result['status'] == 'ok')
+    return jsonify({
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results
+    })
+
+@transactions_bp.route('/history', methods=['GET'])
+def transaction_history():
+    if 'user_id' not in session:
+        return jsonify({"error": "User not logged in"}), 401
+
+    conn = DatabaseConnection.get_instance().get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        transactions, next_cursor = load_history_page(cursor, session['user_id'], request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    finally:
+        cursor.close()
+        conn.close()
+
+    for txn in transactions:
+        if isinstance(txn['timestamp'], datetime):
+            txn['timestamp'] = txn['timestamp'].isoformat(" ")
+    return jsonify({"transactions": transactions, "next_cursor": next_cursor})
+
+@transactions_bp.route('/<txn_hash>/proof', methods=['GET'])
+def transaction_proof(txn_hash):
+    if 'user_id' not in session:
+        return jsonify({"error": "User not logged in"}), 401
+
+    user_id = session['user_id']
+    conn = DatabaseConnection.get_instance().get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT id FROM transactions
+            WHERE txn_hash = %s AND (sender_id = %s OR receiver_id = %s)
+            LIMIT 1
+        """, (txn_hash, user_id, user_id))
+        if not cursor.fetchone():
+            return jsonify({"error": "Transaction not found"}), 404
+        receipt = find_receipt(cursor, txn_hash)
+    finally:
+        cursor.close()
+        conn.close()
+
+    if not receipt:
+        # Still in the ledger outbox; it is sealed shortly after the transfer commits.
+        return jsonify({"error": "Transaction is not on the ledger yet"}), 409
+    return jsonify(inclusion_proof(receipt['block_index'], receipt['leaf_position']))
+
 @transactions_bp.route('/view_transactions', methods=['GET'])
 def view_transactions():
     if 'user_id' not in session:
@@ -178,24 +336,16 @@ def view_transactions():
     cursor = conn.cursor(dictionary=True)
 
     try:
-        query = '''
-            SELECT 
-                t.id, t.sender_id, t.receiver_id,
-                t.sender_account_number, t.receiver_account_number,
-                t.time_amount, t.transaction_type, t.timestamp,
-                t.txn_hash, u.username AS receiver_username
-            FROM transactions t
-            JOIN users u ON t.receiver_id = u.id
-            WHERE t.sender_id = %s
-            ORDER BY t.timestamp DESC
-        '''
-        cursor.execute(query, (sender_id,))
-        transactions = cursor.fetchall()
+        transactions, next_cursor = load_history_page(cursor, sender_id, request.args, default_direction='sent')
 
         if not transactions:
             return render_template('view_transactions.html', message="No transactions found", user_id=sender_id)
 
-        return render_template('view_transactions.html', transactions=transactions, user_id=sender_id)
+        return render_template('view_transactions.html', transactions=transactions, user_id=sender_id,
+                               next_cursor=next_cursor)
+
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
 
     except Exception as e:
         return jsonify({"message": f"An error occurred: {str(e)}"}), 500
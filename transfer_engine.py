@@ -0,0 +1,246 @@
+from admin.admin_decorator import BaseTransaction, TaxDecorator, BonusDecorator
+from time_codec import hours_to_minutes
+
+DEADLOCK_ERRNO = 1213
+MAX_ATTEMPTS = 3
+
+
+class TransferError(Exception):
+    pass
+
+
+def apply_fees(amount_minutes):
+    """Runs the tax/bonus decorators (which work in hours) and returns whole minutes."""
+    base_transaction = BaseTransaction(amount_minutes / 60)
+    taxed_transaction = TaxDecorator(base_transaction)
+    final_transaction = BonusDecorator(taxed_transaction)
+    return (
+        hours_to_minutes(final_transaction.get_final_amount()),
+        hours_to_minutes(final_transaction.get_tax()),
+        hours_to_minutes(final_transaction.get_bonus()),
+    )
+
+
+def lock_accounts(cursor, account_numbers):
+    """Locks the given accounts (and their owners) in account_number order.
+
+    Every transfer takes its row locks in the same order, so two transfers
+    between the same accounts queue behind each other instead of deadlocking.
+    """
+    account_numbers = sorted({int(n) for n in account_numbers})
+    placeholders = ", ".join(["%s"] * len(account_numbers))
+    cursor.execute(f"""
+        SELECT a.id, a.user_id, a.account_number, a.balance_minutes, u.username
+        FROM accounts a
+        JOIN users u ON u.id = a.user_id
+        WHERE a.account_number IN ({placeholders}) AND a.is_deleted = 0
+        ORDER BY a.account_number
+        FOR UPDATE
+    """, tuple(account_numbers))
+    return {row['account_number']: row for row in cursor.fetchall()}
+
+
+def apply_balance_deltas(cursor, table, deltas):
+    """Adds each delta to its row with a single CASE-based UPDATE."""
+    column = 'balance_minutes' if table == 'accounts' else 'total_balance_minutes'
+    ids = sorted(deltas)
+    cases = " ".join(["WHEN %s THEN %s"] * len(ids))
+    placeholders = ", ".join(["%s"] * len(ids))
+    params = [value for row_id in ids for value in (row_id, deltas[row_id])] + ids
+    cursor.execute(f"""
+        UPDATE {table}
+        SET {column} = {column} + CASE id {cases} ELSE 0 END
+        WHERE id IN ({placeholders})
+    """, tuple(params))
+
+
+def execute_transfer(conn, sender_id, sender_account_number, receiver_username, receiver_account_number,
+                     amount_minutes, ledger_hash):
+    """Moves `amount_minutes` (plus tax, minus bonus) between two accounts in one DB transaction.
+
+    `ledger_hash(cursor, sender_id, receiver_id, final_minutes)` records the
+    transfer for the ledger inside the same DB transaction and returns its hash. Raises TransferError with a user-facing
+    message when the transfer is rejected.
+    """
+    return _with_retries(conn, _execute_transfer, conn, sender_id, sender_account_number, receiver_username,
+                         receiver_account_number, amount_minutes, ledger_hash)
+
+
+def execute_bulk_transfer(conn, sender_id, transfers, ledger_block):
+    """Applies many transfers from `sender_id`'s accounts in one DB transaction.
+
+    Each transfer is a dict with sender_account_number, receiver_username,
+    receiver_account_number and amount_minutes. Every involved account is
+    locked once and each transfer is checked against the running balances, so
+    a rejected transfer does not stop the rest of the batch. Balance changes
+    are netted per account, and `ledger_block(cursor, entries)` records all
+    accepted transfers for the ledger and returns their hashes in order.
+
+    Returns one result dict per transfer, in input order.
+    """
+    return _with_retries(conn, _execute_bulk_transfer, conn, sender_id, transfers, ledger_block)
+
+
+def _with_retries(conn, operation, *args):
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            return operation(*args)
+        except TransferError:
+            conn.rollback()
+            raise
+        except Exception as e:
+            conn.rollback()
+            if getattr(e, 'errno', None) != DEADLOCK_ERRNO or attempt == MAX_ATTEMPTS:
+                raise
+
+
+def _execute_transfer(conn, sender_id, sender_account_number, receiver_username, receiver_account_number,
+                      amount_minutes, ledger_hash):
+    cursor = conn.cursor(dictionary=True)
+    try:
+        accounts = lock_accounts(cursor, [sender_account_number, receiver_account_number])
+        sender_account = accounts.get(int(sender_account_number))
+        receiver_account = accounts.get(int(receiver_account_number))
+
+        if not sender_account or sender_account['user_id'] != sender_id:
+            raise TransferError("Sender account not found.")
+        if not receiver_account or receiver_account['username'].lower() != receiver_username.lower():
+            raise TransferError("Receiver account not found.")
+        receiver_id = receiver_account['user_id']
+        if sender_id == receiver_id:
+            raise TransferError("Cannot transfer to your own account.")
+
+        final_minutes, tax_minutes, bonus_minutes = apply_fees(amount_minutes)
+        if sender_account['balance_minutes'] < final_minutes:
+            raise TransferError("Insufficient balance after tax and bonus.")
+
+        apply_balance_deltas(cursor, 'accounts', {
+            sender_account['id']: -final_minutes,
+            receiver_account['id']: final_minutes,
+        })
+        apply_balance_deltas(cursor, 'users', {
+            sender_id: -final_minutes,
+            receiver_id: final_minutes,
+        })
+
+        txn_hash = ledger_hash(cursor, sender_id, receiver_id, final_minutes)
+
+        cursor.execute("""
+            INSERT INTO transactions (
+                sender_id, receiver_id, sender_account_number, receiver_account_number,
+                amount_minutes, transaction_type, tax_minutes, bonus_minutes, timestamp, txn_hash
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), %s)
+        """, (
+            sender_id,
+            receiver_id,
+            sender_account['account_number'],
+            receiver_account['account_number'],
+            final_minutes,
+            'transfer',
+            tax_minutes,
+            bonus_minutes,
+            txn_hash
+        ))
+        transaction_id = cursor.lastrowid
+
+        conn.commit()
+        return {
+            'transaction_id': transaction_id,
+            'receiver_id': receiver_id,
+            'final_minutes': final_minutes,
+            'tax_minutes': tax_minutes,
+            'bonus_minutes': bonus_minutes,
+            'txn_hash': txn_hash,
+        }
+    finally:
+        cursor.close()
+
+
+def _execute_bulk_transfer(conn, sender_id, transfers, ledger_block):
+    cursor = conn.cursor(dictionary=True)
+    try:
+        account_numbers = set()
+        for transfer in transfers:
+            account_numbers.add(transfer['sender_account_number'])
+            account_numbers.add(transfer['receiver_account_number'])
+        accounts = lock_accounts(cursor, account_numbers) if account_numbers else {}
+
+        balances = {account['id']: account['balance_minutes'] for account in accounts.values()}
+        account_deltas = {}
+        user_deltas = {}
+        accepted = []
+        results = []
+
+        for transfer in transfers:
+            sender_account = accounts.get(int(transfer['sender_account_number']))
+            receiver_account = accounts.get(int(transfer['receiver_account_number']))
+            receiver_username = transfer['receiver_username']
+
+            if not sender_account or sender_account['user_id'] != sender_id:
+                results.append({'status': 'failed', 'error': "Sender account not found."})
+                continue
+            if not receiver_account or receiver_account['username'].lower() != receiver_username.lower():
+                results.append({'status': 'failed', 'error': "Receiver account not found."})
+                continue
+            receiver_id = receiver_account['user_id']
+            if sender_id == receiver_id:
+                results.append({'status': 'failed', 'error': "Cannot transfer to your own account."})
+                continue
+
+            final_minutes, tax_minutes, bonus_minutes = apply_fees(transfer['amount_minutes'])
+            if balances[sender_account['id']] < final_minutes:
+                results.append({'status': 'failed', 'error': "Insufficient balance after tax and bonus."})
+                continue
+
+            balances[sender_account['id']] -= final_minutes
+            balances[receiver_account['id']] += final_minutes
+            for deltas, sender_key, receiver_key in ((account_deltas, sender_account['id'], receiver_account['id']),
+                                                     (user_deltas, sender_id, receiver_id)):
+                deltas[sender_key] = deltas.get(sender_key, 0) - final_minutes
+                deltas[receiver_key] = deltas.get(receiver_key, 0) + final_minutes
+
+            result = {
+                'status': 'ok',
+                'receiver_id': receiver_id,
+                'final_minutes': final_minutes,
+                'tax_minutes': tax_minutes,
+                'bonus_minutes': bonus_minutes,
+            }
+            results.append(result)
+            accepted.append((result, sender_account, receiver_account))
+
+        if not accepted:
+            conn.rollback()
+            return results
+
+        apply_balance_deltas(cursor, 'accounts', account_deltas)
+        apply_balance_deltas(cursor, 'users', user_deltas)
+
+        hashes = ledger_block(cursor, [(sender_id, result['receiver_id'], result['final_minutes'])
+                                       for result, _, _ in accepted])
+
+        rows = []
+        for (result, sender_account, receiver_account), txn_hash in zip(accepted, hashes):
+            result['txn_hash'] = txn_hash
+            rows.append((
+                sender_id,
+                result['receiver_id'],
+                sender_account['account_number'],
+                receiver_account['account_number'],
+                result['final_minutes'],
+                'transfer',
+                result['tax_minutes'],
+                result['bonus_minutes'],
+                txn_hash
+            ))
+        cursor.executemany("""
+            INSERT INTO transactions (
+                sender_id, receiver_id, sender_account_number, receiver_account_number,
+                amount_minutes, transaction_type, tax_minutes, bonus_minutes, timestamp, txn_hash
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), %s)
+        """, rows)
+
+        conn.commit()
+        return results
+    finally:
+        cursor.close()